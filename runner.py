@@ -1,30 +1,56 @@
 import argparse
+import fnmatch
+import glob
+import json
 import os
+import sys
+import threading
 import time
-from typing import Any, Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from watchdog.events import PatternMatchingEventHandler
-from watchdog.observers import Observer
+from watchdog.events import (FileSystemEventHandler,
+                             PatternMatchingEventHandler)
 
+from uploadio.common import compression
 from uploadio.common.db import Database, DBConnection
 from uploadio.common.translator import Datatype, PostgresTranslator
 from uploadio.sources import source as src
-from uploadio.sources.catalog import JsonCatalogProvider
+from uploadio.sources.catalog import ConfigurationError, JsonCatalogProvider
+from uploadio.sources.chunking import parse_size
 from uploadio.sources.collection import SourceDefinition
-from uploadio.sources.parser import ParserFactory
-from uploadio.sources.target import DatabaseTarget
-from uploadio.utils import Loggable
+from uploadio.sources.offsets import OffsetStore
+from uploadio.sources.pipeline import Pipeline, RunMetrics
+from uploadio.sources.target import TargetFactory
+from uploadio.utils import Loggable, configure_logging
 
 log = Loggable().logger
 
 
 class PipelineHandler(PatternMatchingEventHandler):
-    patterns = ["*.csv"]
+    patterns = compression.patterns(["*.csv"])
 
-    def __init__(self, catalog: str, source_name: str) -> None:
+    def __init__(self, catalog: str, source_name: str,
+                 chunksize: int = 10000, workers: int = None,
+                 offsets: OffsetStore = None,
+                 checkpoint: bool = False,
+                 definition: SourceDefinition = None,
+                 memory_budget: int = None) -> None:
+        """
+        :param definition: the loaded source definition, by default the
+            catalog is loaded again for every file
+        :param memory_budget: bytes of chunks in memory, chooses the chunk
+            sizes instead of `chunksize` (see :py:class:`ChunkSizer`)
+        """
         super().__init__()
         self.catalog = catalog
         self.source_name = source_name
+        self.definition = definition
+        self.chunksize = chunksize
+        self.workers = workers
+        self.offsets = offsets or OffsetStore()
+        self.checkpoint = checkpoint
+        self.memory_budget = memory_budget
 
     @staticmethod
     def file(file_name: str) -> str:
@@ -43,42 +69,39 @@ class PipelineHandler(PatternMatchingEventHandler):
         """
         Auxiliary method to create database and table if you start
         on a vanilla system
-        :param collection: target config from catalog
+        :param collection: target configs from catalog, tables are created
+            for all database targets
         """
+        for target_config in collection.targets:
+            if target_config.get('type', 'database') == 'database':
+                PipelineHandler.__create_table(collection, target_config)
 
-        def table_available(collection: SourceDefinition) -> bool:
-            db = Database(DBConnection(collection.target_config['connection']))
-            stmt = "select * from {} limit 1".format(collection.name)
-            return db.select(stmt) is not None
-
-        if not table_available(collection):
-            log.info("No database table available. Going to create "
-                     "everything...")
-            db = Database(DBConnection(collection.target_config['connection']))
-            db.execute(
-                statement="drop table if exists {}".format(collection.name),
-                modify=True
-            )
-            col_types = []
-            for f in collection.fields.values():
-                col_types.append('"{}" {}'.format(
-                    f.alias,
-                    PostgresTranslator(
-                        Datatype(f.data_type)
-                    ).dialect_datatype()
-                ))
-            cols = ', '.join(col_types)
-            target_options = collection.target_config.get('options', {})
-            row_hash = target_options.get('row_hash', False)
-            if row_hash:
-                cols += ', row_hash text PRIMARY KEY'
-            stmt = "create table if not exists {} ({} )".format(
-                collection.target_config['connection'].get('table', 'default'),
-                cols
-            )
-            db.execute(statement=stmt, modify=True)
-        else:
+    @staticmethod
+    def __create_table(collection: SourceDefinition,
+                       target_config: Dict[str, Any]) -> None:
+        db = Database(DBConnection(target_config['connection']))
+        if db.has_table():
             log.info("Database table already exists. Nothing to do here...")
+            return
+        log.info("No database table available. Going to create "
+                 "everything...")
+        columns = [(
+            f.alias if f.has_alias() else f.name,
+            PostgresTranslator(Datatype(f.data_type)).dialect_datatype()
+        ) for f in collection.projected_fields]
+        primary_key = []
+        if target_config.get('options', {}).get('row_hash', False):
+            columns.append(('row_hash', 'text'))
+            primary_key.append('row_hash')
+        db.create_table(columns, primary_key)
+
+    def collection(self) -> SourceDefinition:
+        if self.definition is not None:
+            return self.definition
+        cat_file = PipelineHandler.json_source(self.catalog)
+        log.info("Loading catalog %s", cat_file.uri)
+        catalog = JsonCatalogProvider(cat_file.data)
+        return catalog.load(self.source_name)
 
     def process(self, event) -> None:
         """
@@ -91,24 +114,55 @@ class PipelineHandler(PatternMatchingEventHandler):
         """
 
         # the file will be processed there
-        cat_file = PipelineHandler.json_source(self.catalog)
-        log.info("Loading catalog {}".format(cat_file.uri))
-        catalog = JsonCatalogProvider(cat_file.data)
-        collection = catalog.load(self.source_name)
-        PipelineHandler.create_table(collection)
-        log.info("Processing Source: {}".format(event.src_path))
-        csv = collection.source.load(uri=event.src_path)
-        parser = ParserFactory.load(collection.parser)
-        p = parser(
-            source=csv.data, 
+        PipelineHandler.create_table(self.collection())
+        log.info("Processing Source: %s", event.src_path)
+        self.ingest(event.src_path)
+        log.info("Done...")
+
+    def ingest(self, path: str, **kwargs) -> RunMetrics:
+        """
+        Runs the pipeline of the source for one file
+        :param kwargs: passed to :py:meth:`Pipeline.run` (e.g. if_exists)
+        """
+        collection = self.collection()
+        source = collection.source
+        if isinstance(source, src.TailSource):
+            return self.tail(collection, source, path)
+        return self.pipeline(
+            collection, checkpoint=self.checkpoint
+        ).run(uri=path, **kwargs)
+
+    def tail(self, collection: SourceDefinition, source: src.TailSource,
+             path: str) -> RunMetrics:
+        """
+        Appends the rows, which were added to the file since the last
+        event, and commits the new offset after they are written
+        """
+        source.position = self.offsets.get(path)
+        metrics = self.pipeline(collection, source=source).run(
+            uri=path, if_exists='append'
+        )
+        self.offsets.commit(path, source.position)
+        log.info("Appended %d rows of %s (%d rows, %d bytes ingested)",
+                 metrics.rows, path, source.position.rows,
+                 source.position.offset)
+        return metrics
+
+    def pipeline(self, collection: SourceDefinition,
+                 **kwargs) -> Pipeline:
+        for target in collection.targets:
+            connection = target.get('connection', {})
+            log.info("Writing into %s target '%s'",
+                     target.get('type', 'database'),
+                     connection.get('table', connection.get('uri', '')))
+        return Pipeline(
             collection=collection,
-            options=collection.parser_config.get('options', {})
+            target=TargetFactory.load_all(collection.targets),
+            chunksize=self.chunksize,
+            workers=self.workers,
+            memory_budget=self.memory_budget,
+            **kwargs
         )
-        log.info("Inserting values into table '{}'".format(
-            collection.target_config['connection'].get('table', 'default')
-        ))
-        DatabaseTarget(config=collection.target_config, parser=p).output()
-        log.info("Done...")
 
     def on_modified(self, event) -> None:
         log.info("on_modified() event occured")
@@ -123,11 +177,20 @@ class PipelineHandler(PatternMatchingEventHandler):
         self.process(event)
 
 
-def run(path: str, catalog: str, source_name: str) -> None:
+def run(path: str, catalog: str, source_name: str,
+        chunksize: int = 10000, workers: int = None,
+        offsets: str = None, checkpoint: bool = False,
+        memory_budget: int = None) -> None:
+    from watchdog.observers import Observer
     observer = Observer()
     handler = PipelineHandler(
         catalog=catalog,
-        source_name=source_name
+        source_name=source_name,
+        chunksize=chunksize,
+        workers=workers,
+        offsets=OffsetStore(offsets),
+        checkpoint=checkpoint,
+        memory_budget=memory_budget
     )
     observer.schedule(handler, path)
     observer.start()
@@ -142,31 +205,425 @@ def run(path: str, catalog: str, source_name: str) -> None:
     observer.join()
 
 
-def parse_arguments() -> Tuple[str, str, str]:
+class Router(FileSystemEventHandler):
+    """
+    Dispatches the files of all sources of one or more catalogs, which
+    declare a ``directory`` (and a file name ``pattern``, default '*.csv')
+    in their source config:
+        "source": {
+            "type": "csv",
+            "uri": "auszug.csv",
+            "directory": "/data/incoming/bank",
+            "pattern": ["auszug_*.csv", "umsatz_*.csv"]
+        }
+    Compressed files match the pattern of the uncompressed name.
+
+    The catalogs are loaded once, files are processed on a shared thread
+    pool of `parallel` workers and all targets of a database share one
+    engine. Files of different sources are processed in parallel, the
+    files of one source one after another (like a
+    :py:class:`PipelineHandler` does).
+    A file, which changes while it is processed, is processed again
+    afterwards.
+    """
+
+    def __init__(self, handlers: List[PipelineHandler],
+                 parallel: int = 1) -> None:
+        super().__init__()
+        self.handlers = handlers
+        self.pool = ThreadPoolExecutor(max_workers=parallel)
+        self.__lock = threading.Lock()
+        # path -> True if it changed again while being processed
+        self.__pending: Dict[str, bool] = {}
+        # one lock per source, the table is created by the first file
+        self.__sources: Dict[str, threading.Lock] = {
+            h.definition.name: threading.Lock() for h in handlers
+        }
+        self.__tables: Set[str] = set()
+
+    @classmethod
+    def load(cls, catalogs: List[str], parallel: int = 1,
+             **options) -> 'Router':
+        """
+        :param catalogs: paths of catalog files
+        :param options: options of every :py:class:`PipelineHandler`
+        """
+        handlers = []
+        for path in catalogs:
+            data = PipelineHandler.json_source(path).data
+            catalog = JsonCatalogProvider(data)
+            for name in catalog.list_sources():
+                collection = catalog.load(name)
+                if not collection.directory:
+                    log.info("Source '%s' of %s declares no directory, "
+                             "skipping it", name, path)
+                    continue
+                handlers.append(PipelineHandler(
+                    catalog=path, source_name=name, definition=collection,
+                    **options
+                ))
+        return cls(handlers, parallel)
+
+    @property
+    def directories(self) -> List[str]:
+        return sorted({h.definition.directory for h in self.handlers})
+
+    def route(self, path: str) -> Optional[PipelineHandler]:
+        """ The handler of the first source, which matches the file """
+        directory, name = os.path.split(os.path.abspath(path))
+        names = {name, compression.strip_extension(name)}
+        for handler in self.handlers:
+            if handler.definition.directory != directory:
+                continue
+            if any(fnmatch.fnmatch(n, pattern) for n in names
+                   for pattern in handler.definition.patterns):
+                return handler
+        return None
+
+    def submit(self, path: str) -> bool:
+        """ Processes the file, if a source matches it """
+        handler = self.route(path)
+        if handler is None:
+            return False
+        with self.__lock:
+            if path in self.__pending:
+                self.__pending[path] = True
+                return True
+            self.__pending[path] = False
+        self.pool.submit(self.__process, handler, path)
+        return True
+
+    def __process(self, handler: PipelineHandler, path: str) -> None:
+        collection = handler.definition
+        try:
+            with self.__sources[collection.name]:
+                if collection.name not in self.__tables:
+                    PipelineHandler.create_table(collection)
+                    self.__tables.add(collection.name)
+                log.info("Processing %s as source '%s'",
+                         path, collection.name)
+                handler.ingest(path)
+        except Exception:
+            log.exception("Processing %s failed", path)
+        finally:
+            with self.__lock:
+                again = self.__pending.pop(path)
+        if again:
+            self.submit(path)
+
+    def on_created(self, event) -> None:
+        if not event.is_directory:
+            self.submit(event.src_path)
+
+    def on_modified(self, event) -> None:
+        if not event.is_directory:
+            self.submit(event.src_path)
+
+    def on_moved(self, event) -> None:
+        if not event.is_directory:
+            self.submit(event.dest_path)
+
+    def close(self) -> None:
+        """ Waits for the files in process """
+        self.pool.shutdown()
+
+
+def expand(files: List[str]) -> List[str]:
+    """ Paths of all files, which match the given paths or glob patterns """
+    paths = []
+    for pattern in files:
+        matches = sorted(glob.glob(pattern, recursive=True)) \
+            if glob.has_magic(pattern) else [pattern]
+        paths.extend(p for p in matches
+                     if os.path.isfile(p) and p not in paths)
+    return paths
+
+
+def summary(results: List[Tuple[str, Any]]) -> str:
+    """
+    Per-file throughput of a batch run
+    :param results: (file, :py:class:`RunMetrics` or the exception)
+    """
+    lines = ["{:<48} {:>10} {:>7} {:>9} {:>11}  {}".format(
+        'file', 'rows', 'chunks', 'seconds', 'rows/s', 'status')]
+    for path, result in results:
+        if isinstance(result, Exception):
+            lines.append("{:<48} {:>10} {:>7} {:>9} {:>11}  failed: {}".format(
+                path, '-', '-', '-', '-', result))
+            continue
+        lines.append(
+            "{:<48} {:>10d} {:>7d} {:>9.2f} {:>11.0f}  ok".format(
+                path, result.rows, result.chunks, result.seconds,
+                result.rows_per_second))
+    rows = sum(r.rows for _, r in results if isinstance(r, RunMetrics))
+    failed = sum(1 for _, r in results if isinstance(r, Exception))
+    lines.append(f"{len(results)} files, {rows} rows, {failed} failed")
+    return '\n'.join(lines)
+
+
+def batch(files: List[str], catalog: str, source_name: str,
+          chunksize: int = 10000, workers: int = None, parallel: int = 1,
+          checkpoint: bool = False, memory_budget: int = None) -> int:
+    """
+    Processes the files once (no watchdog) and appends them to the target,
+    `parallel` files at a time. Prints a summary per file.
+    :param files: paths or glob patterns (e.g. '/data/2018-*.csv.gz')
+    :return: exit status, 0 if all files were processed, 1 if a file
+        failed and 2 if no file matched
+    """
+    paths = expand(files)
+    if not paths:
+        log.error("No files match %s", files)
+        return 2
+
+    handler = PipelineHandler(catalog=catalog, source_name=source_name,
+                              chunksize=chunksize, workers=workers,
+                              checkpoint=checkpoint,
+                              memory_budget=memory_budget)
+    PipelineHandler.create_table(handler.collection())
+    log.info("Processing %d files with %d in parallel", len(paths), parallel)
+    with ThreadPoolExecutor(max_workers=parallel) as pool:
+        futures = [
+            pool.submit(handler.ingest, path, if_exists='append')
+            for path in paths
+        ]
+        results = []
+        for path, future in zip(paths, futures):
+            try:
+                results.append((path, future.result()))
+            except Exception as why:
+                log.exception("Processing %s failed", path)
+                results.append((path, why))
+    print(summary(results))
+    return 1 if any(isinstance(r, Exception) for _, r in results) else 0
+
+
+def route(catalogs: List[str], chunksize: int = 10000, workers: int = None,
+          parallel: int = 1, offsets: str = None,
+          checkpoint: bool = False, memory_budget: int = None) -> None:
+    """
+    Observes the directories of all sources of the catalogs with a single
+    observer and routes every file to its source (see :py:class:`Router`)
+    """
+    from watchdog.observers import Observer
+    router = Router.load(
+        catalogs, parallel=parallel, chunksize=chunksize, workers=workers,
+        offsets=OffsetStore(offsets), checkpoint=checkpoint,
+        memory_budget=memory_budget
+    )
+    if not router.handlers:
+        raise ConfigurationError(f"No source of {catalogs} declares a "
+                                 f"directory")
+    observer = Observer()
+    for directory in router.directories:
+        observer.schedule(router, directory)
+    observer.start()
+    log.info("Routing %d sources in %d directories...",
+             len(router.handlers), len(router.directories))
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        observer.stop()
+
+    observer.join()
+    router.close()
+
+
+def stream(catalog: str, source_name: str, workers: int = None) -> None:
+    """
+    Consumes the stream source of the catalog and appends every
+    micro-batch to the target (no files, no watchdog)
+    """
+    handler = PipelineHandler(catalog=catalog, source_name=source_name,
+                              workers=workers)
+    collection = handler.collection()
+    source = collection.source
+    if not isinstance(source, src.StreamSource):
+        raise ConfigurationError(
+            f"Source '{source_name}' is not of type 'stream'"
+        )
+    PipelineHandler.create_table(collection)
+    log.info("Consuming stream %s", source.uri)
+    try:
+        handler.pipeline(collection, source=source).run(if_exists='append')
+    except KeyboardInterrupt:
+        source.close()
+
+
+# file extension -> source config of a sample file, CSV by default
+SAMPLE_SOURCES: Dict[str, Dict[str, Any]] = {
+    '.json': {'type': 'json'},
+    '.ndjson': {'type': 'json', 'options': {'lines': True}},
+    '.jsonl': {'type': 'json', 'options': {'lines': True}}
+}
+
+
+def sample_source(uri: str) -> Dict[str, Any]:
+    """
+    The source config of a sample file by its extension (of the uncompressed
+    file name)
+    Example:
+        >>> sample_source('/tmp/orders.ndjson.gz')['options']
+        {'lines': True}
+        >>> sample_source('/tmp/export.json.csv')['type']
+        'csv'
+    """
+    name = compression.strip_extension(uri)
+    extension = os.path.splitext(name)[1].lower()
+    return dict(SAMPLE_SOURCES.get(extension, {'type': 'csv'}), uri=uri)
+
+
+def infer(uri: str, catalog: str, source_name: str, rows: int = 1000) -> None:
+    """
+    Infers the fields of a new source from the first `rows` rows of `uri`
+    and adds the source to the catalog file (which is created if needed)
+    """
+    from uploadio.sources.inference import infer_catalog
+    generated = infer_catalog(sample_source(uri), source_name, rows=rows)
+    if os.path.exists(catalog):
+        with open(catalog, 'r') as existing:
+            content = json.load(existing)
+        content.setdefault('sources', {}).update(generated['sources'])
+    else:
+        content = generated
+    with open(catalog, 'w') as output:
+        json.dump(content, output, indent=2, ensure_ascii=False)
+    log.info("Added source '%s' to %s, please review its fields",
+             source_name, catalog)
+
+
+def parse_arguments() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="upload.io runner")
     parser.add_argument('-p',
                         '--path',
                         dest='path',
-                        help='path to observe for changes',
-                        required=True
+                        help='path to observe for changes'
+                        )
+    parser.add_argument('-f',
+                        '--files',
+                        dest='files',
+                        nargs='+',
+                        help='process these files (or glob patterns) once '
+                             'and exit instead of observing a path'
+                        )
+    parser.add_argument('--parallel',
+                        dest='parallel',
+                        type=int,
+                        help='number of files processed at the same time '
+                             'with -f/--files or --route',
+                        default=1
+                        )
+    parser.add_argument('--stream',
+                        dest='stream',
+                        action='store_true',
+                        help='consume the stream source of the catalog '
+                             'instead of observing a path'
+                        )
+    parser.add_argument('--infer',
+                        dest='infer',
+                        help='infer the fields of the source -s from the '
+                             'first --sample rows of this file and add it '
+                             'to the catalog -c'
+                        )
+    parser.add_argument('--sample',
+                        dest='sample',
+                        type=int,
+                        help='rows to infer the fields from (--infer)',
+                        default=1000
+                        )
+    parser.add_argument('--route',
+                        dest='route',
+                        action='store_true',
+                        help='observe the directories of all sources of '
+                             'the catalogs and route every file to its '
+                             'source'
                         )
     parser.add_argument('-c',
                         '--catalog',
                         dest='catalog',
-                        help='Path to a catalog file',
+                        action='append',
+                        help='Path to a catalog file, repeatable with '
+                             '--route',
                         required=True
                         )
     parser.add_argument('-s',
                         '--source',
                         dest='source',
-                        help='source name within given catalog',
-                        required=True
+                        help='source name within given catalog '
+                             '(not with --route)'
+                        )
+    parser.add_argument('--chunksize',
+                        dest='chunksize',
+                        type=int,
+                        help='rows per chunk, chunks are read, parsed and '
+                             'written concurrently',
+                        default=10000
+                        )
+    parser.add_argument('--memory-budget',
+                        dest='memory_budget',
+                        type=parse_size,
+                        help='memory for the chunks in process (e.g. 512M), '
+                             'the chunk sizes are chosen for it, '
+                             '--chunksize only limits the first chunk',
+                        default=None
+                        )
+    parser.add_argument('-w',
+                        '--workers',
+                        dest='workers',
+                        type=int,
+                        help='number of processes to parse chunks with',
+                        default=None
+                        )
+    parser.add_argument('--offsets',
+                        dest='offsets',
+                        help='file to persist the offsets of sources of '
+                             'type tail in, by default they are only kept '
+                             'in memory',
+                        default=None
+                        )
+    parser.add_argument('--checkpoint',
+                        dest='checkpoint',
+                        action='store_true',
+                        help='commit every chunk with a checkpoint and '
+                             'resume an interrupted file after the last '
+                             'committed chunk'
+                        )
+    parser.add_argument('-l',
+                        '--log-level',
+                        dest='log_level',
+                        help='log level (DEBUG, INFO, WARNING, ERROR)',
+                        default='INFO'
                         )
 
     args = parser.parse_args()
-    return args.path, args.catalog, args.source
+    if args.route:
+        return args
+    if not args.path and not args.stream and not args.files \
+            and not args.infer:
+        parser.error("either -p/--path, -f/--files, --stream, --infer or "
+                     "--route is required")
+    if not args.source or len(args.catalog) > 1:
+        parser.error("a single -c/--catalog and -s/--source are required")
+    args.catalog = args.catalog[0]
+    return args
 
 
 if __name__ == '__main__':
-    path, catalog, source_name = parse_arguments()
-    run(path, catalog, source_name)
+    args = parse_arguments()
+    configure_logging(args.log_level)
+    if args.route:
+        route(args.catalog, args.chunksize, args.workers, args.parallel,
+              args.offsets, args.checkpoint, args.memory_budget)
+    elif args.infer:
+        infer(args.infer, args.catalog, args.source, args.sample)
+    elif args.files:
+        sys.exit(batch(args.files, args.catalog, args.source, args.chunksize,
+                       args.workers, args.parallel, args.checkpoint,
+                       args.memory_budget))
+    elif args.stream:
+        stream(args.catalog, args.source, args.workers)
+    else:
+        run(args.path, args.catalog, args.source, args.chunksize,
+            args.workers, args.offsets, args.checkpoint, args.memory_budget)
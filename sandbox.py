@@ -1,5 +1,6 @@
 import io
 import os
+from typing import Iterator
 
 import avro
 from pandas import DataFrame
@@ -9,7 +10,9 @@ from uploadio.common.translator import Datatype, PostgresTranslator
 from uploadio.sources import catalog as cat
 from uploadio.sources import source as src
 from uploadio.sources.parser import ParserFactory
-from uploadio.sources.target import AvroTarget, DatabaseTarget, LoggableTarget
+from uploadio.sources.pipeline import Pipeline
+from uploadio.sources.target import AvroTarget, DatabaseTarget, TargetFactory
+from uploadio.utils import configure_logging
 
 
 def file(file_name: str) -> str:
@@ -40,36 +43,30 @@ def read_avro(data) -> None:
     reader.close()
 
 
-def create_table(collection) -> None:        
+def create_table(collection) -> None:
     db = Database(DBConnection(collection.target_config['connection']))
-    db.execute(
-        statement="drop table if exists {}".format(
-            collection.target_config['connection'].get('table', collection.name)
-        ),
-        modify=True
-    )
-    col_types = ['"{}" {}'.format(
-            f.alias,
-            PostgresTranslator(Datatype(f.data_type)).dialect_datatype()
-        ) for f in collection.fields.values()]
-    cols = ', '.join(col_types)
-    target_options = collection.target_config.get('options', {})
-    row_hash = target_options.get('row_hash', False)
-    if row_hash:
-        cols += ', row_hash text PRIMARY KEY'
-    stmt = "create table if not exists {} ({} )".format(
-        collection.target_config['connection'].get('table', collection.name),
-        cols
-    )
-    db.execute(statement=stmt, modify=True)
+    columns = [(
+        f.alias if f.has_alias() else f.name,
+        PostgresTranslator(Datatype(f.data_type)).dialect_datatype()
+    ) for f in collection.projected_fields]
+    primary_key = []
+    if collection.target_config.get('options', {}).get('row_hash', False):
+        columns.append(('row_hash', 'text'))
+        primary_key.append('row_hash')
+    db.create_table(columns, primary_key, replace=True)
+
+
+def select_table(collection, chunksize: int = 10000) -> Iterator[DataFrame]:
+    """ Streams the target table in chunks """
+    db = Database(DBConnection(collection.target_config['connection']))
+    return db.select_chunks(db.table().select(), chunksize=chunksize)
 
 
-def select_table(collection) -> DataFrame:    
-    db = Database(DBConnection(collection.target_config['connection']))
-    stmt = "select * from {}".format(
-        collection.target_config['connection'].get('table', collection.name)
-    )
-    return db.select(stmt)
+def print_table(collection, chunksize: int = 10000, head: bool = False) -> None:
+    for chunk in select_table(collection, chunksize):
+        print(chunk.head() if head else chunk)
+        if head:
+            break
 
 
 def kontoauszug():
@@ -77,18 +74,14 @@ def kontoauszug():
     catalog = catalog_provider(json_source(
         file("sandbox/catalog_auszug.json")))
     collection = catalog.load('kontoauszug')
-    source = collection.source.load()
-    parser = ParserFactory.load(collection.parser)
-    p = parser(
-        source=source.data,
-        collection=collection,
-        options=collection.parser_config.get('options', {})
-    )
-    LoggableTarget(config=collection.target_config, parser=p).output()
+    # parsed once, every chunk is logged and written to the database
+    target = TargetFactory.load_all([
+        {'type': 'log', 'options': {'log_every': 100}},
+        collection.target_config
+    ])
     create_table(collection)
-    DatabaseTarget(config=collection.target_config, parser=p).output()
-    data = select_table(collection)
-    print(data)
+    Pipeline(collection, target).run(if_exists='append')
+    print_table(collection)
 
 
 def customer():
@@ -118,8 +111,7 @@ def http():
     )
     create_table(collection)
     DatabaseTarget(config=collection.target_config, parser=p).output()
-    data = select_table(collection)
-    print(data.head())
+    print_table(collection, head=True)
 
 
 def hospital_charges():
@@ -135,8 +127,7 @@ def hospital_charges():
     # LoggableTarget(config=collection.target_config, parser=p).output()
     create_table(collection)
     DatabaseTarget(config=collection.target_config, parser=p).output()
-    data = select_table(collection)
-    print(data.head())
+    print_table(collection, head=True)
 
 
 def quotes():
@@ -152,9 +143,9 @@ def quotes():
     )
     create_table(collection)
     DatabaseTarget(config=collection.target_config, parser=p).output()
-    data = select_table(collection)
-    print(data.head())
+    print_table(collection, head=True)
 
 
 if __name__ == '__main__':
+    configure_logging('DEBUG')
     hospital_charges()
@@ -26,3 +26,15 @@ def test_has_source(source: src.Source) -> None:
     catalog = cat.JsonCatalogProvider(source.data)
     source_name = catalog.list_sources()[0]
     assert catalog.has_source(source_name) is True
+
+
+def test_ignored_fields(source: src.Source) -> None:
+    catalog = cat.JsonCatalogProvider(source.data)
+    fields = source.data['sources']['testcatalog']['fields']
+    fields.append({'name': 'unused', 'ignore': True})
+    collection = catalog.load('testcatalog')
+    assert collection.ignored == ['unused']
+    assert 'unused' not in collection.projection
+    assert collection.source.columns == collection.projection
+    assert collection.validate(collection.projection + ['unused']) is True
+    assert collection.validate(collection.projection + ['other']) is False
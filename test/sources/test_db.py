@@ -68,3 +68,47 @@ def test_database(target_config):
         modify=True
     )
     assert len(res) == 5
+
+
+def test_select_chunks(tmpdir):
+    db = Database(connection=DBConnection({
+        'uri': 'sqlite:///{}'.format(tmpdir.join('select.db')),
+        'table': 'numbers'
+    }))
+    db.insert(data=DataFrame({'n': range(25), 's': [str(i) for i in range(25)]}))
+    chunks = list(db.select_chunks(
+        "select n, s from numbers where n >= :low order by n",
+        chunksize=10, params={'low': 3}
+    ))
+    assert [len(chunk) for chunk in chunks] == [10, 10, 2]
+    assert list(chunks[0].columns) == ['n', 's']
+    assert list(chunks[-1]['n']) == [23, 24]
+    tables = list(db.select_chunks("select * from numbers", chunksize=20,
+                                   arrow=True))
+    assert [table.num_rows for table in tables] == [20, 5]
+    assert tables[0].column_names == ['index', 'n', 's']
+
+
+def test_statements(tmpdir):
+    # names are quoted, not formatted into the SQL
+    db = Database(connection=DBConnection({
+        'uri': 'sqlite:///{}'.format(tmpdir.join('statements.db')),
+        'table': 'people; drop table x'
+    }))
+    assert not db.has_table()
+    db.create_table([('name', 'text'), ('row_hash', 'text')],
+                    primary_key=['row_hash'])
+    assert db.has_table()
+    for chunk in range(3):
+        data = DataFrame({'name': ['a', None]},
+                         index=['{}-{}'.format(chunk, i) for i in range(2)])
+        data.index.name = 'row_hash'
+        db.insert(data=data, chunksize=1, if_exists='append')
+    assert db.table() is db.table()
+    result = db.select(db.table().select().where(db.table().c.name == 'a'))
+    assert list(result['row_hash']) == ['0-0', '1-0', '2-0']
+    assert db.select("select count(*) as n from \"people; drop table x\" "
+                     "where name is null")['n'][0] == 3
+    # replace creates the table from the DataFrame
+    db.insert(data=DataFrame({'n': [1, 2]}))
+    assert [c.name for c in db.table().columns] == ['index', 'n']
@@ -0,0 +1,102 @@
+"""Test row_hash deduplication"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from uploadio.sources import dedup
+from uploadio.sources.dedup import HashIndex
+from uploadio.sources.parser import DBOutputParser
+from uploadio.sources.target import DatabaseTarget
+from uploadio.utils import make_md5
+
+
+def frame(names) -> pd.DataFrame:
+    """ Parsed rows like DBOutputParser with the option row_hash """
+    return pd.DataFrame(
+        {'name': names},
+        index=pd.Index([make_md5(name) for name in names], name='row_hash')
+    )
+
+
+@pytest.fixture(scope='function')
+def config(tmpdir) -> dict:
+    yield {
+        'connection': {
+            'uri': 'sqlite:///{}'.format(tmpdir.join('dedup.db')),
+            'table': 'people'
+        },
+        'options': {'dedup': {'path': str(tmpdir.join('people.npy'))}}
+    }
+
+
+def test_hash_index(tmpdir) -> None:
+    hashes = [make_md5(str(i)) for i in range(1000)]
+    index = HashIndex(str(tmpdir.join('hashes.npy')))
+    index.add(hashes[::2])
+    assert len(index) == 500
+    new = index.new(hashes)
+    assert list(np.flatnonzero(new)) == list(range(1, 1000, 2))
+    index.save(rows=500)
+    loaded = HashIndex(index.path)
+    assert not loaded.loaded
+    assert loaded.validate(500)
+    assert not loaded.new(hashes[:10:2]).any()
+    # e.g. rows were deleted since the keys were saved
+    stale = HashIndex(index.path)
+    assert not stale.validate(499)
+    assert len(stale) == 0
+    with pytest.raises(ValueError):
+        index.new(['abc'])
+
+
+def test_overlapping_exports(config: dict) -> None:
+    target = DatabaseTarget(config=config)
+    target.write(frame(['a', 'b', 'c']), if_exists='replace')
+    target.write(frame(['b', 'c', 'd', 'd']))
+    target.close()
+    people = target.db.select("select name from people order by name")
+    assert list(people['name']) == ['a', 'b', 'c', 'd']
+    assert os.path.exists(config['options']['dedup']['path'])
+
+
+def test_stale_hash_file(config: dict) -> None:
+    target = DatabaseTarget(config=config)
+    target.write(frame(['a', 'b']), if_exists='replace')
+    target.close()
+    # the table is replaced by another writer, 'b' is gone
+    DatabaseTarget(config={'connection': config['connection']}).write(
+        frame(['a'])
+    )
+    dedup._INDEXES.clear()
+    target = DatabaseTarget(config=config)
+    target.write(frame(['b']))
+    people = target.db.select("select name from people order by name")
+    assert list(people['name']) == ['a', 'b']
+
+
+def test_hashes_of_the_table(config: dict) -> None:
+    DatabaseTarget(config={'connection': config['connection']}).write(
+        frame(['a', 'b'])
+    )
+    # a new process without persisted hashes reads them from the table
+    config['options']['dedup'] = True
+    target = DatabaseTarget(config=config)
+    target.write(frame(['b', 'c']))
+    people = target.db.select("select name from people order by name")
+    assert list(people['name']) == ['a', 'b', 'c']
+
+
+def test_row_hash_modes() -> None:
+    chunk = pd.DataFrame({'name': ['a', 'b']}, index=[0, 1])
+    moved = pd.DataFrame({'name': ['b']}, index=[7])
+    legacy = DBOutputParser.row_hashes(chunk)
+    assert list(legacy) == [make_md5(str(row)) for _, row in chunk.iterrows()]
+    assert DBOutputParser.row_hashes(moved)[7] != legacy[1]
+    # e.g. 1 of a hand-written catalog
+    assert list(DBOutputParser.row_hashes(chunk, 1)) == list(legacy)
+    values = DBOutputParser.row_hashes(chunk, 'values')
+    assert DBOutputParser.row_hashes(moved, 'values')[7] == values[1]
+    with pytest.raises(ValueError):
+        DBOutputParser.row_hashes(chunk, 'all')
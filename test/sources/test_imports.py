@@ -0,0 +1,39 @@
+"""Test that the runner imports heavy dependencies lazily"""
+import json
+import os
+import subprocess
+import sys
+from typing import List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+
+# imported on first use, never at startup
+HEAVY = ['pandas', 'numpy', 'sqlalchemy', 'psycopg2', 'avro', 'pyarrow',
+         'requests', 'watchdog.observers']
+
+
+def imported_heavy_modules(statement: str) -> List[str]:
+    """ The modules of HEAVY in ``sys.modules`` after `statement` """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, [ROOT, env.get('PYTHONPATH')])
+    )
+    check = 'import json, sys; print(json.dumps([m for m in {!r} ' \
+            'if m in sys.modules]))'.format(HEAVY)
+    result = subprocess.run(
+        [sys.executable, '-c', f"{statement}\n{check}"],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, universal_newlines=True,
+        check=True
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def test_runner_imports_no_heavy_modules() -> None:
+    assert imported_heavy_modules('import runner') == []
+
+
+def test_catalog_and_pipeline_import_lazily() -> None:
+    assert imported_heavy_modules(
+        'import uploadio.sources.catalog, uploadio.sources.pipeline, '
+        'uploadio.sources.target'
+    ) == []
@@ -0,0 +1,82 @@
+"""Test schema inference"""
+import os
+
+import pandas as pd
+import pytest
+
+from uploadio.common.db import Database, DBConnection
+from uploadio.common.translator import Datatype
+from uploadio.sources.catalog import JsonCatalogProvider
+from uploadio.sources.inference import infer_catalog, infer_field
+from uploadio.sources.pipeline import Pipeline
+from uploadio.sources.target import DatabaseTarget
+
+
+@pytest.fixture(scope='function')
+def vendor(tmpdir) -> str:
+    uri = str(tmpdir.join('vendor.csv'))
+    pd.DataFrame({
+        'id': [str(i) for i in range(20)],
+        'zipcode': ['01067', '22222'] * 10,
+        'active': ['yes', 'no'] * 10,
+        'price': ['1.5', '2'] * 10,
+        'ordered': ['2019-01-31 12:00:00'] * 20,
+        'country': ['DE'] * 20,
+        'comment': [f"comment {i}" for i in range(20)]
+    }).to_csv(uri, sep='|', index=False)
+    yield uri
+
+
+def test_infer_field() -> None:
+    field = infer_field('Betrag (€)', pd.Series(['-1.234,56 €', '7,00 €']))
+    assert field.data_type == Datatype.DOUBLE
+    assert field.alias == 'betrag'
+    assert [rule['task']['operator']['old']
+            for rule in field.transformations] == [' €', '.', ',']
+    field = infer_field('day', pd.Series(['31.01.2019', None]))
+    assert field.data_type == Datatype.DATE
+    assert field.nulls == 0.5
+    assert field.transformations[0]['task']['operator'] == \
+        {'from': '%d.%m.%Y', 'to': '%Y-%m-%d'}
+    assert infer_field('n', pd.Series([1, 2])).data_type == Datatype.NUMERIC
+
+
+def test_infer_catalog(vendor: str) -> None:
+    catalog = infer_catalog({'type': 'csv', 'uri': vendor}, 'vendor')
+    source = catalog['sources']['vendor']
+    assert source['source']['options']['delimiter'] == '|'
+    types = {field['name']: field['data_type'] for field in source['fields']}
+    assert types == {
+        'id': 'numeric', 'zipcode': 'string', 'active': 'boolean',
+        'price': 'double', 'ordered': 'datetime', 'country': 'string',
+        'comment': 'string'
+    }
+    categorical = [field['name'] for field in source['fields']
+                   if field.get('categorical')]
+    assert categorical == ['zipcode', 'country']
+    collection = JsonCatalogProvider(catalog).load('vendor')
+    assert collection.projection == list(types)
+
+
+def test_infer_bank_statement(tmpdir) -> None:
+    base_path = os.path.abspath(os.path.dirname(__file__))
+    uri = os.path.join(base_path, '../../resources/sandbox/auszug.csv')
+    target = {'connection': {
+        'uri': 'sqlite:///{}'.format(tmpdir.join('auszug.db')),
+        'table': 'auszug'
+    }}
+    catalog = infer_catalog({'type': 'csv', 'uri': uri}, 'auszug',
+                            target=target)
+    options = catalog['sources']['auszug']['source']['options']
+    assert options['encoding'] == 'windows-1252'
+    assert options['skiprows'] == 8
+
+    # the generated catalog loads the file
+    collection = JsonCatalogProvider(catalog).load('auszug')
+    metrics = Pipeline(collection,
+                       DatabaseTarget(config=collection.target_config)).run()
+    db = Database(DBConnection(target['connection']))
+    loaded = db.select("select buchungstag, betrag from auszug")
+    assert len(loaded) == metrics.rows > 0
+    assert loaded['buchungstag'].str.match(r'^\d{4}-\d{2}-\d{2}$').all()
+    assert pd.to_numeric(loaded['betrag']).notnull().all()
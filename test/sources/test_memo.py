@@ -0,0 +1,85 @@
+"""Test memoized rule evaluation"""
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from uploadio.sources.catalog import JsonCatalogProvider
+from uploadio.sources.collection import SourceDefinition
+from uploadio.sources.memo import ValueCache
+from uploadio.sources.parser import DBOutputParser, JSONEventParser
+
+
+@pytest.fixture(scope='function')
+def collection() -> SourceDefinition:
+    yield JsonCatalogProvider({
+        'namespace': 'test',
+        'version': '0.1',
+        'sources': {
+            'bookings': {
+                'source': {'type': 'csv', 'uri': 'bookings.csv'},
+                'parser': {'name': 'DBOut'},
+                'target': {},
+                'fields': [
+                    {'name': 'kind', 'data_type': 'string',
+                     'transformations': [{
+                         'type': 'rule',
+                         'task': {'name': 'uppercase', 'operator': None}
+                     }]},
+                    {'name': 'amount', 'data_type': 'double',
+                     'transformations': [{
+                         'type': 'rule',
+                         'task': {'name': 'regexreplace',
+                                  'operator': {'old': '[^0-9]', 'new': ''}}
+                     }]}
+                ]
+            }
+        }
+    }).load('bookings')
+
+
+@pytest.fixture(scope='function')
+def source() -> pd.DataFrame:
+    yield pd.DataFrame({
+        'kind': ['Lastschrift', 'Gutschrift', 'Überweisung', 'Lastschrift'] * 25,
+        'amount': ['{} €'.format(i) for i in range(100)]
+    })
+
+
+def test_db_output_parser_memoize(collection, source) -> None:
+    expected = DBOutputParser(source=source, collection=collection).parse()
+    caches = {}
+    result = DBOutputParser(
+        source=source, collection=collection, caches=caches,
+        options={'memoize': True}
+    ).parse()
+    pd.testing.assert_frame_equal(result, expected)
+    kind = caches['kind']
+    assert kind.cache.misses == 3
+    # 'amount' has only unique values, it is not memoized
+    assert len(caches['amount'].cache) == 0
+
+    # the cache is reused by the next chunk
+    DBOutputParser(source=source.iloc[:10], collection=collection,
+                   caches=caches, options={'memoize': True}).parse()
+    assert kind.cache.misses == 3
+    # the catalog holds no state of a run, e.g. for worker processes
+    assert pickle.loads(pickle.dumps(collection)).name == collection.name
+
+
+def test_json_event_parser_memoize(collection, source) -> None:
+    expected = list(JSONEventParser(
+        source=source, collection=collection).parse())
+    result = list(JSONEventParser(
+        source=source, collection=collection, options={'memoize': True}
+    ).parse())
+    assert result == expected
+
+
+def test_value_cache_missing_values() -> None:
+    cache = ValueCache(lambda v: 'n/a' if v is None or v != v else v * 2,
+                       maxsize=1)
+    column = pd.Series([1, np.nan, 2, 1, np.nan, 1])
+    assert list(cache.apply(column)) == [2, 'n/a', 4, 2, 'n/a', 2]
+    assert len(cache.cache) == 1
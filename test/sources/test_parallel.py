@@ -0,0 +1,61 @@
+"""Test process pool parsing"""
+import pandas as pd
+import pytest
+
+from uploadio.sources.catalog import JsonCatalogProvider
+from uploadio.sources.collection import SourceDefinition
+from uploadio.sources.parser import DBOutputParser, JSONEventParser
+
+
+@pytest.fixture(scope='function')
+def collection() -> SourceDefinition:
+    yield JsonCatalogProvider({
+        'namespace': 'test',
+        'version': '0.1',
+        'sources': {
+            'amounts': {
+                'source': {'type': 'csv', 'uri': 'amounts.csv'},
+                'parser': {'name': 'DBOut'},
+                'target': {},
+                'fields': [
+                    {'name': 'name', 'data_type': 'string'},
+                    {'name': 'amount', 'data_type': 'double',
+                     'transformations': [{
+                         'type': 'rule',
+                         'task': {'name': 'regexreplace',
+                                  'operator': {'old': '[^0-9]', 'new': ''}}
+                     }]}
+                ]
+            }
+        }
+    }).load('amounts')
+
+
+@pytest.fixture(scope='function')
+def source() -> pd.DataFrame:
+    yield pd.DataFrame({
+        'name': ['row{}'.format(i) for i in range(100)],
+        'amount': ['{} €'.format(i) for i in range(100)]
+    })
+
+
+def test_db_output_parser_workers(collection, source) -> None:
+    options = {'row_hash': True}
+    expected = DBOutputParser(
+        source=source, collection=collection, options=options
+    ).parse()
+    result = DBOutputParser(
+        source=source, collection=collection,
+        options=dict(options, workers=2, chunksize=30)
+    ).parse()
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_json_event_parser_workers(collection, source) -> None:
+    expected = list(JSONEventParser(
+        source=source, collection=collection).parse())
+    result = list(JSONEventParser(
+        source=source, collection=collection,
+        options={'workers': 2, 'chunksize': 30}
+    ).parse())
+    assert result == expected
@@ -0,0 +1,309 @@
+"""Test Pipeline"""
+import multiprocessing
+import os
+from typing import Any, Dict, List
+
+import pandas as pd
+import pytest
+
+from uploadio.common.db import Database, DBConnection
+from uploadio.sources.catalog import JsonCatalogProvider
+from uploadio.sources.collection import SourceDefinition
+from uploadio.sources.parser import DBOutputParser, ParserFactory
+from uploadio.sources.pipeline import Pipeline
+from uploadio.sources.target import DatabaseTarget, Target, TargetFactory
+from uploadio.utils import file_fingerprint
+
+
+class CollectingTarget(Target):
+
+    def _write(self, data: Any, *args, **kwargs) -> None:
+        self.config.setdefault('written', []).append((data, kwargs))
+
+    def close(self) -> None:
+        self.config['closed'] = self.config.get('closed', 0) + 1
+
+
+class BrokenTarget(CollectingTarget):
+
+    def _write(self, data: Any, *args, **kwargs) -> None:
+        raise ValueError("cannot write")
+
+    def close(self) -> None:
+        super().close()
+        raise IOError("cannot close")
+
+
+@pytest.fixture(scope='function')
+def catalog(tmpdir) -> Dict[str, Any]:
+    base_path = os.path.abspath(os.path.dirname(__file__))
+    yield {
+        'namespace': 'test',
+        'version': '0.1',
+        'sources': {
+            'people': {
+                'source': {
+                    'type': 'csv',
+                    'uri': os.path.join(base_path,
+                                        '../resources/test_data.csv'),
+                    'options': {'delimiter': ','}
+                },
+                'parser': {'name': 'DBOut', 'options': {'row_hash': True}},
+                'target': {
+                    'connection': {
+                        'uri': 'sqlite:///{}'.format(
+                            os.path.join(str(tmpdir), 'pipeline.db')),
+                        'table': 'people'
+                    }
+                },
+                'fields': [
+                    {'name': 'firstname', 'alias': 'first_name',
+                     'data_type': 'string',
+                     'transformations': [{
+                         'type': 'rule',
+                         'task': {'name': 'uppercase', 'operator': None}
+                     }]},
+                    {'name': 'lastname', 'data_type': 'string'},
+                    {'name': 'street', 'data_type': 'string'},
+                    {'name': 'city', 'data_type': 'string'},
+                    {'name': 'zipcode', 'data_type': 'string'}
+                ]
+            }
+        }
+    }
+
+
+@pytest.fixture(scope='function')
+def collection(catalog: Dict[str, Any]) -> SourceDefinition:
+    yield JsonCatalogProvider(catalog).load('people')
+
+
+def test_pipeline_chunks(collection: SourceDefinition) -> None:
+    target = CollectingTarget(config={})
+    metrics = Pipeline(collection, target, chunksize=2).run()
+    written: List = target.config['written']
+    expected = pd.read_csv(collection.source_config['uri'])
+    assert metrics.rows == len(expected)
+    assert metrics.chunks == len(written)
+    assert all(len(data) <= 2 for data, _ in written)
+    assert written[0][1] == {}
+    assert all(kw == {'if_exists': 'append'} for _, kw in written[1:])
+    result = pd.concat([data for data, _ in written])
+    assert list(result['first_name']) == \
+        [name.upper() for name in expected['firstname']]
+    assert result.index.is_unique
+
+
+def test_pipeline_to_database(collection: SourceDefinition) -> None:
+    target = DatabaseTarget(config=collection.target_config)
+    metrics = Pipeline(collection, target, chunksize=2).run()
+    db = Database(DBConnection(collection.target_config['connection']))
+    assert len(db.select("select * from people")) == metrics.rows
+
+
+def test_pipeline_propagates_errors(collection: SourceDefinition) -> None:
+    target = CollectingTarget(config={})
+    metrics = Pipeline(collection, target, chunksize=2).run()
+    assert target.config['closed'] == 1 and metrics.chunks > 1
+    # the error of the run is raised, not the one of closing the target
+    broken = BrokenTarget(config={})
+    with pytest.raises(ValueError):
+        Pipeline(collection, broken).run()
+    assert broken.config['closed'] == 1
+    collection.source_config['uri'] = '/does/not/exist.csv'
+    with pytest.raises(IOError):
+        Pipeline(collection, target).run()
+    # the target is closed, also if the run failed
+    assert target.config['closed'] == 2
+
+
+def test_pipeline_workers(collection: SourceDefinition) -> None:
+    sequential = CollectingTarget(config={})
+    Pipeline(collection, sequential, chunksize=2).run()
+    target = CollectingTarget(config={})
+    metrics = Pipeline(collection, target, chunksize=2, workers=2).run()
+    assert metrics.chunks == len(sequential.config['written'])
+    for (result, _), (expected, _) in zip(target.config['written'],
+                                          sequential.config['written']):
+        pd.testing.assert_frame_equal(result, expected)
+
+
+# shared with the forked parser processes
+BARRIER = multiprocessing.Barrier(2)
+
+
+class BarrierParser(DBOutputParser):
+    """ Only returns, while another chunk is parsed at the same time """
+
+    def parse(self, *args, **kwargs) -> Any:
+        BARRIER.wait(timeout=30)
+        return super().parse(*args, **kwargs)
+
+
+def test_pipeline_workers_run_concurrently(
+        tmpdir, collection: SourceDefinition) -> None:
+    ParserFactory.REGISTRY.register('Barrier', BarrierParser)
+    collection.parser_config['name'] = 'Barrier'
+    people = pd.read_csv(collection.source_config['uri'])
+    expected = pd.concat([people] * 4, ignore_index=True).head(8)
+    collection.source_config['uri'] = str(tmpdir.join('people.csv'))
+    expected.to_csv(collection.source_config['uri'], index=False)
+    target = CollectingTarget(config={})
+    # every chunk waits for a second one, parsing one at a time times out
+    metrics = Pipeline(collection, target, chunksize=2, workers=2).run()
+    assert metrics.chunks == 4
+    result = pd.concat([data for data, _ in target.config['written']])
+    assert list(result['lastname']) == list(expected['lastname'])
+
+
+class FailingTarget(DatabaseTarget):
+
+    def _write(self, data: Any, *args, checkpoint=None, **kwargs) -> None:
+        if checkpoint[1] == 2:
+            raise IOError("connection lost")
+        super()._write(data, *args, checkpoint=checkpoint, **kwargs)
+
+
+def test_pipeline_resumes_from_checkpoint(
+        tmpdir, collection: SourceDefinition) -> None:
+    expected = pd.concat(
+        [pd.read_csv(collection.source_config['uri'])] * 5, ignore_index=True
+    )
+    expected['lastname'] += expected.index.astype(str)
+    collection.source_config['uri'] = str(tmpdir.join('people.csv'))
+    expected.to_csv(collection.source_config['uri'], index=False)
+    with pytest.raises(IOError):
+        Pipeline(collection, FailingTarget(config=collection.target_config),
+                 chunksize=2, checkpoint=True).run()
+    db = Database(DBConnection(collection.target_config['connection']))
+    assert len(db.select("select * from people")) == 4
+
+    target = DatabaseTarget(config=collection.target_config)
+    metrics = Pipeline(collection, target, chunksize=2,
+                       checkpoint=True).run()
+    assert metrics.skipped_chunks == 2
+    assert metrics.rows == len(expected) - 4
+    people = db.select("select * from people")
+    assert len(people) == len(expected)
+    assert list(people['lastname']) == list(expected['lastname'])
+
+    # a committed file is not loaded again
+    metrics = Pipeline(collection, target, chunksize=2,
+                       checkpoint=True).run()
+    assert metrics.rows == 0
+    assert len(db.select("select * from people")) == len(expected)
+
+
+def test_replaced_table_clears_checkpoints(
+        tmpdir, collection: SourceDefinition) -> None:
+    first = collection.source_config['uri']
+    second = str(tmpdir.join('other.csv'))
+    pd.read_csv(first).head(2).to_csv(second, index=False)
+    target = DatabaseTarget(config=collection.target_config)
+    db = Database(DBConnection(collection.target_config['connection']))
+    rows = len(pd.read_csv(first))
+    Pipeline(collection, target, chunksize=2, checkpoint=True).run()
+    # replaces the table and with it the chunks of the first file
+    Pipeline(collection, target, chunksize=2, checkpoint=True).run(second)
+    assert len(db.select("select * from people")) == 2
+    metrics = Pipeline(collection, target, chunksize=2,
+                       checkpoint=True).run()
+    assert metrics.skipped_chunks == 0
+    assert len(db.select("select * from people")) == rows
+
+
+def test_fingerprint_changes_in_the_middle(tmpdir) -> None:
+    path = tmpdir.join('big.csv')
+    content = b'x' * (1 << 18)
+    path.write_binary(content)
+    before = file_fingerprint(str(path))
+    path.write_binary(content[:1 << 17] + b'y' + content[(1 << 17) + 1:])
+    assert file_fingerprint(str(path)) != before
+
+
+def test_pipeline_fan_out(tmpdir, catalog: Dict[str, Any]) -> None:
+    source = catalog['sources']['people']
+    path = str(tmpdir.join('people.parquet'))
+    source['target'] = [
+        source['target'],
+        {'type': 'parquet', 'connection': {'uri': path},
+         'options': {'types': {'zipcode': 'string'}}}
+    ]
+    collection = JsonCatalogProvider(catalog).load('people')
+    assert collection.target_config is collection.targets[0]
+    metrics = Pipeline(
+        collection, TargetFactory.load_all(collection.targets), chunksize=2
+    ).run()
+    db = Database(DBConnection(collection.target_config['connection']))
+    people = db.select("select * from people")
+    assert len(people) == metrics.rows
+    assert list(pd.read_parquet(path)['first_name']) == \
+        list(people['first_name'])
+
+
+def test_pipeline_fan_out_avro(tmpdir, catalog: Dict[str, Any]) -> None:
+    avro_datafile = pytest.importorskip('avro.datafile')
+    import avro.io
+    base_path = os.path.abspath(os.path.dirname(__file__))
+    source = catalog['sources']['people']
+    source['parser'] = {'name': 'JSONEvent'}
+    path = str(tmpdir.join('people.avro'))
+    source['target'] = [
+        {'type': 'avro', 'connection': {'uri': path},
+         'options': {'schema': os.path.join(
+             base_path, '../../resources/sandbox/schema_new.avsc')}},
+        {'type': 'log', 'options': {'log_every': 100}}
+    ]
+    collection = JsonCatalogProvider(catalog).load('people')
+    target = TargetFactory.load_all(collection.targets)
+    metrics = Pipeline(collection, target, chunksize=2).run()
+    with avro_datafile.DataFileReader(open(path, 'rb'),
+                                      avro.io.DatumReader()) as reader:
+        events = list(reader)
+    assert len(events) == metrics.rows > 2
+    assert events[0]['data']['fields']['first_name']['value'].isupper()
+
+
+def test_pipeline_profile(collection: SourceDefinition) -> None:
+    target = DatabaseTarget(config=collection.target_config)
+    metrics = Pipeline(collection, target, chunksize=2, profile=True).run()
+    expected = pd.read_csv(collection.source_config['uri'], dtype=str)
+    assert metrics.dropped_rows == 0
+    city = metrics.profile.columns['city']
+    assert city.count == len(expected)
+    assert city.distinct == expected['city'].nunique()
+    assert city.max == expected['city'].max()
+    assert city.max_length == expected['city'].str.len().max()
+    assert set(metrics.profile.columns) == \
+        {'first_name', 'lastname', 'street', 'city', 'zipcode'}
+
+    db = Database(DBConnection(collection.target_config['connection']))
+    profiles = db.select("select * from uploadio_profiles")
+    assert len(profiles) == 5
+    assert set(profiles['table_name']) == {'people'}
+    assert set(profiles['source_rows']) == {len(expected)}
+
+
+def test_pipeline_memory_budget(tmpdir, collection: SourceDefinition) -> None:
+    collection.parser_config['options']['row_hash'] = 'values'
+    people = pd.read_csv(collection.source_config['uri'])
+    expected = pd.concat([people] * 5000, ignore_index=True)
+    collection.source_config['uri'] = str(tmpdir.join('people.csv'))
+    expected.to_csv(collection.source_config['uri'], index=False)
+    target = CollectingTarget(config={})
+    metrics = Pipeline(collection, target, memory_budget=16 << 20).run()
+    written: List = target.config['written']
+    assert metrics.rows == len(expected)
+    assert metrics.bytes_per_row > 0
+    # the first chunk is measured, the source is resized after it
+    assert len(written[0][0]) == 1000
+    assert 1000 < metrics.chunksize < len(expected)
+    assert all(len(data) == metrics.chunksize for data, _ in written[1:-1])
+    assert 0 < metrics.write_chunksize <= metrics.chunksize
+    assert all(kw['chunksize'] == metrics.write_chunksize
+               for _, kw in written)
+
+    target = DatabaseTarget(config=collection.target_config)
+    Pipeline(collection, target, memory_budget=16 << 20).run()
+    db = Database(DBConnection(collection.target_config['connection']))
+    assert len(db.select("select * from people")) == len(expected)
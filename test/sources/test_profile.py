@@ -0,0 +1,40 @@
+"""Test column profiling"""
+import json
+
+import numpy as np
+import pandas as pd
+
+from uploadio.sources.profile import ColumnProfile, HyperLogLog, Profile
+
+
+def test_hyperloglog_merge() -> None:
+    first, second = HyperLogLog(), HyperLogLog()
+    first.add(pd.Series(np.arange(50000)))
+    second.add(pd.Series(np.arange(25000, 75000).astype(float)))
+    first.merge(second)
+    assert abs(first.estimate() - 75000) < 75000 * 0.05
+
+
+def test_column_profile() -> None:
+    column = ColumnProfile(name='zipcode')
+    column.update(pd.Series([22222, 23456]))
+    column.update(pd.Series(['01067', None, '']))
+    assert (column.count, column.nulls, column.distinct) == (5, 1, 4)
+    assert (column.min, column.max) == ('', '23456')
+    # the strings of the second chunk: one empty, one of 5 characters
+    assert column.lengths == [1, 0, 0, 1]
+    assert (column.min_length, column.max_length) == (0, 5)
+    record = column.to_dict()
+    assert json.loads(record['lengths']) == column.lengths
+
+
+def test_dropped_rows() -> None:
+    profile = Profile()
+    profile.update(pd.DataFrame({'amount': [1.5, 2.5]}), source_rows=3)
+    assert (profile.rows, profile.dropped) == (3, 1)
+    amount = profile.columns['amount']
+    assert (amount.min, amount.max) == (1.5, 2.5)
+    assert not amount.categorical()
+    records = profile.to_records(source='export.csv')
+    assert records[0]['source'] == 'export.csv'
+    assert records[0]['dropped_rows'] == 1
@@ -0,0 +1,59 @@
+"""Test the registry of sources, parsers, transformations and targets"""
+from collections import namedtuple
+
+import pytest
+
+from uploadio.common import registry
+from uploadio.common.registry import Registry
+from uploadio.sources.source import CSVSource, SourceFactory
+from uploadio.sources.target import LoggableTarget, TargetFactory
+from uploadio.sources.transformation import (TransformationFactory,
+                                             UppercaseRuleTransformation)
+
+class EntryPoint(namedtuple('EntryPoint', ['name', 'value'])):
+
+    loaded = []
+
+    def load(self):
+        self.loaded.append(self.name)
+        return registry.resolve(self.value)
+
+
+def test_builtins() -> None:
+    assert SourceFactory.REGISTRY.load('csv') is CSVSource
+    assert TransformationFactory.load('uppercase') \
+        is UppercaseRuleTransformation
+    target = TargetFactory.load({'type': 'log', 'options': {}})
+    assert isinstance(target, LoggableTarget)
+
+
+def test_entry_points(monkeypatch) -> None:
+    monkeypatch.setattr(registry, 'entry_points', lambda group: [
+        EntryPoint('ordered', 'collections:OrderedDict'),
+        EntryPoint('csv', 'collections:Counter')
+    ])
+    reg = Registry('uploadio.sources', {'csv': CSVSource})
+    assert reg.names() == ['csv', 'ordered']
+    # entry points are loaded on first use
+    assert EntryPoint.loaded == []
+    assert reg.load('ordered').__name__ == 'OrderedDict'
+    assert reg.load('ordered').__name__ == 'OrderedDict'
+    assert EntryPoint.loaded == ['ordered']
+    # entry points do not replace built-in names
+    assert reg.load('csv') is CSVSource
+
+
+def test_lazy_import(monkeypatch) -> None:
+    imported = []
+    monkeypatch.setattr(registry, 'resolve',
+                        lambda path: imported.append(path) or object)
+    reg = Registry('uploadio.targets', {'heavy': 'heavy.module:Target'})
+    assert imported == []
+    reg.load('heavy')
+    reg.load('heavy')
+    assert imported == ['heavy.module:Target']
+
+
+def test_unknown_name() -> None:
+    with pytest.raises(Exception):
+        Registry('uploadio.none').load('unknown')
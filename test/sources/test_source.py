@@ -1,9 +1,10 @@
 """Test Source Provider"""
+import json
 import os
 
 import pandas as pd
 import pytest
-from typing import Dict, Any
+from typing import Any, Dict, List
 from uploadio.sources import source as src
 
 
@@ -49,3 +50,197 @@ def test_source_factory() -> None:
     source = src.SourceFactory.load(config)
     assert isinstance(source, src.CSVSource)
     assert isinstance(source, src.Source)
+
+
+def test_stream_source_from_file(csv_path: str) -> None:
+    stream = src.StreamSource(
+        uri=csv_path,
+        options={'delimiter': ',', 'batch_size': 2}
+    )
+    batches = list(stream.batches())
+    expected = pd.read_csv(csv_path, sep=',')
+    assert all(len(batch) <= 2 for batch in batches)
+    assert sum(len(batch) for batch in batches) == len(expected)
+    assert list(batches[0].columns) == list(expected.columns)
+
+    # closed before it was consumed
+    stream = src.StreamSource(uri=csv_path, options={'delimiter': ','})
+    stream.close()
+    assert list(stream.batches()) == []
+
+
+def test_stream_source_from_queue() -> None:
+    from uploadio.common.messaging import InProcessTransport, Message
+    InProcessTransport('test_stream').send(Message.encode(
+        [b'{"city": "Hamburg", "zip": 20095}', b'{"city": "Berlin"}']
+    ))
+    stream = src.SourceFactory.load({
+        'type': 'stream',
+        'uri': 'queue://test_stream',
+        'options': {'format': 'json', 'batch_interval_ms': 50}
+    })
+    assert isinstance(stream, src.StreamSource)
+    batch = stream.load().data
+    stream.close()
+    assert list(batch['city']) == ['Hamburg', 'Berlin']
+    assert list(stream.batches()) == []
+    # the end of the stream was consumed, nothing blocks
+    assert list(stream.batches()) == []
+    assert stream.load().data.empty
+
+
+def test_csv_source_arrow_engine(csv_path: str) -> None:
+    pytest.importorskip('pyarrow')
+    expected = src.CSVSource(uri=csv_path).load(sep=',').data
+    arrow = src.CSVSource(
+        uri=csv_path, options={'engine': 'arrow', 'delimiter': ','}
+    )
+    pd.testing.assert_frame_equal(arrow.load().data, expected)
+    chunks = list(arrow.chunks(chunksize=2))
+    assert [len(chunk) for chunk in chunks] == [2, len(expected) - 2]
+    assert list(chunks[1].index) == list(expected.index[2:])
+
+    arrow.options['skiprows'] = [1, 2]
+    with pytest.raises(ValueError, match='skiprows'):
+        arrow.load()
+
+
+def test_csv_source_projection(csv_path: str) -> None:
+    columns = ['lastname', 'city']
+    source = src.SourceFactory.load(
+        {'type': 'csv', 'uri': csv_path, 'options': {'delimiter': ','}},
+        columns=columns
+    )
+    assert list(source.load().data.columns) == columns
+    assert list(pd.concat(source.chunks(chunksize=2)).columns) == columns
+    pytest.importorskip('pyarrow')
+    source.options['engine'] = 'arrow'
+    assert list(source.load().data.columns) == columns
+
+
+@pytest.fixture(scope='function')
+def records() -> List[Dict[str, Any]]:
+    yield [
+        {'quote': 'q{}'.format(i), 'author': {'name': 'a{}'.format(i)},
+         'rating': i / 2}
+        for i in range(5)
+    ]
+
+
+def test_json_source_chunks_array(tmpdir, records) -> None:
+    path = str(tmpdir.join('array.json'))
+    with open(path, 'w') as f:
+        json.dump(records, f, indent=2)
+    source = src.JSONSource(uri=path, columns=['quote', 'author.name'])
+    chunks = list(source.chunks(chunksize=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    data = pd.concat(chunks)
+    assert list(data.columns) == ['quote', 'author.name']
+    assert list(data['author.name']) == [r['author']['name'] for r in records]
+    assert list(data.index) == list(range(5))
+
+
+def test_json_source_chunks_lines(tmpdir, records) -> None:
+    path = str(tmpdir.join('records.ndjson'))
+    with open(path, 'w') as f:
+        f.write('\n'.join(json.dumps(r) for r in records) + '\n')
+    source = src.JSONSource(uri=path, options={'lines': True})
+    data = pd.concat(source.chunks(chunksize=3))
+    assert list(data['rating']) == [r['rating'] for r in records]
+    assert source.load().data == records
+
+
+def test_json_source_chunks_record_path(tmpdir, records) -> None:
+    path = str(tmpdir.join('nested.json'))
+    with open(path, 'w') as f:
+        json.dump({'meta': {}, 'data': {'items': records}}, f)
+    source = src.JSONSource(uri=path, options={'record_path': 'data.items'})
+    data = pd.concat(source.chunks(chunksize=2))
+    assert list(data['quote']) == [r['quote'] for r in records]
+
+
+def test_csv_source_compressed(tmpdir, csv_path: str) -> None:
+    import gzip
+    import zipfile
+    expected = src.CSVSource(uri=csv_path).load(sep=',').data
+    with open(csv_path, 'rb') as f:
+        content = f.read()
+    gz_path = str(tmpdir.join('test_data.csv.gz'))
+    with gzip.open(gz_path, 'wb') as f:
+        f.write(content)
+    source = src.CSVSource(uri=gz_path, options={'delimiter': ','})
+    pd.testing.assert_frame_equal(source.load().data, expected)
+
+    # every member of an archive is a part of the source
+    zip_path = str(tmpdir.join('export.zip'))
+    with zipfile.ZipFile(zip_path, 'w') as archive:
+        archive.writestr('part-1.csv', content)
+        archive.writestr('part-2.csv', content)
+        # neither resource forks of macOS nor other files are read
+        archive.writestr('__MACOSX/._part-1.csv', b'\x00\x05\x16\x07')
+        archive.writestr('README.txt', b'two parts')
+    source = src.CSVSource(uri=zip_path, options={'delimiter': ','})
+    data = pd.concat(source.chunks(chunksize=2))
+    assert len(data) == 2 * len(expected)
+    assert list(data.index) == list(range(len(data)))
+    assert list(data['lastname']) == 2 * list(expected['lastname'])
+    pytest.importorskip('pyarrow')
+    source.options['engine'] = 'arrow'
+    assert len(source.load().data) == 2 * len(expected)
+
+
+def test_json_source_compressed(tmpdir, records) -> None:
+    import gzip
+    path = str(tmpdir.join('records.ndjson.gz'))
+    with gzip.open(path, 'wt') as f:
+        f.write('\n'.join(json.dumps(r) for r in records) + '\n')
+    source = src.JSONSource(uri=path, options={'lines': True})
+    data = pd.concat(source.chunks(chunksize=2))
+    assert list(data['quote']) == [r['quote'] for r in records]
+
+    path = str(tmpdir.join('array.json.gz'))
+    with gzip.open(path, 'wt') as f:
+        json.dump(records, f)
+    assert src.JSONSource(uri=path).load().data == records
+    assert len(pd.concat(src.JSONSource(uri=path).chunks(chunksize=2))) == 5
+
+    zstandard = pytest.importorskip('zstandard')
+    path = str(tmpdir.join('records.ndjson.zst'))
+    with open(path, 'wb') as f:
+        f.write(zstandard.ZstdCompressor().compress(
+            '\n'.join(json.dumps(r) for r in records).encode('utf-8')
+        ))
+    source = src.JSONSource(uri=path, options={'lines': True})
+    data = pd.concat(source.chunks(chunksize=2))
+    assert list(data['quote']) == [r['quote'] for r in records]
+
+
+def test_tail_source(tmpdir) -> None:
+    from uploadio.sources.offsets import OffsetStore
+    path = str(tmpdir.join('log.csv'))
+    store = OffsetStore(str(tmpdir.join('offsets.json')))
+    with open(path, 'w') as f:
+        f.write('id,name\n1,a\n2,b\n3,')
+
+    def delta() -> pd.DataFrame:
+        source = src.TailSource(uri=path, position=store.get(path))
+        frames = list(source.chunks(chunksize=1))
+        store.commit(path, source.position)
+        return pd.concat(frames) if frames else None
+
+    # the incomplete last line is left for the next call
+    data = delta()
+    assert list(data['id']) == [1, 2]
+    assert delta() is None
+    with open(path, 'a') as f:
+        f.write('c\n4,d\n')
+    data = delta()
+    assert list(data['name']) == ['c', 'd']
+    assert list(data.index) == [2, 3]
+
+    # the offsets survive a restart
+    store = OffsetStore(str(tmpdir.join('offsets.json')))
+    assert store.get(path).rows == 4
+    with open(path, 'w') as f:
+        f.write('id,name\n5,e\n')
+    assert list(delta()['id']) == [5]
@@ -0,0 +1,249 @@
+"""Test Targets"""
+import json
+import os
+import threading
+import time
+from typing import Any
+
+import pandas as pd
+import pytest
+
+from uploadio.common.messaging import (BatchProducer, Compression,
+                                       FileTransport, InProcessTransport,
+                                       Message)
+from uploadio.sources.spool import Spool
+from uploadio.sources.target import (FanOutTarget, MessageQueueTarget,
+                                     SpoolTarget, Target, TargetFactory)
+
+
+class EventParser:
+
+    def __init__(self, rows: int) -> None:
+        self.rows = rows
+
+    def parse(self, **kwargs):
+        for i in range(self.rows):
+            yield dict(
+                index=str(i),
+                fields={'amount': dict(value=str(i), datatype='double',
+                                       mandatory=True)}
+            )
+
+
+class SlowTarget(Target):
+
+    def _write(self, data: Any, *args, **kwargs) -> None:
+        time.sleep(self.config.get('delay', 0))
+        if self.config.get('fail', False):
+            raise ValueError("broken target")
+        self.config.setdefault('written', []).append(
+            (data, threading.current_thread().name)
+        )
+
+
+@pytest.fixture(scope='function')
+def queue_file(tmpdir) -> str:
+    yield os.path.join(str(tmpdir), 'events.queue')
+
+
+def test_message_roundtrip() -> None:
+    records = [b'a', b'', b'xyz' * 100]
+    for compression in [Compression.NONE, Compression.GZIP, Compression.ZLIB]:
+        message = Message.encode(records, compression)
+        assert message.count == 3
+        assert message.records() == records
+
+
+def test_producer_batches_and_backpressure() -> None:
+    # the linger time never passes, only full batches and flush() send
+    producer = BatchProducer(
+        InProcessTransport('test_producer'),
+        batch_size=10, linger_ms=3600 * 1000, max_in_flight=5
+    )
+    for i in range(25):
+        producer.send(str(i).encode())
+    producer.flush()
+    assert producer.sent == 25
+    producer.send(b'25')
+    producer.flush()
+    producer.close()
+    messages = []
+    while True:
+        message = InProcessTransport.receive('test_producer', timeout=0)
+        if message is None:
+            break
+        messages.append(message)
+    assert [m.count for m in messages] == [10, 10, 5, 1]
+    assert messages[-1].records() == [b'25']
+
+
+def test_message_queue_target(queue_file: str) -> None:
+    config = {
+        'connection': {'transport': 'file', 'uri': queue_file},
+        'options': {'batch_size': 4, 'compression': 'gzip'}
+    }
+    MessageQueueTarget(config=config, parser=EventParser(10)).output(
+        namespace='test', version='0.1', source='events'
+    )
+    messages = list(FileTransport.read(queue_file))
+    assert [m.count for m in messages] == [4, 4, 2]
+    events = [json.loads(r) for m in messages for r in m.records()]
+    assert [e['data']['index'] for e in events] == [str(i) for i in range(10)]
+    assert events[0]['namespace'] == 'test'
+    assert events[0]['columns'] == ['amount']
+
+    # the Avro schema is part of the catalog
+    pytest.importorskip('avro')
+    base_path = os.path.abspath(os.path.dirname(__file__))
+    config['options'].update(encoding='avro', schema=os.path.join(
+        base_path, '../../resources/sandbox/schema_new.avsc'))
+    target = TargetFactory.load(dict(config, type='queue'))
+    target.write(list(EventParser(3).parse()))
+    assert [m.count for m in FileTransport.read(queue_file)][-1] == 3
+
+
+def test_parquet_target(tmpdir) -> None:
+    path = os.path.join(str(tmpdir), 'people.parquet')
+    target = TargetFactory.load(
+        {'type': 'parquet', 'connection': {'uri': path}}
+    )
+    target.write(pd.DataFrame({'name': ['a', 'b'], 'note': [None, None]}))
+    target.write(pd.DataFrame({'name': ['c'], 'note': ['x']}),
+                 if_exists='append')
+    target.close()
+    result = pd.read_parquet(path)
+    assert list(result['name']) == ['a', 'b', 'c']
+    assert list(result['note'])[-1] == 'x'
+    # a new run, which appends, does not overwrite the file
+    target.write(pd.DataFrame({'name': ['d']}), if_exists='append')
+    target.close()
+    assert target.path != path
+    assert list(pd.read_parquet(target.path)['name']) == ['d']
+
+
+def test_fan_out_target() -> None:
+    slow = SlowTarget(config={'delay': 0.05, 'options': {'buffer_size': 1}})
+    fast = SlowTarget(config={})
+    target = FanOutTarget(config={}, targets=[slow, fast])
+    chunks = [pd.DataFrame({'i': [i]}) for i in range(5)]
+    for chunk in chunks:
+        target.write(chunk)
+    target.close()
+    for consumer in [slow, fast]:
+        written = consumer.config['written']
+        # every target received the same (not copied) chunks in order
+        assert len(written) == len(chunks)
+        assert all(a is b for (a, _), b in zip(written, chunks))
+        assert threading.current_thread().name not in \
+            {name for _, name in written}
+
+
+def test_fan_out_target_error() -> None:
+    target = FanOutTarget(config={}, targets=[
+        SlowTarget(config={'fail': True}), SlowTarget(config={})
+    ])
+    with pytest.raises(ValueError):
+        for i in range(10):
+            target.write([i])
+        target.close()
+
+
+def test_embedded_database_target(tmpdir) -> None:
+    config = {
+        'connection': {
+            'uri': 'sqlite:///{}'.format(tmpdir.join('embedded.db')),
+            'table': 'people',
+            'options': {'pragmas': {'synchronous': 'OFF'}}
+        },
+        'options': {'upsert': True}
+    }
+    target = TargetFactory.load(config)
+    target.db.create_table([('name', 'text'), ('row_hash', 'text')],
+                           primary_key=['row_hash'])
+    first = pd.DataFrame({'name': ['a', 'b']},
+                         index=pd.Index(['1', '2'], name='row_hash'))
+    overlap = pd.DataFrame({'name': ['B', 'c']},
+                           index=pd.Index(['2', '3'], name='row_hash'))
+    target.write(first)
+    target.write(overlap)
+    people = target.db.select("select * from people order by row_hash")
+    assert list(people['name']) == ['a', 'B', 'c']
+    pragmas = target.db.select("pragma journal_mode")
+    assert pragmas.iloc[0, 0] == 'wal'
+    assert target.db.select("pragma synchronous").iloc[0, 0] == 0
+
+
+class FlakyTarget(Target):
+
+    def _write(self, data: Any, *args, **kwargs) -> None:
+        self.config['attempts'] = self.config.get('attempts', 0) + 1
+        if self.config['attempts'] <= self.config['failures']:
+            raise IOError("database is down")
+        self.config.setdefault('written', []).append((data, kwargs))
+
+
+def spool_config(directory: str, **options) -> dict:
+    return {'options': {'spool': dict(directory=directory, backoff=0.01,
+                                      **options)}}
+
+
+def test_spool_target(tmpdir) -> None:
+    directory = str(tmpdir.join('spool'))
+    flaky = FlakyTarget(config={'failures': 2})
+    target = SpoolTarget(config=spool_config(directory), target=flaky)
+    chunks = [pd.DataFrame({'n': [i, i + 1]},
+                           index=pd.Index(['a', 'b'], name='row_hash'))
+              for i in range(3)]
+    for index, chunk in enumerate(chunks):
+        target.write(chunk, if_exists='append', checkpoint=('f', index))
+    assert target.last_checkpoint('f') == 2
+    target.close()
+    written = flaky.config['written']
+    assert flaky.config['attempts'] == 5
+    assert [kwargs['checkpoint'] for _, kwargs in written] == \
+        [('f', 0), ('f', 1), ('f', 2)]
+    for (data, _), chunk in zip(written, chunks):
+        pd.testing.assert_frame_equal(data, chunk)
+    assert target.spool.segments() == []
+
+
+def test_spool_target_gives_up(tmpdir) -> None:
+    directory = str(tmpdir.join('spool'))
+    target = SpoolTarget(config=spool_config(directory, retries=1),
+                         target=FlakyTarget(config={'failures': 10}))
+    target.write([{'n': 1}])
+    with pytest.raises(IOError):
+        target.close()
+    assert os.listdir(os.path.join(directory, 'failed'))
+
+
+def test_spool_replays_previous_segments(tmpdir) -> None:
+    TargetFactory.REGISTRY.register('flaky', FlakyTarget)
+    directory = str(tmpdir.join('spool'))
+    # segments of a previous process, which could not be written
+    Spool(directory).put(pd.DataFrame({'n': [1]}), {'if_exists': 'replace'})
+    target = TargetFactory.load(dict(
+        spool_config(directory), type='flaky', failures=0
+    ))
+    target.write(pd.DataFrame({'n': [2]}), if_exists='append')
+    target.close()
+    written = target.target.config['written']
+    assert [kwargs for _, kwargs in written] == \
+        [{'if_exists': 'replace'}, {'if_exists': 'append'}]
+
+
+def test_spool_skips_corrupt_segments(tmpdir) -> None:
+    directory = str(tmpdir.join('spool'))
+    spool = Spool(directory)
+    corrupt = spool.put(pd.DataFrame({'n': [1]}), {'if_exists': 'append'})
+    with open(os.path.join(directory, f"{corrupt}.parquet"), 'wb') as data:
+        data.write(b'PAR1 truncated')
+    spool.put([{'n': 2}], {'if_exists': 'append'}, args=['people'])
+    written = []
+    spool.start(lambda data, *args, **options:
+                written.append((data, args, options)))
+    assert spool.join(timeout=5)
+    assert written == [([{'n': 2}], ('people',), {'if_exists': 'append'})]
+    assert spool.failed == [corrupt]
+    assert sorted(os.listdir(os.path.join(directory, 'failed'))) == \
+        [f"{corrupt}.json", f"{corrupt}.parquet"]
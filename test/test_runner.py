@@ -0,0 +1,119 @@
+"""Test the runner's batch mode"""
+import json
+import os
+from typing import Any, Dict
+
+import pandas as pd
+import pytest
+
+import runner
+from uploadio.common.db import Database, DBConnection
+
+BASE_PATH = os.path.abspath(os.path.dirname(__file__))
+
+
+@pytest.fixture(scope='function')
+def catalog(tmpdir) -> str:
+    config: Dict[str, Any] = {
+        'namespace': 'test',
+        'version': '0.1',
+        'sources': {
+            'people': {
+                'source': {
+                    'type': 'csv',
+                    'uri': 'people.csv',
+                    'options': {'delimiter': ','}
+                },
+                'parser': {'name': 'DBOut', 'options': {'row_hash': True}},
+                'target': {
+                    'connection': {
+                        'uri': 'sqlite:///{}'.format(tmpdir.join('runner.db')),
+                        'table': 'people'
+                    },
+                    'options': {'row_hash': True}
+                },
+                'fields': [
+                    {'name': name, 'data_type': 'string'}
+                    for name in ['firstname', 'lastname', 'street', 'city',
+                                 'zipcode']
+                ]
+            }
+        }
+    }
+    path = str(tmpdir.join('catalog.json'))
+    with open(path, 'w') as f:
+        json.dump(config, f)
+    yield path
+
+
+def test_batch(tmpdir, catalog: str, capsys) -> None:
+    data = pd.read_csv(os.path.join(BASE_PATH, 'resources/test_data.csv'))
+    for i in range(3):
+        data.assign(lastname=data['lastname'] + str(i)).to_csv(
+            str(tmpdir.join('people-{}.csv'.format(i))), index=False
+        )
+    rows = 3 * len(data)
+    files = [str(tmpdir.join('people-*.csv'))]
+    assert runner.batch(files, catalog, 'people', parallel=2) == 0
+    out = capsys.readouterr().out
+    assert '3 files, {} rows, 0 failed'.format(rows) in out
+
+    db = Database(DBConnection({
+        'uri': 'sqlite:///{}'.format(tmpdir.join('runner.db')),
+        'table': 'people'
+    }))
+    assert len(db.select("select * from people")) == rows
+
+
+def test_batch_exit_status(tmpdir, catalog: str) -> None:
+    assert runner.batch([str(tmpdir.join('*.csv'))], catalog, 'people') == 2
+    broken = str(tmpdir.join('broken.csv'))
+    with open(broken, 'w') as f:
+        f.write('unknown,columns\n1,2\n')
+    assert runner.batch([broken], catalog, 'people') == 1
+
+
+def test_router(tmpdir, catalog: str) -> None:
+    with open(catalog) as f:
+        config = json.load(f)
+    people = config['sources']['people']
+    incoming = tmpdir.mkdir('incoming')
+    people['source'].update(directory=str(incoming), pattern='people_*.csv')
+    people['target']['options']['if_exists'] = 'append'
+    config['sources']['customers'] = json.loads(json.dumps(people))
+    customers = config['sources']['customers']
+    customers['source']['pattern'] = ['customers_*.csv']
+    customers['target']['connection']['table'] = 'customers'
+    with open(catalog, 'w') as f:
+        json.dump(config, f)
+
+    router = runner.Router.load([catalog], parallel=2)
+    assert router.directories == [str(incoming)]
+    data = pd.read_csv(os.path.join(BASE_PATH, 'resources/test_data.csv'))
+    files = ['people_1.csv', 'people_2.csv.gz', 'customers_1.csv']
+    for i, name in enumerate(files):
+        data.assign(lastname=data['lastname'] + str(i)).to_csv(
+            str(incoming.join(name)), index=False
+        )
+    assert router.route(str(incoming.join('people_2.csv.gz'))) \
+        is router.handlers[0]
+    assert not router.submit(str(incoming.join('unknown.csv')))
+    assert all(router.submit(str(incoming.join(name))) for name in files)
+    router.close()
+
+    db = Database(DBConnection(people['target']['connection']))
+    assert len(db.select("select * from people")) == 2 * len(data)
+    assert len(db.select("select * from customers")) == len(data)
+
+
+def test_infer_ndjson(tmpdir) -> None:
+    uri = str(tmpdir.join('orders.ndjson'))
+    with open(uri, 'w') as f:
+        f.write('{"id": 1, "city": "Hamburg"}\n{"id": 2, "city": "Berlin"}\n')
+    catalog = str(tmpdir.join('catalog_orders.json'))
+    runner.infer(uri, catalog, 'orders')
+    with open(catalog) as f:
+        source = json.load(f)['sources']['orders']
+    assert source['source'] == {'type': 'json', 'uri': uri,
+                                'options': {'lines': True}}
+    assert [field['name'] for field in source['fields']] == ['id', 'city']
@@ -0,0 +1,126 @@
+import fnmatch
+import io
+import os
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+# file extension -> compression
+EXTENSIONS = {
+    '.gz': 'gzip',
+    '.gzip': 'gzip',
+    '.bz2': 'bz2',
+    '.xz': 'xz',
+    '.zst': 'zstd',
+    '.zip': 'zip'
+}
+
+
+def compression(uri: str) -> Optional[str]:
+    """
+    Detects the compression of a file by its extension
+    Example:
+        >>> compression('auszug.csv.gz'), compression('auszug.csv')
+        ('gzip', None)
+    """
+    return EXTENSIONS.get(os.path.splitext(uri)[1].lower(), None)
+
+
+def strip_extension(uri: str) -> str:
+    """
+    Name of the file inside a compressed file
+    Example:
+        >>> strip_extension('/tmp/auszug.csv.zst')
+        '/tmp/auszug.csv'
+    """
+    return os.path.splitext(uri)[0] if compression(uri) else uri
+
+
+def patterns(base: List[str]) -> List[str]:
+    """
+    Extends file name patterns with all compressed variants
+    Example:
+        >>> patterns(['*.csv'])[:3]
+        ['*.csv', '*.csv.gz', '*.csv.gzip']
+    """
+    res = []
+    for pattern in base:
+        res.append(pattern)
+        res.extend(pattern + ext for ext, c in EXTENSIONS.items()
+                   if c != 'zip')
+    return res + ['*.zip']
+
+
+def open_stream(uri: str) -> BinaryIO:
+    """
+    Opens a (compressed) file as binary stream,
+    which decompresses incrementally while reading
+    """
+    codec = compression(uri)
+    if codec == 'gzip':
+        import gzip
+        return gzip.open(uri, 'rb')
+    if codec == 'bz2':
+        import bz2
+        return bz2.open(uri, 'rb')
+    if codec == 'xz':
+        import lzma
+        return lzma.open(uri, 'rb')
+    if codec == 'zstd':
+        import zstandard
+        # buffered, so that it can be iterated by line (e.g. NDJSON)
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(
+            open(uri, 'rb'), closefd=True
+        ))
+    if codec == 'zip':
+        raise ValueError(f"'{uri}' is an archive, use members() instead")
+    return open(uri, 'rb')
+
+
+def is_member(name: str, patterns: List[str] = None) -> bool:
+    """
+    Whether a file of a zip archive is part of the source: not a directory
+    or a resource fork of macOS (__MACOSX/) and its file name matches one
+    of the `patterns` (case-insensitive, all files if None)
+    Example:
+        >>> is_member('2019/auszug.CSV', ['*.csv'])
+        True
+        >>> is_member('__MACOSX/2019/._auszug.csv', ['*.csv'])
+        False
+        >>> is_member('2019/README.txt', ['*.csv'])
+        False
+    """
+    if name.endswith('/') or name.startswith('__MACOSX/'):
+        return False
+    base = os.path.basename(name).lower()
+    return patterns is None or any(fnmatch.fnmatch(base, pattern.lower())
+                                   for pattern in patterns)
+
+
+@contextmanager
+def members(uri: str, patterns: List[str] = None
+            ) -> Iterator[Iterator[Tuple[str, BinaryIO]]]:
+    """
+    Context manager, which provides an iterator over the files of `uri`
+    as (name, binary stream) tuples. A zip archive is treated as a
+    directory of files (in archive order), which match the file name
+    `patterns` (see :py:func:`is_member`), any other file as a single
+    member, which is decompressed while reading.
+    Example:
+        with members('export.zip') as files:
+            for name, stream in files:
+                ...
+    """
+    if compression(uri) != 'zip':
+        with open_stream(uri) as stream:
+            yield iter([(strip_extension(uri), stream)])
+        return
+
+    import zipfile
+    with zipfile.ZipFile(uri) as archive:
+        def iterate() -> Iterator[Tuple[str, BinaryIO]]:
+            for info in archive.infolist():
+                if not is_member(info.filename, patterns):
+                    continue
+                with archive.open(info) as stream:
+                    yield info.filename, stream
+        yield iterate()
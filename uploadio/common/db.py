@@ -1,15 +1,61 @@
+from __future__ import annotations
+
+import datetime
+import threading
 from abc import abstractmethod
-from typing import Any, Dict, Iterable, Optional
+from typing import (TYPE_CHECKING, Any, Dict, Iterable, Iterator, Optional,
+                    Tuple, Union)
 
 import attr
 import schema
-from pandas import DataFrame
-from sqlalchemy import create_engine
-from sqlalchemy.engine.base import Connection, Engine
-from sqlalchemy.sql import text
 
 from src.p3common.common import validators as validate
-from uploadio.utils import Loggable
+from uploadio.utils import LazyModule, Loggable
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
+    from sqlalchemy import Table
+    from sqlalchemy.engine.base import Connection, Engine
+    from sqlalchemy.sql.base import Executable
+    from uploadio.common.statements import StatementCache
+
+pd = LazyModule('pandas')
+sa = LazyModule('sqlalchemy')
+statements = LazyModule('uploadio.common.statements')
+
+
+# control table, which records the committed chunks of every source file
+CHECKPOINT_TABLE = 'uploadio_checkpoints'
+# control table, which records the column statistics of every upload
+PROFILE_TABLE = 'uploadio_profiles'
+
+_ENGINES: Dict[str, Engine] = {}
+_STATEMENTS: Dict[str, StatementCache] = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def engine(uri: str, pragmas: Dict[str, Any] = None) -> Engine:
+    """
+    One engine (and with it one connection pool) per database URI,
+    shared by all connections of the process.
+    Embedded SQLite databases are tuned for bulk appends (WAL journal,
+    see :py:data:`statements.SQLITE_PRAGMAS`)
+    :param pragmas: further SQLite PRAGMAs, used when the engine is created
+    """
+    with _ENGINES_LOCK:
+        if uri not in _ENGINES:
+            created = sa.create_engine(uri, **statements.engine_options(uri))
+            if created.dialect.name == 'sqlite':
+                statements.configure_sqlite(created, pragmas)
+            _ENGINES[uri] = created
+            _STATEMENTS[uri] = statements.StatementCache()
+        return _ENGINES[uri]
+
+
+def statement_cache(uri: str) -> StatementCache:
+    """ Tables and compiled statements of the engine of `uri` """
+    engine(uri)
+    return _STATEMENTS[uri]
 
 
 @attr.s
@@ -45,12 +91,13 @@ class DBConnection(Loggable):
 
     def __attrs_post_init__(self) -> None:        
         self.config = self.connection_schema.validate(self.config)
-        self.engine = create_engine(self.config['uri'])
+        self.engine = engine(
+            self.config['uri'],
+            pragmas=self.config['options'].get('pragmas', None)
+        )
         
     def connect(self) -> Connection:
-        self.logger.debug(
-            "Establishing DB connection with {}".format(self.__repr__())
-        )
+        self.logger.debug("Establishing DB connection with %r", self)
         self.connection = self.engine.connect()
         return self.connection
 
@@ -72,53 +119,282 @@ class Database(Loggable):
     """
 
     connection: DBConnection = attr.ib()
+    checkpoints: Table = attr.ib(init=False, default=None, repr=False)
+    profiles: Table = attr.ib(init=False, default=None, repr=False)
 
-    def execute(self, statement: str, modify: bool = False,
+    def execute(self, statement: Union[str, Executable],
+                modify: bool = False,
                 data: Iterable = None) -> Optional[DataFrame]:
         """
         Executes a generic SQL statement on a `DBConnection`
 
-        :param statement: valid (for specified engine) SQL statement
+        :param statement: valid (for specified engine) SQL statement with
+            bind parameters (e.g. ':name') or a SQLAlchemy Core construct
         :param modify: True if SQL modifies table entries (e.g. insert, update)
-        :param data: specify a fixed VALUES clause for an INSERT statement,
-                    or the SET clause for an UPDATE
+        :param data: the bound parameters, a list of them executes the
+            statement once per element (executemany)
         """
-        data = [] if not data else data
         conn = self.connection.connect()
         try:
-            self.logger.info(statement)
+            self.logger.debug("Executing statement: %s", statement)
+            statement = statements.sql(statement)
+            result = conn.execute(statement, data) if data \
+                else conn.execute(statement)
             if not modify:
-                result = conn.execute(statement)
                 rows = result.fetchall()
                 column_names = list(result.keys())
-                return DataFrame(rows, columns=column_names)
-            else:
-                conn.execute(statement, data)
-                return None
+                return pd.DataFrame(rows, columns=column_names)
+            return None
         except Exception:
-            import traceback
-            self.logger.error(
-                "Error when executing database transaction: {}".format(
-                    traceback.format_exc()
-                )
+            self.logger.exception(
+                "Error when executing database transaction: %s", statement
             )
         finally:
             self.connection.close()
 
         return None  
 
-    def select(self, statement: str, **options) -> DataFrame:
+    def select(self, statement: Union[str, Executable],
+               **options) -> DataFrame:
         return self.execute(statement, **options)
 
-    def insert(self, data: DataFrame, chunksize: int = 100) -> None:
-        self.connection.connect()
-        data.to_sql(
-            self.connection.config['table'], 
-            con=self.connection.engine,
-            if_exists='replace',
-            chunksize=chunksize,
-            schema=self.connection.config['options'].get('schema', None)
+    def select_chunks(self, statement: Union[str, Executable],
+                      chunksize: int = 10000, arrow: bool = False,
+                      params: Dict[str, Any] = None) -> Iterator[Any]:
+        """
+        Streams the result of a query in chunks of `chunksize` rows, so a
+        table can be read (e.g. verified or exported) in constant memory.
+
+        The rows are fetched from a server-side cursor (``stream_results``),
+        drivers without server-side cursors (e.g. sqlite) fetch row by row
+        from the client-side cursor. Unlike :py:meth:`execute` errors are
+        raised. The cursor is closed, when the iterator is exhausted or
+        garbage collected.
+
+        :param statement: SQL query or a SQLAlchemy Core construct,
+            e.g. ``database.table().select()``
+        :param chunksize: max. number of rows per chunk
+        :param arrow: yield :py:class:`pyarrow.Table` instead of DataFrames
+        :param params: bound parameters of the statement
+        """
+        if arrow:
+            import pyarrow as pa
+        self.logger.debug("Streaming statement: %s", statement)
+        with self.connection.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(
+                statements.sql(statement), params or {}
+            )
+            try:
+                columns = list(result.keys())
+                while True:
+                    rows = result.fetchmany(chunksize)
+                    if not rows:
+                        return
+                    if arrow:
+                        yield pa.Table.from_pydict({
+                            column: list(values) for column, values
+                            in zip(columns, zip(*rows))
+                        })
+                    else:
+                        yield pd.DataFrame.from_records(rows, columns=columns)
+            finally:
+                result.close()
+
+    def table(self) -> Table:
+        """ The configured table, reflected once and cached """
+        return self.__statements.table(
+            self.connection.engine, self.__table, schema=self.__schema
+        )
+
+    def has_table(self) -> bool:
+        with self.connection.engine.connect() as conn:
+            return self.connection.engine.dialect.has_table(
+                conn, self.__table, schema=self.__schema
+            )
+
+    def count(self) -> int:
+        """ Rows of the configured table, 0 if it does not exist """
+        if not self.has_table():
+            return 0
+        statement = sa.select([sa.func.count()]).select_from(self.table())
+        with self.connection.engine.connect() as conn:
+            return conn.execute(statement).scalar()
+
+    def create_table(self, columns: Iterable[Tuple[str, str]],
+                     primary_key: Iterable[str] = (),
+                     replace: bool = False) -> None:
+        """
+        Creates the configured table, if it does not exist
+        :param columns: (name, dialect type) of every column
+        :param primary_key: names of the primary key columns
+        :param replace: drop an existing table first
+        """
+        table = statements.define_table(
+            self.__table, columns, primary_key, schema=self.__schema
+        )
+        with self.connection.engine.begin() as conn:
+            if replace:
+                table.drop(conn, checkfirst=True)
+            table.create(conn, checkfirst=True)
+        self.__statements.invalidate(self.__table, self.__schema)
+
+    def insert(self, data: DataFrame, chunksize: int = 100,
+               if_exists: str = 'replace',
+               checkpoint: Tuple[str, int] = None,
+               upsert: bool = False) -> None:
+        """
+        Bulk inserts a DataFrame (including its index, like
+        ``DataFrame.to_sql``) into the configured table.
+
+        A missing table is created from the DataFrame. The rows are bound
+        to the cached INSERT statement of the table and sent with
+        executemany, `chunksize` rows at a time (only the parameters of
+        one executemany are in memory at once).
+
+        :param if_exists: 'replace' the table or 'append' to it
+        :param checkpoint: (fingerprint, chunk index) of the data, which is
+            recorded in the control table in the same transaction as the
+            rows (see :py:meth:`last_checkpoint`)
+        :param upsert: replace rows with the same primary key (e.g. row_hash)
+            instead of failing, requires a table with a primary key
+        """
+        with self.connection.engine.begin() as conn:
+            table = self.__prepare(conn, data, if_exists)
+            conn = conn.execution_options(
+                compiled_cache=self.__statements.compiled
+            )
+            insert = self.__statements.insert(
+                table, self.connection.engine.dialect.name, upsert=upsert
+            )
+            step = chunksize or len(data) or 1
+            for start in range(0, len(data), step):
+                conn.execute(
+                    insert, statements.records(data.iloc[start:start + step])
+                )
+            if checkpoint is None:
+                return
+            fingerprint, chunk = checkpoint
+            conn.execute(self.__checkpoints().insert(), {
+                'fingerprint': fingerprint,
+                'table_name': self.__table,
+                'chunk': chunk,
+                'rows': len(data),
+                'committed_at': datetime.datetime.utcnow()
+            })
+        self.logger.debug("Committed chunk %d of %s", chunk, fingerprint)
+
+    def __prepare(self, conn: Connection, data: DataFrame,
+                  if_exists: str) -> Table:
+        """ The table to insert `data` into, created or replaced if needed """
+        if if_exists == 'append':
+            try:
+                return self.table()
+            except sa.exc.NoSuchTableError:
+                pass
+        # only the schema of the DataFrame, the rows are inserted by the caller
+        data.head(0).to_sql(
+            self.__table, con=conn, if_exists=if_exists, schema=self.__schema
+        )
+        self.__clear_checkpoints(conn)
+        self.__statements.invalidate(self.__table, self.__schema)
+        return self.__statements.table(conn, self.__table,
+                                       schema=self.__schema)
+
+    def last_checkpoint(self, fingerprint: str) -> Optional[int]:
+        """
+        Index of the last chunk of `fingerprint`, which was committed into
+        the configured table, None if there is none
+        """
+        checkpoints = self.__checkpoints()
+        stmt = sa.select([sa.func.max(checkpoints.c.chunk)]).where(sa.and_(
+            checkpoints.c.fingerprint == fingerprint,
+            checkpoints.c.table_name == self.__table
+        ))
+        with self.connection.engine.connect() as conn:
+            return conn.execute(stmt).scalar()
+
+    def record_profile(self, records: Iterable[Dict[str, Any]]) -> None:
+        """
+        Inserts the column statistics of an upload into the control table
+        :param records: see :py:meth:`Profile.to_records`
+        """
+        rows = [dict(record, table_name=self.__table) for record in records]
+        if not rows:
+            return
+        with self.connection.engine.begin() as conn:
+            conn.execute(self.__profiles().insert(), rows)
+
+    @property
+    def __table(self) -> str:
+        return self.connection.config['table']
+
+    @property
+    def __statements(self) -> StatementCache:
+        return statement_cache(self.connection.config['uri'])
+
+    @property
+    def __schema(self) -> Optional[str]:
+        return self.connection.config['options'].get('schema', None)
+
+    def __checkpoints(self) -> Table:
+        """ The control table of committed chunks, created on first use """
+        if self.checkpoints is not None:
+            return self.checkpoints
+        table = sa.Table(
+            CHECKPOINT_TABLE, sa.MetaData(),
+            sa.Column('fingerprint', sa.String(64), nullable=False),
+            sa.Column('table_name', sa.String(255), nullable=False),
+            sa.Column('chunk', sa.Integer, nullable=False),
+            sa.Column('rows', sa.Integer),
+            sa.Column('committed_at', sa.DateTime),
+            sa.PrimaryKeyConstraint('fingerprint', 'table_name', 'chunk'),
+            schema=self.__schema
+        )
+        table.create(self.connection.engine, checkfirst=True)
+        self.checkpoints = table
+        return table
+
+    def __clear_checkpoints(self, conn: Connection) -> None:
+        """
+        Deletes the checkpoints of a new or replaced table (in the
+        transaction, which replaces it), its chunks are gone
+        """
+        if self.checkpoints is None and not conn.dialect.has_table(
+                conn, CHECKPOINT_TABLE, schema=self.__schema):
+            return
+        checkpoints = self.__checkpoints()
+        conn.execute(checkpoints.delete().where(
+            checkpoints.c.table_name == self.__table
+        ))
+
+    def __profiles(self) -> Table:
+        """ The control table of column statistics, created on first use """
+        if self.profiles is not None:
+            return self.profiles
+        table = sa.Table(
+            PROFILE_TABLE, sa.MetaData(),
+            sa.Column('id', sa.Integer, primary_key=True),
+            sa.Column('table_name', sa.String(255), nullable=False),
+            sa.Column('source', sa.Text),
+            sa.Column('profiled_at', sa.DateTime),
+            sa.Column('source_rows', sa.BigInteger),
+            sa.Column('dropped_rows', sa.BigInteger),
+            sa.Column('column_name', sa.String(255), nullable=False),
+            sa.Column('rows', sa.BigInteger),
+            sa.Column('nulls', sa.BigInteger),
+            sa.Column('distinct', sa.BigInteger),
+            sa.Column('min_value', sa.Text),
+            sa.Column('max_value', sa.Text),
+            sa.Column('min_length', sa.Integer),
+            sa.Column('max_length', sa.Integer),
+            sa.Column('mean_length', sa.Float),
+            # JSON list of counts per length bucket (see ColumnProfile)
+            sa.Column('lengths', sa.Text),
+            schema=self.__schema
         )
+        table.create(self.connection.engine, checkfirst=True)
+        self.profiles = table
+        return table
 
     @abstractmethod
     def update(self, **options) -> None:
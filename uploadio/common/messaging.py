@@ -0,0 +1,277 @@
+import gzip
+import queue
+import struct
+import threading
+import time
+import zlib
+from abc import abstractmethod
+from typing import Any, Dict, Iterator, List, Optional, Type
+
+import attr
+
+from src.p3common.common import validators as validate
+from uploadio.utils import Loggable
+
+
+class Compression:
+    """
+    Supported batch compression codecs
+    """
+    NONE = 'none'
+    GZIP = 'gzip'
+    ZLIB = 'zlib'
+
+    __CODECS: Dict[str, Dict[str, Any]] = {
+        NONE: dict(id=0, compress=lambda b: b, decompress=lambda b: b),
+        GZIP: dict(id=1, compress=gzip.compress, decompress=gzip.decompress),
+        ZLIB: dict(id=2, compress=zlib.compress, decompress=zlib.decompress),
+    }
+
+    @staticmethod
+    def codec(name: str) -> Dict[str, Any]:
+        validate.is_in_dict_keys(name, Compression.__CODECS)
+        return Compression.__CODECS[name]
+
+    @staticmethod
+    def by_id(codec_id: int) -> str:
+        for name, codec in Compression.__CODECS.items():
+            if codec['id'] == codec_id:
+                return name
+        raise ValueError(f"Unknown compression id '{codec_id}'")
+
+
+@attr.s
+class Message:
+    """
+    One batch of records as it is put on the queue.
+
+    The payload is a sequence of length-prefixed records,
+    compressed with `compression` as a whole.
+    """
+    payload: bytes = attr.ib(repr=False)
+    count: int = attr.ib()
+    compression: str = attr.ib(default=Compression.NONE)
+
+    __RECORD_HEADER = struct.Struct('>I')
+
+    @classmethod
+    def encode(cls, records: List[bytes],
+               compression: str = Compression.NONE) -> 'Message':
+        raw = b''.join(
+            cls.__RECORD_HEADER.pack(len(r)) + r for r in records
+        )
+        payload = Compression.codec(compression)['compress'](raw)
+        return cls(payload=payload, count=len(records),
+                   compression=compression)
+
+    def records(self) -> List[bytes]:
+        raw = Compression.codec(self.compression)['decompress'](self.payload)
+        res, pos, header = [], 0, self.__RECORD_HEADER
+        while pos < len(raw):
+            (size,) = header.unpack_from(raw, pos)
+            pos += header.size
+            res.append(raw[pos:pos + size])
+            pos += size
+        return res
+
+
+class Transport(Loggable):
+    """
+    Abstract transport, which delivers a :py:class:`Message` to a broker
+    """
+
+    def __init__(self, uri: str, **options) -> None:
+        self.uri = uri
+        self.options = options
+
+    @abstractmethod
+    def send(self, message: Message) -> None:
+        raise NotImplementedError()
+
+    def close(self) -> None:
+        pass
+
+
+class InProcessTransport(Transport):
+    """
+    Puts messages on an in-process queue. Producer and consumer
+    find the same queue by its `uri` (the topic name).
+    Mainly used as a local broker stand-in, e.g. for tests.
+    """
+
+    __TOPICS: Dict[str, queue.Queue] = {}
+    __LOCK = threading.Lock()
+
+    @classmethod
+    def topic(cls, name: str, maxsize: int = 0) -> queue.Queue:
+        with cls.__LOCK:
+            if name not in cls.__TOPICS:
+                cls.__TOPICS[name] = queue.Queue(maxsize=maxsize)
+            return cls.__TOPICS[name]
+
+    def send(self, message: Message) -> None:
+        InProcessTransport.topic(
+            self.uri, self.options.get('maxsize', 0)
+        ).put(message)
+
+    @classmethod
+    def receive(cls, name: str,
+                timeout: Optional[float] = None) -> Optional[Message]:
+        try:
+            return cls.topic(name).get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class FileTransport(Transport):
+    """
+    Appends messages as frames to a local file (the `uri`).
+    Every frame is `codec id | record count | payload size | payload`.
+    """
+
+    __FRAME_HEADER = struct.Struct('>BII')
+
+    def __init__(self, uri: str, **options) -> None:
+        super().__init__(uri, **options)
+        self.__file = open(self.uri, 'ab')
+
+    def send(self, message: Message) -> None:
+        codec_id = Compression.codec(message.compression)['id']
+        self.__file.write(self.__FRAME_HEADER.pack(
+            codec_id, message.count, len(message.payload)
+        ))
+        self.__file.write(message.payload)
+        self.__file.flush()
+
+    def close(self) -> None:
+        self.__file.close()
+
+    @classmethod
+    def read(cls, uri: str) -> Iterator[Message]:
+        header = cls.__FRAME_HEADER
+        with open(uri, 'rb') as f:
+            while True:
+                head = f.read(header.size)
+                if len(head) < header.size:
+                    return
+                codec_id, count, size = header.unpack(head)
+                yield Message(
+                    payload=f.read(size),
+                    count=count,
+                    compression=Compression.by_id(codec_id)
+                )
+
+
+class TransportFactory:
+
+    __MAPPING: Dict[str, Type[Transport]] = {
+        "memory": InProcessTransport,
+        "file": FileTransport
+    }
+
+    @staticmethod
+    def load(config: Dict[str, Any]) -> Transport:
+        validate.is_in_dict_keys('transport', config)
+        validate.is_in_dict_keys('uri', config)
+        validate.is_in_dict_keys(
+            config.get('transport'), TransportFactory.__MAPPING
+        )
+        clz = TransportFactory.__MAPPING[config.get('transport')]
+        return clz(config.get('uri'), **config.get('options', {}))
+
+
+class BatchProducer(Loggable):
+    """
+    Collects records into batches and sends them asynchronously
+    on a background thread.
+
+    A batch is sent as soon as it holds `batch_size` records or the oldest
+    record waited `linger_ms`. At most `max_in_flight` records are buffered;
+    :py:meth:`send` blocks when the buffer is full (backpressure).
+    :py:meth:`flush` sends the pending batch without waiting for `linger_ms`.
+    """
+
+    __STOP = object()
+    __FLUSH = object()
+
+    def __init__(self,
+                 transport: Transport,
+                 batch_size: int = 500,
+                 linger_ms: int = 50,
+                 compression: str = Compression.NONE,
+                 max_in_flight: int = 10000) -> None:
+        Compression.codec(compression)
+        self.transport = transport
+        self.batch_size = max(int(batch_size), 1)
+        self.linger = max(linger_ms, 0) / 1000.0
+        self.compression = compression
+        self.sent = 0
+        self.batches = 0
+        self.__buffer: queue.Queue = queue.Queue(maxsize=max_in_flight)
+        self.__error: Optional[BaseException] = None
+        self.__thread = threading.Thread(
+            target=self.__run, name='BatchProducer', daemon=True
+        )
+        self.__thread.start()
+
+    def send(self, record: bytes) -> None:
+        self.__raise_on_error()
+        self.__buffer.put(record)
+
+    def flush(self) -> None:
+        """ Blocks until every buffered record has been sent """
+        if self.__thread.is_alive():
+            self.__buffer.put(self.__FLUSH)
+        self.__buffer.join()
+        self.__raise_on_error()
+
+    def close(self) -> None:
+        if self.__thread.is_alive():
+            self.__buffer.put(self.__STOP)
+            self.__thread.join()
+        self.transport.close()
+        self.__raise_on_error()
+
+    def __raise_on_error(self) -> None:
+        if self.__error is not None:
+            raise RuntimeError("Sending batch failed") from self.__error
+
+    def __run(self) -> None:
+        stop = False
+        while not stop:
+            batch: List[bytes] = []
+            record = self.__buffer.get()
+            deadline = time.monotonic() + self.linger
+            while True:
+                if record is self.__STOP:
+                    stop = True
+                    self.__buffer.task_done()
+                    break
+                if record is self.__FLUSH:
+                    self.__buffer.task_done()
+                    break
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    break
+                timeout = deadline - time.monotonic()
+                try:
+                    record = self.__buffer.get(timeout=max(timeout, 0)) \
+                        if timeout > 0 else self.__buffer.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self.__send(batch)
+
+    def __send(self, batch: List[bytes]) -> None:
+        try:
+            if self.__error is None:
+                self.transport.send(Message.encode(batch, self.compression))
+                self.sent += len(batch)
+                self.batches += 1
+                self.logger.debug("Sent batch of %d records", len(batch))
+        except Exception as why:
+            self.logger.exception("Sending batch failed")
+            self.__error = why
+        finally:
+            for _ in batch:
+                self.__buffer.task_done()
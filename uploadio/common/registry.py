@@ -0,0 +1,110 @@
+import importlib
+from typing import Any, Dict, List, Union
+
+from src.p3common.common import validators as validate
+from uploadio.utils import Loggable
+
+
+def entry_points(group: str) -> List[Any]:
+    """
+    Entry points of all installed distributions in `group`
+    (``importlib.metadata``, the ``importlib_metadata`` backport on
+    Python < 3.8). Without either, there are no entry points.
+    """
+    try:
+        from importlib import metadata
+    except ImportError:
+        try:
+            import importlib_metadata as metadata
+        except ImportError:
+            return []
+    found = metadata.entry_points()
+    if hasattr(found, 'select'):
+        return list(found.select(group=group))
+    return list(found.get(group, []))
+
+
+def resolve(path: str) -> Any:
+    """
+    Imports 'package.module:attribute'
+    Example:
+        >>> resolve('collections:OrderedDict').__name__
+        'OrderedDict'
+    """
+    module, _, attribute = path.partition(':')
+    obj = importlib.import_module(module)
+    for name in filter(None, attribute.split('.')):
+        obj = getattr(obj, name)
+    return obj
+
+
+class Registry(Loggable):
+    """
+    Maps names of a catalog (e.g. ``"type": "csv"``) to implementations.
+
+    An implementation is either the object itself or its import path
+    ('package.module:Class'), which is imported when the name is loaded
+    the first time, so heavy dependencies are only imported if a catalog
+    uses them. Other distributions add implementations as entry points of
+    `group`, e.g. in their setup.py:
+
+        entry_points={
+            'uploadio.transformations': [
+                'fast_upper = mypackage.rules:FastUppercase'
+            ]
+        }
+
+    Entry points are discovered on the first lookup of an unknown name
+    and loaded (``EntryPoint.load``) when their name is loaded the first
+    time, they do not replace built-in names.
+
+    Example:
+        >>> registry = Registry('uploadio.example', {
+        ...     'ordered': 'collections:OrderedDict'
+        ... })
+        >>> registry.load('ordered').__name__
+        'OrderedDict'
+    """
+
+    def __init__(self, group: str,
+                 builtins: Dict[str, Union[str, Any]] = None) -> None:
+        self.group = group
+        self.__entries: Dict[str, Union[str, Any]] = dict(builtins or {})
+        self.__entry_points: Dict[str, Any] = {}
+        self.__discovered = False
+
+    def register(self, name: str, implementation: Union[str, Any]) -> None:
+        """ Adds or replaces `name` (object or import path) """
+        self.__entries[name] = implementation
+
+    def load(self, name: str) -> Any:
+        if name not in self.__entries:
+            self.__discover()
+        if name in self.__entry_points and name not in self.__entries:
+            entry_point = self.__entry_points[name]
+            self.logger.debug("Loading %s '%s' from %s",
+                              self.group, name, entry_point.value)
+            self.__entries[name] = entry_point.load()
+        validate.is_in_dict_keys(name, self.__entries)
+        implementation = self.__entries[name]
+        if isinstance(implementation, str):
+            self.logger.debug("Importing %s '%s' from %s",
+                              self.group, name, implementation)
+            implementation = resolve(implementation)
+            self.__entries[name] = implementation
+        return implementation
+
+    def names(self) -> List[str]:
+        self.__discover()
+        return sorted(set(self.__entries) | set(self.__entry_points))
+
+    def __discover(self) -> None:
+        if self.__discovered:
+            return
+        self.__discovered = True
+        for entry_point in entry_points(self.group):
+            if entry_point.name in self.__entries:
+                continue
+            self.logger.debug("Found %s '%s' in %s", self.group,
+                              entry_point.name, entry_point.value)
+            self.__entry_points[entry_point.name] = entry_point
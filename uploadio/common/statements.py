@@ -0,0 +1,204 @@
+"""
+SQLAlchemy Core statements of :py:class:`uploadio.common.db.Database`.
+
+Tables are described by :py:class:`sqlalchemy.Table` objects instead of
+formatted SQL strings, so names are quoted by the dialect and values are
+always bound parameters. Tables and compiled statements are cached, a chunk
+only binds its rows to an already compiled INSERT.
+"""
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import sqlalchemy as sa
+from sqlalchemy.types import UserDefinedType
+
+from uploadio.utils import Loggable
+
+
+class DialectType(UserDefinedType):
+    """
+    A column type, which is rendered as it is, e.g. the types of
+    :py:meth:`PostgresTranslator.dialect_datatype`
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def get_col_spec(self, **kwargs) -> str:
+        return self.name
+
+
+def define_table(name: str, columns: Iterable[Tuple[str, str]],
+                 primary_key: Iterable[str] = (), schema: str = None,
+                 metadata: sa.MetaData = None) -> sa.Table:
+    """
+    :param columns: (name, dialect type) of every column
+    :param primary_key: names of the primary key columns
+    Example:
+        >>> table = define_table('people', [('name', 'text'),
+        ...                                 ('row_hash', 'char(32)')],
+        ...                      primary_key=['row_hash'])
+        >>> [column.name for column in table.primary_key]
+        ['row_hash']
+        >>> str(table.c.row_hash.type)
+        'char(32)'
+    """
+    primary_key = list(primary_key)
+    return sa.Table(
+        name, metadata or sa.MetaData(),
+        *[sa.Column(column, DialectType(type_),
+                    primary_key=column in primary_key)
+          for column, type_ in columns],
+        schema=schema
+    )
+
+
+def sql(statement: Union[str, Any]) -> Any:
+    """ A textual statement with bind parameters (':name') or a construct """
+    return sa.text(statement) if isinstance(statement, str) else statement
+
+
+def records(frame: Any, index: bool = True) -> List[Dict[str, Any]]:
+    """
+    Bound parameters of the rows of a DataFrame (like ``DataFrame.to_sql``:
+    missing values are None, numpy scalars are converted to Python)
+    :param index: include the index (as column 'index' if it has no name)
+    Example:
+        >>> import pandas as pd
+        >>> records(pd.DataFrame({'a': [1, None]}, index=['x', 'y']))
+        [{'index': 'x', 'a': 1.0}, {'index': 'y', 'a': None}]
+    """
+    if index:
+        frame = frame.reset_index()
+    columns = []
+    for name in frame.columns:
+        column = frame[name]
+        columns.append(
+            column.astype(object).where(column.notnull(), None).tolist()
+        )
+    names = [str(name) for name in frame.columns]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def upsert_statement(table: sa.Table, dialect: str) -> Any:
+    """
+    INSERT, which replaces the rows with the same primary key
+    (e.g. row_hash) instead of failing
+    """
+    keys = [column.name for column in table.primary_key]
+    if not keys:
+        raise ValueError(
+            "Upserting into '{}' requires a primary key (e.g. row_hash)"
+            .format(table.name)
+        )
+    if dialect in ('sqlite', 'duckdb'):
+        return table.insert().prefix_with('OR REPLACE')
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        statement = insert(table)
+        values = {column.name: statement.excluded[column.name]
+                  for column in table.columns if column.name not in keys}
+        if not values:
+            return statement.on_conflict_do_nothing(index_elements=keys)
+        return statement.on_conflict_do_update(index_elements=keys,
+                                               set_=values)
+    raise ValueError("Upserts are not supported for '{}'".format(dialect))
+
+
+# PRAGMAs of embedded SQLite databases, tuned for bulk appends
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -64000,
+    'busy_timeout': 5000
+}
+
+
+def configure_sqlite(engine: Any, pragmas: Dict[str, Any] = None) -> None:
+    """
+    Sets the PRAGMAs (:py:data:`SQLITE_PRAGMAS` updated by `pragmas`)
+    on every new connection of a SQLite engine
+    """
+    pragmas = dict(SQLITE_PRAGMAS, **(pragmas or {}))
+    if engine.url.database in (None, '', ':memory:'):
+        pragmas.pop('journal_mode', None)
+    for name, value in pragmas.items():
+        if not re.match(r'^\w+$', name) or \
+                not re.match(r'^-?\w+$', str(value)):
+            raise ValueError("Invalid PRAGMA {} = {}".format(name, value))
+
+    @sa.event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection: Any, record: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute('PRAGMA {} = {}'.format(name, value))
+        cursor.close()
+
+
+def engine_options(uri: str) -> Dict[str, Any]:
+    """
+    Options of :py:func:`sqlalchemy.create_engine`, which send the rows of
+    an executemany INSERT in batched VALUES lists (``execute_values``)
+    instead of one statement per row, where the driver supports it (psycopg2)
+    """
+    dialect = uri.split(':', 1)[0]
+    if dialect not in ('postgresql', 'postgres', 'postgresql+psycopg2'):
+        return {}
+    version = tuple(int(part) for part in
+                    sa.__version__.split('.')[:3] if part.isdigit())
+    if version >= (1, 4):
+        # INSERTs use execute_values by default
+        return {}
+    if version >= (1, 3, 7):
+        return {'executemany_mode': 'values'}
+    return {'use_batch_mode': True}
+
+
+class StatementCache(Loggable):
+    """
+    Reflected tables and compiled statements of one database,
+    compiled statements are reused by passing :py:attr:`compiled`
+    as ``compiled_cache`` execution option.
+    """
+
+    def __init__(self) -> None:
+        self.compiled: Dict[Any, Any] = {}
+        self.__tables: Dict[Tuple[Optional[str], str], sa.Table] = {}
+        self.__inserts: Dict[Tuple[Optional[str], str, bool], Any] = {}
+        self.__lock = threading.Lock()
+
+    def table(self, engine: Any, name: str,
+              schema: str = None) -> sa.Table:
+        """ The table `name`, reflected from the database on first use """
+        key = (schema, name)
+        with self.__lock:
+            if key not in self.__tables:
+                self.logger.debug("Reflecting table %s", name)
+                self.__tables[key] = sa.Table(
+                    name, sa.MetaData(), schema=schema,
+                    autoload=True, autoload_with=engine
+                )
+            return self.__tables[key]
+
+    def insert(self, table: sa.Table, dialect: str,
+               upsert: bool = False) -> Any:
+        """
+        The INSERT (or :py:func:`upsert_statement`) statement of `table`, the same
+        object is reused, so its compiled form is found in the cache
+        """
+        key = (table.schema, table.name, upsert)
+        with self.__lock:
+            if key not in self.__inserts:
+                self.__inserts[key] = upsert_statement(table, dialect) \
+                    if upsert else table.insert()
+            return self.__inserts[key]
+
+    def invalidate(self, name: str, schema: str = None) -> None:
+        """ Forgets a table, e.g. after it was dropped """
+        with self.__lock:
+            self.__tables.pop((schema, name), None)
+            for upsert in (False, True):
+                self.__inserts.pop((schema, name, upsert), None)
+            self.compiled.clear()
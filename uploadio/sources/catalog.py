@@ -6,7 +6,7 @@ from uploadio.sources.collection import Field, SourceDefinition
 from uploadio.sources.transformation import (Task, Transformation,
                                              TransformationFactory,
                                              TransformationType)
-from uploadio.utils import Loggable
+from uploadio.utils import Loggable, make_list
 
 
 class ConfigurationError(Exception):
@@ -71,16 +71,24 @@ class JsonCatalogProvider(CatalogProvider):
     def load(self, source_name: str) -> SourceDefinition:
         src = JsonCatalogProvider.__get_key_or_die(self.sources, source_name)
         source_config = JsonCatalogProvider.__get_key_or_die(src, 'source')
-        target_config = JsonCatalogProvider.__get_key_or_die(src, 'target')
+        # a single target or a list of targets
+        targets = make_list(
+            JsonCatalogProvider.__get_key_or_die(src, 'target')
+        )
+        if not targets:
+            raise ConfigurationError(
+                "Source '{}' has no target. Abort".format(source_name)
+            )
         parser_config = JsonCatalogProvider.__get_key_or_die(src, 'parser')
         fields = JsonCatalogProvider.__retrieve_fields(src)
         return SourceDefinition(
             name=source_name,
             source_config=source_config,
-            target_config=target_config,
+            target_config=targets[0],
             parser_config=parser_config,
             version=self.version,
-            fields=fields
+            fields=fields,
+            targets=targets
         )
 
     @staticmethod
@@ -90,10 +98,9 @@ class JsonCatalogProvider(CatalogProvider):
         res = dict()
         for field in fields:
             name = JsonCatalogProvider.__get_key_or_die(field, 'name')
-            data_type = JsonCatalogProvider.__get_key_or_die(
-                field,
-                'data_type'
-            )
+            ignore = field.get('ignore', False)
+            data_type = field.get('data_type', None) if ignore \
+                else JsonCatalogProvider.__get_key_or_die(field, 'data_type')
             default = field.get('default', None)
             alias = field.get('alias', None)
             transformations = JsonCatalogProvider.__retrieve_transformations(
@@ -104,7 +111,8 @@ class JsonCatalogProvider(CatalogProvider):
                 data_type=data_type if data_type else None,
                 default=default,
                 alias=alias,
-                transformations=transformations
+                transformations=transformations,
+                ignore=ignore
             )
         return res
 
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import re
+import sys
+from typing import Any, Optional
+
+from uploadio.utils import LazyModule, Loggable
+
+pd = LazyModule('pandas')
+
+UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+
+def parse_size(size: str) -> int:
+    """
+    Bytes of a size like '512M' or '2G' (powers of 1024)
+    Example:
+        >>> parse_size('512M'), parse_size('1.5g'), parse_size('1024')
+        (536870912, 1610612736, 1024)
+    """
+    match = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*$', str(size),
+                     re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size '{size}', e.g. 512M or 2G")
+    number, unit = match.groups()
+    return int(float(number) * UNITS[unit.upper()])
+
+
+def deep_size(obj: Any) -> int:
+    """ Bytes of Python objects including the containers' elements """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k) + deep_size(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(deep_size(item) for item in obj)
+    return size
+
+
+class ChunkSizer(Loggable):
+    """
+    Chooses the chunk sizes of a :py:class:`Pipeline` for a memory budget.
+
+    The first chunk is read with `probe_rows` rows and measured: the bytes
+    per row of the read chunk, of the parsed chunk and of the rows bound as
+    Python objects by the writing stage (e.g. the parameters of an
+    executemany). Up to ``2 * queue_size + 3`` chunks are in memory at the
+    same time (one per stage and the ones waiting in the queues), each of
+    them gets an equal share of the budget:
+
+    - rows per chunk (read and parsed as one) = share / (bytes per read row
+      + bytes per parsed row), the largest chunks, which fit, have the
+      least overhead per row
+    - rows per write (e.g. executemany batch) = the rows, whose bound
+      parameters fit into the memory of the read chunk, which is released
+      after parsing
+
+    Both are limited to [`min_rows`, `max_rows`].
+
+    Example:
+        >>> sizer = ChunkSizer(budget=64 << 20)
+        >>> chunk = pd.DataFrame({'name': ['max mustermann'] * 1000})
+        >>> sizer.observe(chunk, chunk.copy())
+        >>> 10000 < sizer.chunksize < 100000, sizer.write_chunksize > 0
+        (True, True)
+    """
+
+    def __init__(self, budget: int, queue_size: int = 2,
+                 min_rows: int = 1000, max_rows: int = 1000000,
+                 probe_rows: int = 1000) -> None:
+        """
+        :param budget: max. bytes of the chunks in memory
+        :param queue_size: see :py:class:`Pipeline`
+        :param probe_rows: rows of the first (measured) chunk
+        """
+        if budget <= 0:
+            raise ValueError("The memory budget has to be positive")
+        self.budget = budget
+        self.queue_size = queue_size
+        self.min_rows = min_rows
+        self.max_rows = max(max_rows, min_rows)
+        self.probe_rows = probe_rows
+        self.bytes_per_row: Optional[float] = None
+        self.chunksize: Optional[int] = None
+        self.write_chunksize: Optional[int] = None
+
+    @property
+    def slots(self) -> int:
+        """ Max. number of chunks in memory at the same time """
+        return 2 * self.queue_size + 3
+
+    def observe(self, chunk: pd.DataFrame, result: Any) -> None:
+        """
+        Measures the first chunk and chooses the sizes
+        :param chunk: the chunk as read
+        :param result: the chunk as parsed
+        """
+        rows = len(chunk)
+        if not rows:
+            return
+        read = chunk.memory_usage(index=True, deep=True).sum() / rows
+        sample = result.head(100) if isinstance(result, pd.DataFrame) \
+            else list(result[:100])
+        if isinstance(result, pd.DataFrame):
+            parsed = result.memory_usage(index=True, deep=True).sum() / rows
+            bound = deep_size(sample.reset_index().to_dict('records')) \
+                / max(len(sample), 1)
+        else:
+            # e.g. events, their number may differ from the rows
+            parsed = deep_size(sample) / max(len(sample), 1) \
+                * len(result) / rows
+            bound = parsed
+        self.bytes_per_row = float(read + parsed)
+        share = self.budget / self.slots
+        self.chunksize = self.__limit(share / self.bytes_per_row)
+        self.write_chunksize = min(
+            self.__limit(read * self.chunksize / max(bound, 1)),
+            self.chunksize
+        )
+        if self.chunksize * self.bytes_per_row > share:
+            self.logger.warning(
+                "A memory budget of %d bytes is too small for chunks of "
+                "%d rows of %.0f bytes", self.budget, self.min_rows,
+                self.bytes_per_row
+            )
+        self.logger.info(
+            "%.0f bytes per row, chunks of %d rows, writes of %d rows "
+            "(memory budget %d bytes)", self.bytes_per_row, self.chunksize,
+            self.write_chunksize, self.budget
+        )
+
+    def __limit(self, rows: float) -> int:
+        return int(min(max(rows, self.min_rows), self.max_rows))
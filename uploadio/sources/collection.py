@@ -1,10 +1,12 @@
-from typing import Any, Dict, List, Union
+import os
+from typing import Any, Dict, List, Optional, Union
 
 import attr
 
 from src.p3common.common import validators as validate
 from uploadio.sources.source import JSONSource, Source, SourceFactory
 from uploadio.sources.transformation import Transformation, TransformationType
+from uploadio.utils import make_list
 
 
 @attr.s
@@ -13,7 +15,8 @@ class Field:
     A Field element in a source.
 
     In general this is a column in table or a csv file
-    or attribute in a json file
+    or attribute in a json file. Fields marked as `ignore` are
+    documented in the catalog, but never read from the source.
     """
     name: str = attr.ib()
     data_type: str = attr.ib()
@@ -22,6 +25,7 @@ class Field:
     transformations: Dict[str, Transformation] = attr.ib(
         default=Dict[str, Transformation]
     )
+    ignore: bool = attr.ib(default=False)
 
     def rules(self) -> Union[Dict[str, Transformation], None]:
         return dict(filter(
@@ -48,11 +52,14 @@ class SourceDefinition:
     :param source_config:
         Source connection configuration (type, path, options)
     :param target_config:
-    if necessary a target information
+    if necessary a target information, the first of `targets`
     :param version:
     the version of the :py:class:`Catalog`
     :param fields:
     dict of key ``field.name`` and value of :py:class:`Field`
+    :param targets:
+    all target configurations, every parsed chunk is written to each of
+    them (defaults to `target_config`)
     """
     name: str = attr.ib()
     source_config: Dict[str, Any] = attr.ib()
@@ -60,16 +67,24 @@ class SourceDefinition:
     parser_config: Dict[str, Any] = attr.ib()
     version: str = attr.ib()
     fields: Dict[str, Field] = attr.ib()
+    targets: List[Dict[str, Any]] = attr.ib(default=attr.Factory(list))
+
+    def __attrs_post_init__(self) -> None:
+        if not self.targets:
+            self.targets = [self.target_config]
 
     def validate(self, src_fields: List) -> bool:
         """Simple approach...
+        Only the declared, not ignored fields (see :py:attr:`projection`)
+        are checked, ignored source fields are skipped.
         :param src_fields:
             list of source fields (columns, attributes...)
         :return:
             True if all src_fields are described in the catalog,
             otherwise false
         """
-        for name in self.fields.keys():
+        src_fields = [f for f in src_fields if f not in self.ignored]
+        for name in self.projection:
             if name in src_fields:
                 src_fields.remove(name)
             else:
@@ -84,9 +99,35 @@ class SourceDefinition:
         validate.is_in_dict_keys(name, self.fields)
         return self.fields.get(name, None)
 
+    @property
+    def projection(self) -> List[str]:
+        """ Names of all fields which have to be read from the source """
+        return [name for name, field in self.fields.items()
+                if not field.ignore]
+
+    @property
+    def ignored(self) -> List[str]:
+        return [name for name, field in self.fields.items() if field.ignore]
+
+    @property
+    def projected_fields(self) -> List[Field]:
+        return [field for field in self.fields.values() if not field.ignore]
+
     @property
     def source(self) -> Source:
-        return SourceFactory.load(self.source_config)
+        """ The source, which only reads the :py:attr:`projection` """
+        return SourceFactory.load(self.source_config, columns=self.projection)
+
+    @property
+    def directory(self) -> Optional[str]:
+        """ Directory, where the files of the source arrive (routing) """
+        directory = self.source_config.get('directory', None)
+        return os.path.abspath(directory) if directory else None
+
+    @property
+    def patterns(self) -> List[str]:
+        """ File name patterns of the source (routing), default '*.csv' """
+        return make_list(self.source_config.get('pattern', '*.csv'))
 
     @property
     def parser(self) -> str:
@@ -106,4 +147,4 @@ class SourceDefinition:
 
     @property
     def columns(self) -> List[str]:
-        return [field.alias for field in self.fields.values()]
+        return [field.alias for field in self.projected_fields]
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from typing import Dict, Iterable, Optional
+
+from uploadio.utils import LazyModule, Loggable
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+_INDEXES: Dict[str, HashIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+class HashIndex(Loggable):
+    """
+    The row hashes, which are known to be in a table, as sorted array of
+    64 bit keys (the first 16 hex digits of the md5 row_hash), 8 bytes per
+    row. Rows, whose key is known, are dropped before they are inserted.
+    Two different rows have the same key with a probability of about
+    n² / 2^65 (n rows).
+
+    With a `path` the keys are persisted (numpy .npy) by :py:meth:`save`
+    and loaded again by the next process, together with the number of
+    rows of the table at that time (`path`.json). The keys are only used,
+    after :py:meth:`validate` found the table unchanged, e.g. not after a
+    crash before :py:meth:`save` or after the table was replaced.
+
+    Example:
+        >>> index = HashIndex()
+        >>> hashes = ['9e107d9d372bb6826bd81d3542a419d6',
+        ...           'e4d909c290d0fb1ca068ffaddf22cbd0']
+        >>> index.add(hashes[:1])
+        >>> list(index.new(hashes + hashes[1:]))
+        [False, True, False]
+    """
+
+    def __init__(self, path: str = None) -> None:
+        self.path = path
+        self.persisted = bool(path) and os.path.exists(path)
+        self.keys = np.load(path) if self.persisted \
+            else np.empty(0, dtype=np.uint64)
+        # rows of the table, when the keys were saved
+        self.rows: Optional[int] = None
+        if self.persisted and os.path.exists(f"{path}.json"):
+            with open(f"{path}.json", 'r') as meta:
+                self.rows = json.load(meta).get('rows')
+        # False until the keys of all rows of the table were added
+        self.loaded = False
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def open(name: str, path: str = None) -> HashIndex:
+        """ The index `name` (e.g. of a table), shared by the process """
+        with _INDEXES_LOCK:
+            if name not in _INDEXES:
+                _INDEXES[name] = HashIndex(path)
+            return _INDEXES[name]
+
+    @staticmethod
+    def to_keys(hashes: Iterable[str]) -> np.ndarray:
+        """ 64 bit keys of hex row hashes """
+        prefixes = pd.Index(hashes).astype(str).str[:16]
+        if not (prefixes.str.len() == 16).all():
+            raise ValueError("Row hashes have to be hex digests "
+                             "of at least 64 bits")
+        return np.frombuffer(
+            bytes.fromhex(''.join(prefixes)), dtype='>u8'
+        ).astype(np.uint64)
+
+    def new(self, hashes: Iterable[str]) -> np.ndarray:
+        """
+        Mask of the rows, which are unknown and not a duplicate of a
+        previous row of `hashes`
+        """
+        keys = self.to_keys(hashes)
+        with self.lock:
+            position = np.searchsorted(self.keys, keys)
+            known = np.zeros(len(keys), dtype=bool)
+            inside = position < len(self.keys)
+            known[inside] = self.keys[position[inside]] == keys[inside]
+        return ~known & ~pd.Index(keys).duplicated()
+
+    def add(self, hashes: Iterable[str]) -> None:
+        keys = self.to_keys(hashes)
+        with self.lock:
+            self.keys = np.union1d(self.keys, keys)
+
+    def validate(self, rows: int) -> bool:
+        """
+        Trusts the persisted keys, if the table has as many rows as when
+        they were saved, otherwise they are dropped
+        :param rows: current number of rows of the table
+        """
+        with self.lock:
+            if self.persisted and self.rows is not None \
+                    and self.rows == rows:
+                self.loaded = True
+            elif self.persisted:
+                self.logger.warning(
+                    "Row hashes in %s are stale (%s rows, the table has %d)",
+                    self.path, self.rows, rows
+                )
+                self.clear()
+                self.persisted = False
+            return self.loaded
+
+    def clear(self) -> None:
+        with self.lock:
+            self.keys = np.empty(0, dtype=np.uint64)
+
+    def save(self, rows: int = None) -> None:
+        """ :param rows: number of rows of the table (see validate) """
+        if not self.path:
+            return
+        with self.lock:
+            # the stale marker first: a crash in between leaves no keys,
+            # which look valid
+            if os.path.exists(f"{self.path}.json"):
+                os.remove(f"{self.path}.json")
+            with open(f"{self.path}.tmp", 'wb') as tmp:
+                np.save(tmp, self.keys)
+            os.replace(f"{self.path}.tmp", self.path)
+            if rows is not None:
+                with open(f"{self.path}.json.tmp", 'w') as meta:
+                    json.dump({'rows': rows}, meta)
+                os.replace(f"{self.path}.json.tmp", f"{self.path}.json")
+            self.rows = rows
+            self.persisted = True
+        self.logger.debug("Saved %d row hashes to %s", len(self), self.path)
+
+    def __len__(self) -> int:
+        return len(self.keys)
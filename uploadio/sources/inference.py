@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import csv
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import attr
+
+from uploadio.common.compression import open_stream
+from uploadio.common.translator import Datatype
+from uploadio.sources.source import SourceFactory
+from uploadio.utils import LazyModule, Loggable
+
+pd = LazyModule('pandas')
+
+log = Loggable().logger
+
+BOOLEANS = ['true', 'false', 'yes', 'no', 't', 'f', 'y', 'n']
+
+# most specific first, the first format, which parses all values, wins
+DATE_FORMATS = ['%Y-%m-%d', '%d.%m.%Y', '%d.%m.%y', '%m/%d/%Y', '%d/%m/%Y',
+                '%m/%d/%y', '%Y%m%d']
+DATETIME_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S',
+                    '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S.%f',
+                    '%Y-%m-%d %H:%M', '%d.%m.%Y %H:%M:%S', '%d.%m.%Y %H:%M',
+                    '%m/%d/%Y %H:%M:%S', '%m/%d/%Y %H:%M', '%m/%d/%y %H:%M']
+ISO_DATE = '%Y-%m-%d'
+ISO_DATETIME = '%Y-%m-%d %H:%M:%S'
+
+INTEGER = r'^[+-]?(0|[1-9]\d*)$'
+# e.g. '1.234,56 €'
+DECIMAL_COMMA = r'^[+-]?\d{1,3}(\.\d{3})*(,\d+)?$|^[+-]?\d+(,\d+)?$'
+
+
+@attr.s
+class InferredField:
+    """
+    A field of a catalog, inferred from sample values
+    :param data_type: one of :py:class:`Datatype`
+    :param transformations: rules, which convert the values into the
+        format of the data type (e.g. dates to ISO 8601)
+    :param categorical: few distinct values (see :py:func:`infer_field`)
+    :param nulls: ratio of missing values
+    """
+    name: str = attr.ib()
+    data_type: str = attr.ib()
+    alias: Optional[str] = attr.ib(default=None)
+    transformations: List[Dict[str, Any]] = attr.ib(default=attr.Factory(list))
+    categorical: bool = attr.ib(default=False)
+    nulls: float = attr.ib(default=0.0)
+
+    def to_catalog(self) -> Dict[str, Any]:
+        """ The field as element of the `fields` of a catalog source """
+        field = {'name': self.name}
+        if self.alias and self.alias != self.name:
+            field['alias'] = self.alias
+        field['data_type'] = self.data_type.lower()
+        if self.categorical:
+            field['categorical'] = True
+        if self.transformations:
+            field['transformations'] = [
+                dict(transformation, order=order)
+                for order, transformation
+                in enumerate(self.transformations, start=1)
+            ]
+        return field
+
+
+def rule(name: str, operator: Any) -> Dict[str, Any]:
+    return {'type': 'rule', 'task': {'name': name, 'operator': operator}}
+
+
+def alias(name: str) -> str:
+    """
+    A column name, which needs no quoting
+    Example:
+        >>> alias('Betrag (€)')
+        'betrag'
+    """
+    return re.sub(r'\W+', '_', name.strip().lower()).strip('_') or name
+
+
+def date_format(values: pd.Series) -> Optional[Tuple[str, str]]:
+    """ (data type, format) of the first format, which parses all values """
+    groups = values.str.count(r'\d+')
+    for data_type, formats in [(Datatype.DATE, DATE_FORMATS),
+                               (Datatype.DATETIME, DATETIME_FORMATS)]:
+        for fmt in formats:
+            # pandas parses ISO 8601 timestamps with a date format, too
+            if (groups != len(re.findall(
+                    r'\d+', re.sub(r'%\w', '0', fmt)))).any():
+                continue
+            parsed = pd.to_datetime(values, format=fmt, errors='coerce')
+            if parsed.notnull().all():
+                return data_type, fmt
+    return None
+
+
+def infer_field(name: str, column: pd.Series,
+                categorical: float = 0.1) -> InferredField:
+    """
+    Infers the :py:class:`Datatype` of a column with vectorized checks of
+    all sample values: typed columns (e.g. of JSON) keep their type,
+    strings are checked for booleans, integers (without leading zeros,
+    e.g. zip codes stay strings), decimals (also with decimal comma and
+    currency, e.g. '1.234,56 €'), dates and timestamps of
+    :py:data:`DATE_FORMATS` and :py:data:`DATETIME_FORMATS`.
+
+    :param categorical: max. ratio of distinct values to values of a
+        categorical (low-cardinality) string column
+    """
+    field = InferredField(name=name, data_type=Datatype.STRING,
+                          alias=alias(name))
+    field.nulls = float(column.isnull().mean()) if len(column) else 0.0
+    values = column.dropna()
+    if pd.api.types.is_bool_dtype(values):
+        field.data_type = Datatype.BOOLEAN
+        return field
+    if pd.api.types.is_integer_dtype(values):
+        field.data_type = Datatype.NUMERIC
+        return field
+    if pd.api.types.is_float_dtype(values):
+        integral = (values % 1 == 0).all()
+        field.data_type = Datatype.NUMERIC if integral else Datatype.DOUBLE
+        return field
+
+    values = values.astype(str).str.strip()
+    values = values[values != '']
+    if values.empty:
+        return field
+
+    if values.str.lower().isin(BOOLEANS).all():
+        field.data_type = Datatype.BOOLEAN
+    elif values.str.match(INTEGER).all():
+        field.data_type = Datatype.NUMERIC
+    elif pd.to_numeric(values, errors='coerce').notnull().all() \
+            and not values.str.match(r'^[+-]?0\d').any():
+        field.data_type = Datatype.DOUBLE
+    elif not infer_decimal_comma(field, values) \
+            and not infer_date(field, values):
+        unique = values.nunique()
+        field.categorical = unique <= categorical * len(values)
+    return field
+
+
+def infer_decimal_comma(field: InferredField, values: pd.Series) -> bool:
+    """ Decimals like '1.234,56 €' become doubles with replace rules """
+    suffixes = values.str.extract(r'^[^A-Za-z]*?(\s*[^\d\s.,+-]+)$',
+                                  expand=False)
+    suffix = suffixes.dropna().unique()
+    if len(suffix) > 1 or (len(suffix) == 1 and suffixes.isnull().any()):
+        return False
+    numbers = values.str.slice(0, -len(suffix[0])) if len(suffix) else values
+    if not numbers.str.match(DECIMAL_COMMA).all() \
+            or not numbers.str.contains(',', regex=False).any():
+        return False
+    field.data_type = Datatype.DOUBLE
+    if len(suffix):
+        field.transformations.append(
+            rule('replace', {'old': suffix[0], 'new': ''}))
+    field.transformations.append(rule('replace', {'old': '.', 'new': ''}))
+    field.transformations.append(rule('replace', {'old': ',', 'new': '.'}))
+    return True
+
+
+def infer_date(field: InferredField, values: pd.Series) -> bool:
+    """ Dates and timestamps, which are not ISO 8601, are converted """
+    found = date_format(values)
+    if found is None:
+        return False
+    field.data_type, fmt = found
+    iso = ISO_DATE if field.data_type == Datatype.DATE else ISO_DATETIME
+    if fmt != iso:
+        field.transformations.append(
+            rule('date_format', {'from': fmt, 'to': iso}))
+    return True
+
+
+def sniff(source_config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The source config of a CSV file, completed by what is detected from
+    its first 64 KiB (unless it is configured): the encoding (UTF-8 or
+    Windows-1252), the delimiter and quote char and `skiprows`, the number
+    of lines before the header (e.g. the preamble of a bank statement)
+    """
+    options = dict(source_config.get('options', {}))
+    if source_config.get('type', 'csv') != 'csv' \
+            or 'delimiter' in options or 'sep' in options:
+        return dict(source_config, options=options)
+    size = 1 << 16
+    with open_stream(source_config['uri']) as stream:
+        head = stream.read(size)
+    if 'encoding' not in options:
+        try:
+            head.decode('utf-8')
+        except UnicodeDecodeError as error:
+            # a multi-byte character may be cut at the end of the sample
+            if error.start < len(head) - 4:
+                options['encoding'] = 'windows-1252'
+    lines = head.decode(options.get('encoding', 'utf-8'),
+                        errors='replace').splitlines()
+    if len(head) == size:
+        lines = lines[:-1]
+    try:
+        dialect = csv.Sniffer().sniff('\n'.join(lines[-50:]))
+    except csv.Error:
+        log.warning("Could not detect the delimiter of %s",
+                    source_config['uri'])
+        return dict(source_config, options=options)
+    options.update(delimiter=dialect.delimiter, quotechar=dialect.quotechar)
+    if 'skiprows' not in options:
+        widths = [len(row) if line.strip() else None for line, row in
+                  zip(lines, csv.reader(lines, dialect))]
+        width = widths[-1] if widths and widths[-1] else max(
+            (w for w in widths if w), default=0)
+        skip = len(widths)
+        while skip > 0 and widths[skip - 1] in (width, None):
+            skip -= 1
+        # blank lines before the header are skipped by pandas anyway
+        while skip < len(widths) and widths[skip] is None:
+            skip += 1
+        if skip:
+            options['skiprows'] = skip
+    return dict(source_config, options=options)
+
+
+def sample(source_config: Dict[str, Any], rows: int = 1000,
+           sniffed: bool = False) -> pd.DataFrame:
+    """
+    The first `rows` rows of a source, CSV values are read as strings
+    (the type is decided by :py:func:`infer_field`)
+    :param sniffed: `source_config` was already completed by
+        :py:func:`sniff`, the file is not sniffed again
+    """
+    config = dict(source_config) if sniffed else sniff(source_config)
+    if config.get('type', 'csv') == 'csv' \
+            and config['options'].get('engine', None) != 'arrow':
+        config['options'] = dict(config['options'], dtype=str)
+    source = SourceFactory.load(config)
+    for chunk in source.chunks(chunksize=rows):
+        return chunk
+    return pd.DataFrame()
+
+
+def infer_catalog(source_config: Dict[str, Any], name: str,
+                  namespace: str = 'default', version: str = '0.1',
+                  target: Dict[str, Any] = None, rows: int = 1000,
+                  categorical: float = 0.1) -> Dict[str, Any]:
+    """
+    A catalog (see :py:class:`JsonCatalogProvider`) with the source `name`,
+    whose fields are inferred from the first `rows` rows of the source
+
+    Example:
+        catalog = infer_catalog({'type': 'csv', 'uri': 'vendor.csv'},
+                                'vendor')
+        json.dump(catalog, open('catalog_vendor.json', 'w'), indent=2)
+    """
+    config = sniff(source_config)
+    frame = sample(config, rows, sniffed=True)
+    fields = [infer_field(str(column), frame[column], categorical)
+              for column in frame.columns]
+    for field in fields:
+        log.info("%s: %s%s (%.0f%% missing)", field.name, field.data_type,
+                 ', categorical' if field.categorical else '',
+                 100 * field.nulls)
+    return {
+        'namespace': namespace,
+        'version': version,
+        'sources': {
+            name: {
+                'source': config,
+                'parser': {'name': 'DBOut',
+                           'options': {'row_hash': 'values'}},
+                'target': target or {
+                    'connection': {'uri': f"sqlite:///{name}.db",
+                                   'table': name},
+                    'options': {'row_hash': True}
+                },
+                'fields': [field.to_catalog() for field in fields]
+            }
+        }
+    }
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List
+
+from uploadio.utils import LazyModule, Loggable
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+
+class LRUCache:
+    """
+    Bounded, thread-safe mapping, which evicts the least recently used entry
+    Example:
+        >>> cache = LRUCache(maxsize=2)
+        >>> cache.put('a', 1); cache.put('b', 2); cache.get('a')
+        1
+        >>> cache.put('c', 3); 'b' in cache, 'a' in cache
+        (False, True)
+    """
+
+    def __init__(self, maxsize: int = 10000) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__data: OrderedDict = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self.__lock:
+            try:
+                value = self.__data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.__data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self.__lock:
+            self.__data[key] = value
+            self.__data.move_to_end(key)
+            if len(self.__data) > self.maxsize:
+                self.__data.popitem(last=False)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self.__lock:
+            return key in self.__data
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return len(self.__data)
+
+
+class ValueCache(Loggable):
+    """
+    Memoizes a function of the values of a column (e.g. the rule chain
+    of a field), which is evaluated on dictionary-encoded columns:
+    the column is factorized, the function runs once per unique value
+    (unless it is cached from a previous chunk) and the results are
+    mapped back to the rows by the integer codes.
+
+    Memoizing only pays off for repeating values: columns with more than
+    `threshold` unique values per row are evaluated row by row.
+
+    Example:
+        >>> cache = ValueCache(str.upper, threshold=0.5)
+        >>> list(cache.apply(pd.Series(['a', 'b', 'a', 'a'])))
+        ['A', 'B', 'A', 'A']
+        >>> cache.cache.misses, len(cache.cache)
+        (2, 2)
+    """
+
+    def __init__(self, func: Callable[[Any], Any], maxsize: int = 10000,
+                 threshold: float = 0.5) -> None:
+        """
+        :param func: pure function of a single value
+        :param maxsize: max. number of cached results (LRU)
+        :param threshold: max. ratio of unique values to rows
+        """
+        self.func = func
+        self.threshold = threshold
+        self.cache = LRUCache(maxsize)
+
+    def apply(self, column: pd.Series) -> pd.Series:
+        if column.empty:
+            return column.apply(self.func)
+        try:
+            codes, uniques = pd.factorize(column)
+        except TypeError:
+            # unhashable values (e.g. lists of a JSON source)
+            return column.apply(self.func)
+        if len(uniques) > self.threshold * len(column):
+            self.logger.debug(
+                "Column '%s' has %d unique values in %d rows, not memoizing",
+                column.name, len(uniques), len(column)
+            )
+            return column.apply(self.func)
+
+        # the last slot holds the result for missing values (code -1)
+        values = np.empty(len(uniques) + 1, dtype=object)
+        values[:-1] = self.__lookup(list(uniques))
+        missing = codes == -1
+        if missing.any():
+            values[-1] = self.func(column[missing].iloc[0])
+        return pd.Series(
+            values.take(codes), index=column.index, name=column.name
+        ).infer_objects()
+
+    def __lookup(self, uniques: List[Any]) -> List[Any]:
+        results = []
+        for value in uniques:
+            result = self.cache.get(value, self)
+            if result is self:
+                result = self.func(value)
+                self.cache.put(value, result)
+            results.append(result)
+        return results
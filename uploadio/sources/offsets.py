@@ -0,0 +1,68 @@
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+import attr
+
+from uploadio.utils import Loggable
+
+
+@attr.s
+class FileOffset:
+    """
+    How far an append-only file has been ingested
+    :param offset: byte offset after the last ingested line
+    :param rows: number of ingested rows (excluding the header)
+    :param header: column names of the file's header line
+    :param inode: identifies the file, a new inode means the file was replaced
+    """
+    offset: int = attr.ib(default=0)
+    rows: int = attr.ib(default=0)
+    header: Optional[List[str]] = attr.ib(default=None)
+    inode: Optional[int] = attr.ib(default=None)
+
+
+class OffsetStore(Loggable):
+    """
+    Remembers the committed :py:class:`FileOffset` of every file.
+    With a `path` the offsets are persisted as JSON (and survive restarts),
+    otherwise they are only kept in memory.
+
+    Example:
+        >>> store = OffsetStore()
+        >>> store.get('/tmp/log.csv')
+        FileOffset(offset=0, rows=0, header=None, inode=None)
+        >>> store.commit('/tmp/log.csv', FileOffset(42, 2, ['a', 'b'], 1))
+        >>> store.get('/tmp/log.csv').rows
+        2
+    """
+
+    def __init__(self, path: str = None) -> None:
+        self.path = path
+        self.__lock = threading.Lock()
+        self.__offsets: Dict[str, FileOffset] = {}
+        if path and os.path.exists(path):
+            with open(path, 'r') as state:
+                self.__offsets = {
+                    uri: FileOffset(**offset)
+                    for uri, offset in json.load(state).items()
+                }
+
+    def get(self, uri: str) -> FileOffset:
+        """ The committed offset of `uri`, the start for unknown files """
+        offset = self.__offsets.get(os.path.abspath(uri), None)
+        return attr.evolve(offset) if offset else FileOffset()
+
+    def commit(self, uri: str, offset: FileOffset) -> None:
+        with self.__lock:
+            self.__offsets[os.path.abspath(uri)] = offset
+            if not self.path:
+                return
+            # replace the file atomically, a crash keeps the previous state
+            tmp = f"{self.path}.tmp"
+            with open(tmp, 'w') as state:
+                json.dump({u: attr.asdict(o)
+                           for u, o in self.__offsets.items()}, state)
+            os.replace(tmp, self.path)
+        self.logger.debug("Committed %s of %s", offset, uri)
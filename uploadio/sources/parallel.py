@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Iterator, Tuple, Union
+
+from uploadio.sources.collection import SourceDefinition
+from uploadio.utils import LazyModule, Loggable
+
+pd = LazyModule('pandas')
+
+# State of a worker process, set once by the pool initializer
+_WORKER: Dict[str, Any] = {}
+
+
+def _initialize(collection: SourceDefinition, parser: Union[str, type],
+                options: Dict[str, Any]) -> None:
+    from uploadio.sources.parser import ParserFactory
+    _WORKER['collection'] = collection
+    _WORKER['parser'] = parser if isinstance(parser, type) \
+        else ParserFactory.load(parser)
+    _WORKER['options'] = dict(options, workers=1)
+    # memoized rules of the chunks parsed by this worker
+    _WORKER['caches'] = {}
+
+
+def _parse(chunk: pd.DataFrame) -> Tuple[str, Any]:
+    parser = _WORKER['parser'](
+        source=chunk,
+        collection=_WORKER['collection'],
+        caches=_WORKER['caches'],
+        options=_WORKER['options']
+    )
+    result = parser.parse()
+    if not isinstance(result, pd.DataFrame):
+        return 'events', list(result)
+    return _export(result)
+
+
+def _export(frame: pd.DataFrame) -> Tuple[str, Any]:
+    """
+    Writes the frame as Arrow IPC stream into a shared memory block and
+    only returns its name and size, so the result is not pickled.
+    Falls back to pickling, if pyarrow or shared memory is not available
+    or the frame cannot be converted.
+    """
+    try:
+        import pyarrow as pa
+        from multiprocessing import shared_memory
+    except ImportError:
+        return 'frame', frame
+
+    try:
+        table = pa.Table.from_pandas(frame, preserve_index=True)
+    except (pa.ArrowException, ValueError, TypeError):
+        return 'frame', frame
+
+    size = _ipc_size(table)
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        _write_ipc(table, pa.py_buffer(shm.buf))
+    finally:
+        shm.close()
+    # the parent unlinks the block, so this process must not track it
+    from multiprocessing import resource_tracker
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return 'arrow', (shm.name, size)
+
+
+def _write_ipc(table, buffer) -> None:
+    """ All references to `buffer` are gone, when this returns """
+    import pyarrow as pa
+    sink = pa.FixedSizeBufferWriter(buffer)
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    sink.close()
+
+
+def _ipc_size(table) -> int:
+    import pyarrow as pa
+    sink = pa.MockOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.size()
+
+
+def _import(kind: str, payload: Any) -> Any:
+    if kind != 'arrow':
+        return payload
+
+    import pyarrow as pa
+    from multiprocessing import shared_memory
+    name, size = payload
+    shm = shared_memory.SharedMemory(name=name)
+    buffer = pa.py_buffer(shm.buf)
+    try:
+        # to_pandas copies out of the shared block, which is freed below
+        table = pa.ipc.open_stream(buffer.slice(0, size)).read_all()
+        frame = table.to_pandas()
+        del table
+    finally:
+        del buffer
+        shm.close()
+        shm.unlink()
+    return frame
+
+
+class ProcessPoolParser(Loggable):
+    """
+    Parses chunks of a source in a pool of worker processes, so that
+    CPU-bound rules (e.g. 'regexreplace', 'lambda', row hashing) are not
+    serialized by the GIL.
+
+    The `SourceDefinition` is sent to every worker once by the pool's
+    initializer. Parsed frames come back as Arrow buffers in shared memory,
+    events (e.g. ``JSONEventParser``) as lists.
+
+    Example:
+        with ProcessPoolParser(collection, workers=4) as pool:
+            result = pd.concat(pool.parse(source, chunksize=50000))
+    """
+
+    def __init__(self,
+                 collection: SourceDefinition,
+                 workers: int = None,
+                 options: Dict[str, Any] = None,
+                 parser: Union[str, type] = None) -> None:
+        """
+        :param collection: source definition to parse
+        :param workers: number of processes, defaults to the number of cores
+        :param options: parser options, defaults to the catalog's
+        :param parser: parser name or class, defaults to the catalog's
+        """
+        self.workers = workers or os.cpu_count()
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_initialize,
+            initargs=(
+                collection,
+                parser or collection.parser,
+                options if options is not None
+                else collection.parser_config.get('options', {})
+            )
+        )
+
+    def submit(self, chunk: pd.DataFrame) -> Future:
+        """ Parses the chunk, the future's result is the parsed chunk """
+        result: Future = Future()
+
+        def done(future: Future) -> None:
+            try:
+                result.set_result(_import(*future.result()))
+            except BaseException as why:
+                result.set_exception(why)
+
+        self.pool.submit(_parse, chunk).add_done_callback(done)
+        return result
+
+    def parse(self, source: pd.DataFrame,
+              chunksize: int = None) -> Iterator[Any]:
+        """
+        Splits the source into row ranges and yields the parsed chunks
+        in order of the source
+        """
+        chunksize = chunksize or max(len(source) // (self.workers * 4), 1)
+        self.logger.debug(
+            "Parsing %d rows in chunks of %d with %d processes",
+            len(source), chunksize, self.workers
+        )
+        futures = [
+            self.submit(source.iloc[start:start + chunksize])
+            for start in range(0, len(source), chunksize)
+        ]
+        for future in futures:
+            yield future.result()
+
+    def close(self) -> None:
+        self.pool.shutdown()
+
+    def __enter__(self) -> 'ProcessPoolParser':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
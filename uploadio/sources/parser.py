@@ -1,14 +1,24 @@
+from __future__ import annotations
+
+import functools
 from abc import abstractmethod
 from collections import deque
 from typing import Any, Dict, List, Type
 
-import pandas as pd
-
-from src.p3common.common import validators as validate
 from src.p3common.common.validators.utils import ValidationException
+from uploadio.common.registry import Registry
 from uploadio.sources.collection import Field, SourceDefinition
-from uploadio.sources.transformation import TransformationType
-from uploadio.utils import Loggable, make_md5
+from uploadio.sources.memo import ValueCache
+from uploadio.sources.transformation import Transformation, TransformationType
+from uploadio.utils import LazyModule, Loggable, make_md5
+
+pd = LazyModule('pandas')
+
+
+def apply_chain(rules: List[Transformation], value: Any) -> Any:
+    for rule in rules:
+        value = rule.transform(value)
+    return value
 
 
 class Parser(Loggable):
@@ -21,19 +31,32 @@ class Parser(Loggable):
     The base idea is, that the parser iterates over the source and does
     something with it. E.g. convert it into AvroEvents or in a very simple way
     only print the information to stdout....
+
+    With the option ``memoize`` the rules are evaluated once per unique
+    value of a column (see :py:class:`ValueCache`), which pays off for
+    repeating values like booking types or names. ``memoize_threshold``
+    (default 0.5) is the max. ratio of unique values to rows to memoize a
+    column, ``memoize_cache_size`` (default 10000) the number of results,
+    which are kept per field across the chunks, whose parsers share
+    `caches`. Rules must be pure functions.
     """
 
     def __init__(
             self,
             source: pd.DataFrame,
             collection: SourceDefinition,
+            caches: Dict[str, ValueCache] = None,
             **options) -> None:
         """
         :param source: The source represented as a pandas.DataFrame
         :param collection: The information about the source
+        :param caches: memoized results of the rules per field name,
+            e.g. shared by the parsers of the chunks of one run
         """
-        self.source = source
+        ignored = [c for c in collection.ignored if c in source.columns]
+        self.source = source.drop(columns=ignored) if ignored else source
         self.collection = collection
+        self.caches = {} if caches is None else caches
         self.options = options or {}
 
     @abstractmethod
@@ -43,6 +66,49 @@ class Parser(Loggable):
         """
         raise NotImplementedError()
 
+    def apply_rules(self, field: Field, column: pd.Series) -> pd.Series:
+        """ Applies the rules of the field to all values of its column """
+        rules = list(field.rules().values())
+        if not rules:
+            return column
+        if not self.option('memoize', False):
+            for rule in rules:
+                column = column.apply(rule.transform)
+            return column
+        if field.name not in self.caches:
+            self.caches[field.name] = ValueCache(
+                functools.partial(apply_chain, rules),
+                maxsize=self.option('memoize_cache_size', 10000),
+                threshold=self.option('memoize_threshold', 0.5)
+            )
+        return self.caches[field.name].apply(column)
+
+    def option(self, name: str, default: Any = None) -> Any:
+        """ Parser option as defined in ``parser.options`` of the catalog """
+        return self.options.get('options', {}).get(name, default)
+
+    def parallel(self) -> Any:
+        """
+        Process pool execution mode, enabled by the options ``workers``
+        (number of processes > 1) and ``chunksize`` (rows per task).
+        :return: iterator over the parsed chunks or None if disabled
+        """
+        workers = self.option('workers', 1)
+        if not workers or workers <= 1:
+            return None
+
+        from uploadio.sources.parallel import ProcessPoolParser
+
+        def parse():
+            with ProcessPoolParser(
+                    self.collection,
+                    workers=workers,
+                    options=self.options.get('options', {}),
+                    parser=self.__class__) as pool:
+                yield from pool.parse(self.source, self.option('chunksize'))
+
+        return parse()
+
 
 class SimpleParser(Parser):
 
@@ -80,15 +146,33 @@ class JSONEventParser(Parser):
         """
         self.collection.validate(list(self.source.columns))
 
-        for rix, row in self.source.iterrows():
+        chunks = self.parallel()
+        if chunks is not None:
+            for events in chunks:
+                yield from events
+            return
+
+        # memoized rules are applied to whole columns in advance
+        memoize = self.option('memoize', False)
+        source = self.source
+        if memoize:
+            source = pd.DataFrame({
+                column: self.apply_rules(
+                    self.collection.field(column), source[column]
+                )
+                for column in source.columns
+            }, columns=source.columns)
+
+        for rix, row in source.iterrows():
             fields = dict()
             for column, value in row.iteritems():
                 field = self.collection.field(column)
                 datatype = field.data_type
                 mandatory = field.data_type is not None
                 column = field.alias if field.has_alias() else column
-                for rule in field.rules().values():
-                    value = rule.transform(value)
+                if not memoize:
+                    for rule in field.rules().values():
+                        value = rule.transform(value)
 
                 if any(map(
                         lambda f: f.transform(value), field.filters().values()
@@ -127,13 +211,14 @@ class DBOutputParser(Parser):
                 f"vs. target ({len(self.collection.fields)}) do not match!"
             )
 
-        result = self.source.copy()        
+        chunks = self.parallel()
+        if chunks is not None:
+            return pd.concat(list(chunks))
+
+        result = self.source.copy()
         for column in result.columns:
             field = self.collection.field(column)
-            for rule in field.rules().values():
-                result[column] = result[column].apply(
-                    lambda x: rule.transform(x)
-                )
+            result[column] = self.apply_rules(field, result[column])
 
             if field.has_alias():
                 result.rename(columns={column: field.alias}, inplace=True)
@@ -143,14 +228,36 @@ class DBOutputParser(Parser):
         # test/sources/test_transformation.py::test_filter_on_df
         #
 
-        if self.options.get('options', {}).get('row_hash', False):
-            result['row_hash'] = pd.Series(
-                (make_md5(str(row)) for i, row in result.iterrows())
-            )
+        row_hash = self.option('row_hash', False)
+        if row_hash:
+            result['row_hash'] = self.row_hashes(result, row_hash)
             result.set_index('row_hash', inplace=True)
         
         return result
 
+    @staticmethod
+    def row_hashes(frame: pd.DataFrame, mode: Any = True) -> pd.Series:
+        """
+        md5 of every row of the parser option ``row_hash``: ``true`` (or
+        another true value like 1, but no other string) hashes the printed
+        row including its index label (the hash of tables loaded so far),
+        ``"values"`` only the values, so the same row has
+        the same hash in every file and at every position (e.g. to
+        deduplicate overlapping exports). Switching an existing table to
+        ``"values"`` requires loading it again.
+        """
+        if mode == 'values':
+            hashes = (make_md5('\x1f'.join(row))
+                      for row in frame.astype(str).values.tolist())
+        elif mode and not isinstance(mode, str):
+            hashes = (make_md5(str(row)) for _, row in frame.iterrows())
+        else:
+            raise ValueError(
+                f"Invalid parser option row_hash: {mode!r}, "
+                "use true or \"values\""
+            )
+        return pd.Series(hashes, index=frame.index)
+
 
 class ParserFactory:
     """
@@ -162,15 +269,16 @@ class ParserFactory:
                     "schema": "schema_new.avsc"
                 }
             },
+    Further parsers are registered as entry points of the group
+    'uploadio.parsers' (see :py:class:`Registry`).
     """
 
-    __MAPPING: Dict[str, Type[Parser]] = {
+    REGISTRY = Registry('uploadio.parsers', {
         "StdOut": SimpleParser,
         "JSONEvent": JSONEventParser,
         "DBOut": DBOutputParser
-    }
+    })
 
     @staticmethod
     def load(name: str) -> Type[Parser]:
-        validate.is_in_dict_keys(name, ParserFactory.__MAPPING)
-        return ParserFactory.__MAPPING[name]
+        return ParserFactory.REGISTRY.load(name)
@@ -0,0 +1,402 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import attr
+
+from uploadio.sources.chunking import ChunkSizer
+from uploadio.sources.collection import SourceDefinition
+from uploadio.sources.memo import ValueCache
+from uploadio.sources.parallel import ProcessPoolParser
+from uploadio.sources.parser import ParserFactory
+from uploadio.sources.profile import Profile
+from uploadio.sources.source import Source
+from uploadio.sources.target import Target
+from uploadio.utils import LazyModule, Loggable, file_fingerprint
+
+pd = LazyModule('pandas')
+
+
+@attr.s
+class RunMetrics:
+    """
+    What happened during a :py:class:`Pipeline` run.
+    The stage timings overlap, so they add up to more than `seconds`.
+    `dropped_rows` counts the rows, which the parser did not return
+    (e.g. filtered), `profile` holds the column statistics of a profiled
+    run (see :py:class:`Profile`). `chunksize` and `write_chunksize` are
+    the rows per chunk and per write, which were used (chosen by a
+    :py:class:`ChunkSizer` with a memory budget, write None means the
+    target's default), `bytes_per_row` is the measured memory per row.
+    """
+    chunks: int = attr.ib(default=0)
+    rows: int = attr.ib(default=0)
+    seconds: float = attr.ib(default=0.0)
+    read_seconds: float = attr.ib(default=0.0)
+    parse_seconds: float = attr.ib(default=0.0)
+    write_seconds: float = attr.ib(default=0.0)
+    skipped_chunks: int = attr.ib(default=0)
+    dropped_rows: int = attr.ib(default=0)
+    profile: Optional[Profile] = attr.ib(default=None, repr=False)
+    chunksize: Optional[int] = attr.ib(default=None)
+    write_chunksize: Optional[int] = attr.ib(default=None)
+    bytes_per_row: Optional[float] = attr.ib(default=None)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def parse_chunk(collection: SourceDefinition, chunk: pd.DataFrame,
+                caches: Dict[str, ValueCache] = None) -> Any:
+    """
+    Runs the parser of the collection on one chunk. Lazy parsers
+    (generators) are materialized, so that the work happens here
+    and not in the writing stage.
+    :param caches: memoized rules of the run (see :py:class:`Parser`)
+    """
+    parser = ParserFactory.load(collection.parser)
+    result = parser(
+        source=chunk,
+        collection=collection,
+        caches=caches,
+        options=collection.parser_config.get('options', {})
+    ).parse()
+    return result if isinstance(result, pd.DataFrame) else list(result)
+
+
+class Pipeline(Loggable):
+    """
+    Runs ``Source.chunks`` -> ``Parser.parse`` -> ``Target.write`` as three
+    concurrent asyncio stages connected by bounded queues. While chunk N is
+    written, chunk N+1 is parsed and chunk N+2 is read.
+
+    Blocking I/O runs on a reading and a writing thread, parsing on
+    `executor` (a thread pool by default). For CPU-heavy catalogs pass
+    `workers` to parse in a :py:class:`ProcessPoolParser` instead, which
+    parses up to `workers` chunks at the same time.
+
+    With `checkpoint` every chunk is committed together with the file's
+    fingerprint and the chunk index (see :py:meth:`Target.last_checkpoint`).
+    A run of the same file resumes after the last committed chunk, the
+    chunks before are read but neither parsed nor written again.
+
+    With `profile` (or the parser option ``profile``) the parsed chunks
+    are profiled in the parsing stage, no second scan is needed. The
+    statistics are returned with the metrics and recorded by the target
+    (see :py:meth:`Target.record_profile`).
+
+    With a `memory_budget` the chunk sizes are chosen by a
+    :py:class:`ChunkSizer`: the first chunk is read with a few rows and
+    measured, the source is resized for the following chunks (sources,
+    which cannot be resized, are split) and every write is passed the
+    rows per write as `chunksize`.
+
+    The target is closed at the end of every run, also if it failed (e.g.
+    to join the threads of a fan-out), after its last write finished.
+
+    Example:
+        target = DatabaseTarget(config=collection.target_config)
+        metrics = Pipeline(collection, target, chunksize=10000).run(uri)
+    """
+
+    __DONE = object()
+
+    def __init__(self,
+                 collection: SourceDefinition,
+                 target: Target,
+                 chunksize: int = 10000,
+                 queue_size: int = 2,
+                 executor: Executor = None,
+                 source: Source = None,
+                 workers: int = None,
+                 checkpoint: bool = False,
+                 profile: bool = None,
+                 memory_budget: int = None) -> None:
+        """
+        :param collection: source definition to run
+        :param target: target to write every parsed chunk to
+        :param chunksize: rows per chunk
+        :param queue_size: max. number of chunks waiting between two stages
+        :param executor: executor for the parsing stage
+        :param source: source to read, defaults to the collection's source
+        :param workers: number of parser processes, None parses on `executor`
+        :param checkpoint: commit checkpoints and resume from them
+            (requires the same `chunksize` for every run of a file)
+        :param profile: collect column statistics, None uses the parser
+            option ``profile`` of the catalog (default False)
+        :param memory_budget: max. bytes of the chunks in memory, chooses
+            the chunk sizes (`chunksize` is the max. rows of the first
+            chunk), None reads chunks of `chunksize` rows
+        """
+        self.collection = collection
+        self.target = target
+        self.source = source or collection.source
+        self.chunksize = chunksize
+        self.queue_size = queue_size
+        self.executor = executor
+        self.workers = workers
+        self.checkpoint = checkpoint
+        self.profile = profile if profile is not None else \
+            collection.parser_config.get('options', {}).get('profile', False)
+        self.memory_budget = memory_budget
+
+    def run(self, uri: str = None, **kwargs) -> RunMetrics:
+        """
+        Runs the pipeline in a new event loop (blocking)
+        :param uri: source URI, None uses the one of the catalog
+        :param kwargs: passed to every :py:meth:`Target.write`
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self.run_async(uri, **kwargs))
+        finally:
+            loop.close()
+
+    async def run_async(self, uri: str = None, **kwargs) -> RunMetrics:
+        """ Coroutine version of :py:meth:`run` """
+        metrics = RunMetrics(profile=Profile() if self.profile else None)
+        sizer = ChunkSizer(self.memory_budget, queue_size=self.queue_size) \
+            if self.memory_budget else None
+        fingerprint, resume = self.__resume(uri)
+        parsed: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        chunks: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        # memoized rules of this run, the workers of a pool keep their own
+        caches: Dict[str, ValueCache] = {}
+        start = time.monotonic()
+        pool = ProcessPoolParser(self.collection, workers=self.workers) \
+            if self.workers and self.workers > 1 else None
+        # one thread per stage, so that the target is closed after a
+        # write, which is still running when its (cancelled) task failed
+        with ThreadPoolExecutor(max_workers=1) as read_pool, \
+                ThreadPoolExecutor(max_workers=1) as write_pool:
+            tasks = [
+                asyncio.ensure_future(
+                    self.__read(uri, chunks, read_pool, metrics, resume,
+                                sizer, caches)),
+                asyncio.ensure_future(
+                    self.__parse(chunks, parsed, metrics, pool, caches)),
+                asyncio.ensure_future(
+                    self.__write(parsed, write_pool, metrics, kwargs,
+                                 fingerprint, sizer)),
+            ]
+            try:
+                done, pending = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_EXCEPTION
+                )
+                for task in pending:
+                    task.cancel()
+                for task in done:
+                    task.result()
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                await self.__close(write_pool, metrics, failed=True)
+                raise
+            finally:
+                if pool is not None:
+                    pool.close()
+            await self.__close(write_pool, metrics)
+            if metrics.profile is not None:
+                await self.__record(uri, metrics, write_pool)
+        metrics.seconds = time.monotonic() - start
+        self.logger.info(
+            "Pipeline '%s' finished: %d rows in %d chunks, %.2fs "
+            "(%.0f rows/s)", self.collection.name, metrics.rows,
+            metrics.chunks, metrics.seconds, metrics.rows_per_second
+        )
+        return metrics
+
+    def __resume(self, uri: Optional[str]) -> Tuple[Optional[str], int]:
+        """ The fingerprint of the file and the index of the first chunk """
+        if not self.checkpoint:
+            return None, 0
+        salt = f"{self.collection.name}:{self.chunksize}"
+        if self.memory_budget:
+            # the chosen sizes depend on the budget (and the first chunk)
+            salt += f":{self.memory_budget}"
+        fingerprint = file_fingerprint(uri or self.source.uri, salt=salt)
+        last = self.target.last_checkpoint(fingerprint)
+        if last is None:
+            return fingerprint, 0
+        self.logger.info("Resuming %s after chunk %d",
+                         uri or self.source.uri, last)
+        return fingerprint, last + 1
+
+    async def __read(self, uri: Optional[str], chunks: asyncio.Queue,
+                     pool: Executor, metrics: RunMetrics,
+                     resume: int, sizer: Optional[ChunkSizer],
+                     caches: Dict[str, ValueCache]) -> None:
+        loop = asyncio.get_event_loop()
+        source = self.source
+        chunksize = self.chunksize if sizer is None \
+            else min(self.chunksize, sizer.probe_rows)
+        metrics.chunksize = chunksize
+        iterator = await loop.run_in_executor(
+            pool, lambda: iter(source.chunks(uri, chunksize))
+        )
+        index = 0
+        while True:
+            start = time.monotonic()
+            chunk = await loop.run_in_executor(
+                pool, next, iterator, self.__DONE
+            )
+            metrics.read_seconds += time.monotonic() - start
+            if chunk is self.__DONE:
+                await chunks.put(chunk)
+                return
+            result = None
+            if sizer is not None and sizer.chunksize is None:
+                # the measured chunk is parsed once, its result is reused
+                result = await loop.run_in_executor(
+                    self.executor, self.__measure, sizer, chunk, caches
+                )
+                if sizer.chunksize is not None:
+                    source.resize(sizer.chunksize)
+                    metrics.chunksize = sizer.chunksize
+                    metrics.write_chunksize = sizer.write_chunksize
+                    metrics.bytes_per_row = sizer.bytes_per_row
+            for piece in self.__split(chunk, sizer, result is not None):
+                if index < resume:
+                    metrics.skipped_chunks += 1
+                else:
+                    await chunks.put((index, piece, result))
+                index += 1
+
+    def __measure(self, sizer: ChunkSizer, chunk: pd.DataFrame,
+                  caches: Dict[str, ValueCache]) -> Any:
+        result = parse_chunk(self.collection, chunk, caches)
+        sizer.observe(chunk, result)
+        return result
+
+    @staticmethod
+    def __split(chunk: pd.DataFrame, sizer: Optional[ChunkSizer],
+                measured: bool) -> List[pd.DataFrame]:
+        """ Chunks of sources, which cannot be resized, are split """
+        if sizer is None or measured or not sizer.chunksize \
+                or len(chunk) <= sizer.chunksize:
+            return [chunk]
+        return [chunk.iloc[start:start + sizer.chunksize]
+                for start in range(0, len(chunk), sizer.chunksize)]
+
+    async def __parse(self, chunks: asyncio.Queue, parsed: asyncio.Queue,
+                      metrics: RunMetrics,
+                      pool: Optional[ProcessPoolParser],
+                      caches: Dict[str, ValueCache]) -> None:
+        """
+        Parses on the executor one chunk at a time, or keeps up to
+        `workers` chunks in the process pool, the parsed chunks are put in
+        the order of the source
+        """
+        loop = asyncio.get_event_loop()
+        in_flight = pool.workers if pool is not None else 1
+        pending: Deque[Tuple[int, pd.DataFrame, float, Any]] = deque()
+        while True:
+            item = await chunks.get()
+            if item is self.__DONE:
+                while pending:
+                    await self.__parsed(pending.popleft(), parsed, metrics)
+                await parsed.put(item)
+                return
+            index, chunk, result = item
+            start = time.monotonic()
+            if result is not None:
+                # the first chunk may have been parsed to measure it
+                future = loop.create_future()
+                future.set_result(result)
+            elif pool is not None:
+                future = asyncio.wrap_future(pool.submit(chunk))
+            else:
+                future = loop.run_in_executor(
+                    self.executor, parse_chunk, self.collection, chunk, caches
+                )
+            pending.append((index, chunk, start, future))
+            if len(pending) >= in_flight:
+                await self.__parsed(pending.popleft(), parsed, metrics)
+
+    async def __parsed(self, item: Tuple[int, pd.DataFrame, float, Any],
+                       parsed: asyncio.Queue, metrics: RunMetrics) -> None:
+        """ Waits for the oldest chunk in process and passes it on """
+        loop = asyncio.get_event_loop()
+        index, chunk, start, future = item
+        result = await future
+        if metrics.profile is not None:
+            # on the parsing executor, the statistics are CPU-bound, too
+            await loop.run_in_executor(
+                self.executor, self.__profile, metrics.profile, chunk, result
+            )
+        metrics.parse_seconds += time.monotonic() - start
+        metrics.rows += len(chunk)
+        if isinstance(result, (list, pd.DataFrame)):
+            metrics.dropped_rows += max(len(chunk) - len(result), 0)
+        await parsed.put((index, result))
+
+    async def __write(self, parsed: asyncio.Queue, pool: Executor,
+                      metrics: RunMetrics, kwargs: Dict[str, Any],
+                      fingerprint: Optional[str],
+                      sizer: Optional[ChunkSizer]) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            item = await parsed.get()
+            if item is self.__DONE:
+                return
+            index, result = item
+            # only the first chunk may replace an existing table
+            options = dict(kwargs) if index == 0 \
+                else dict(kwargs, if_exists='append')
+            if fingerprint is not None:
+                options['checkpoint'] = (fingerprint, index)
+            if sizer is not None and sizer.write_chunksize:
+                options.setdefault('chunksize', sizer.write_chunksize)
+            start = time.monotonic()
+            await loop.run_in_executor(
+                pool, lambda: self.target.write(result, **options)
+            )
+            metrics.write_seconds += time.monotonic() - start
+            metrics.chunks += 1
+
+    async def __close(self, pool: Executor, metrics: RunMetrics,
+                      failed: bool = False) -> None:
+        """
+        Closes the target on the writing thread
+        :param failed: the run failed, its error is raised instead of the
+            one of closing
+        """
+        loop = asyncio.get_event_loop()
+        start = time.monotonic()
+        try:
+            await loop.run_in_executor(pool, self.target.close)
+        except Exception:
+            if not failed:
+                raise
+            self.logger.exception("Closing the target of the failed "
+                                  "pipeline '%s' failed", self.collection.name)
+        finally:
+            metrics.write_seconds += time.monotonic() - start
+
+    @staticmethod
+    def __profile(profile: Profile, chunk: pd.DataFrame, result: Any) -> None:
+        """ Profiles the parsed DataFrame, or the chunk of other parsers """
+        if isinstance(result, pd.DataFrame):
+            profile.update(result, source_rows=len(chunk))
+        else:
+            profile.update(chunk)
+
+    async def __record(self, uri: Optional[str], metrics: RunMetrics,
+                       pool: Executor) -> None:
+        """ Records the profile, the upload succeeds even if this fails """
+        loop = asyncio.get_event_loop()
+        self.logger.debug("Profile of '%s':\n%s", self.collection.name,
+                          metrics.profile.summary())
+        try:
+            await loop.run_in_executor(
+                pool, self.target.record_profile, metrics.profile,
+                uri or self.source.uri
+            )
+        except Exception:
+            self.logger.exception("Recording the profile of '%s' failed",
+                                  self.collection.name)
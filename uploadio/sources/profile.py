@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import datetime
+import json
+from typing import Any, Dict, List, Optional
+
+import attr
+
+from uploadio.utils import LazyModule, Loggable
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+
+class HyperLogLog:
+    """
+    Estimates the number of distinct values in constant memory
+    (2^`precision` one byte registers, 4 KiB by default) with a standard
+    error of about 1.04 / sqrt(2^`precision`), 1.6% by default.
+    Sketches of chunks are merged by :py:meth:`merge`.
+
+    Example:
+        >>> sketch = HyperLogLog()
+        >>> sketch.add(pd.Series(range(10000)))
+        >>> sketch.add(pd.Series(range(5000, 15000)))
+        >>> abs(sketch.estimate() - 15000) < 15000 * 0.05
+        True
+    """
+
+    def __init__(self, precision: int = 12) -> None:
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @staticmethod
+    def hash(values: pd.Series) -> np.ndarray:
+        """
+        64 bit hashes of the values, numbers are hashed as floats and other
+        objects as strings, so that 1 and 1.0 (e.g. a column with missing
+        values in another chunk) are the same value
+        """
+        if pd.api.types.is_numeric_dtype(values) \
+                and not pd.api.types.is_bool_dtype(values):
+            values = values.astype('float64')
+        elif values.dtype == object:
+            values = values.astype(str)
+        return pd.util.hash_pandas_object(values, index=False).values
+
+    def add(self, values: pd.Series) -> None:
+        hashes = self.hash(values).astype(np.uint64)
+        if not len(hashes):
+            return
+        p = np.uint64(self.precision)
+        index = (hashes >> (np.uint64(64) - p)).astype(np.int64)
+        # the rank is the position of the first 1 bit after the index bits,
+        # the top 53 bits of the rest are exact as float
+        rest = (hashes << p) >> np.uint64(11)
+        _, bits = np.frexp(rest.astype(np.float64))
+        rank = np.minimum(54 - bits, 64 - self.precision + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: HyperLogLog) -> None:
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(
+            np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # linear counting is more accurate for small cardinalities
+            return int(round(m * np.log(m / zeros)))
+        return int(round(raw))
+
+
+@attr.s
+class ColumnProfile:
+    """
+    Statistics of one column, updated chunk by chunk
+    :param lengths: number of strings per length bucket, bucket 0 holds
+        the empty strings, bucket n the lengths [2^(n-1), 2^n)
+    """
+    name: str = attr.ib()
+    count: int = attr.ib(default=0)
+    nulls: int = attr.ib(default=0)
+    min: Any = attr.ib(default=None)
+    max: Any = attr.ib(default=None)
+    min_length: Optional[int] = attr.ib(default=None)
+    max_length: Optional[int] = attr.ib(default=None)
+    total_length: int = attr.ib(default=0)
+    lengths: List[int] = attr.ib(default=attr.Factory(list))
+    sketch: HyperLogLog = attr.ib(default=attr.Factory(HyperLogLog),
+                                  repr=False)
+
+    @property
+    def distinct(self) -> int:
+        """ Estimated number of distinct values (without nulls) """
+        return self.sketch.estimate()
+
+    @property
+    def mean_length(self) -> Optional[float]:
+        strings = sum(self.lengths)
+        return self.total_length / strings if strings else None
+
+    def categorical(self, threshold: float = 0.1) -> bool:
+        """ Few distinct values, e.g. to load the column as category """
+        values = self.count - self.nulls
+        return values > 0 and self.distinct <= threshold * values
+
+    def update(self, column: pd.Series) -> None:
+        self.count += len(column)
+        missing = column.isnull()
+        self.nulls += int(missing.sum())
+        values = column[~missing]
+        if values.empty:
+            return
+        self.sketch.add(values)
+        if values.dtype == object:
+            values = values.astype(str)
+            self.__update_lengths(values.str.len().values)
+        self.min = self.__extreme(self.min, values.min(), min)
+        self.max = self.__extreme(self.max, values.max(), max)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'column_name': self.name,
+            'rows': self.count,
+            'nulls': self.nulls,
+            'distinct': self.distinct,
+            'min_value': None if self.min is None else str(self.min),
+            'max_value': None if self.max is None else str(self.max),
+            'min_length': self.min_length,
+            'max_length': self.max_length,
+            'mean_length': self.mean_length,
+            'lengths': json.dumps(self.lengths) if self.lengths else None
+        }
+
+    def __update_lengths(self, lengths: np.ndarray) -> None:
+        self.min_length = int(lengths.min()) if self.min_length is None \
+            else min(self.min_length, int(lengths.min()))
+        self.max_length = max(self.max_length or 0, int(lengths.max()))
+        self.total_length += int(lengths.sum())
+        buckets = np.zeros(len(lengths), dtype=np.int64)
+        positive = lengths > 0
+        buckets[positive] = np.floor(np.log2(lengths[positive])) + 1
+        counts = np.bincount(buckets).tolist()
+        if len(counts) > len(self.lengths):
+            self.lengths += [0] * (len(counts) - len(self.lengths))
+        for bucket, count in enumerate(counts):
+            self.lengths[bucket] += count
+
+    @staticmethod
+    def __extreme(current: Any, value: Any, pick: Any) -> Any:
+        if hasattr(value, 'item'):
+            # numpy scalars
+            value = value.item()
+        if current is None:
+            return value
+        try:
+            return pick(current, value)
+        except TypeError:
+            # e.g. numbers in the first chunk, strings in a later one
+            return pick(str(current), str(value))
+
+
+class Profile(Loggable):
+    """
+    Data quality statistics of an upload, collected in the same pass as the
+    parsing (see :py:class:`Pipeline`): per column the number of values and
+    nulls, min and max, the estimated number of distinct values
+    (:py:class:`HyperLogLog`) and the distribution of string lengths, and
+    the number of rows, which the parser dropped (e.g. by filters).
+
+    Example:
+        >>> profile = Profile()
+        >>> profile.update(pd.DataFrame({'city': ['hamburg', None]}))
+        >>> profile.update(pd.DataFrame({'city': ['berlin']}))
+        >>> city = profile.columns['city']
+        >>> city.count, city.nulls, city.distinct, city.min, city.max
+        (3, 1, 2, 'berlin', 'hamburg')
+    """
+
+    def __init__(self) -> None:
+        self.columns: Dict[str, ColumnProfile] = {}
+        self.rows = 0
+        self.dropped = 0
+
+    def update(self, data: pd.DataFrame, source_rows: int = None) -> None:
+        """
+        Adds the statistics of a chunk
+        :param data: the parsed chunk
+        :param source_rows: rows of the chunk before parsing, the difference
+            counts as dropped
+        """
+        self.rows += len(data) if source_rows is None else source_rows
+        if source_rows is not None:
+            self.dropped += max(source_rows - len(data), 0)
+        for column in data.columns:
+            name = str(column)
+            if name not in self.columns:
+                self.columns[name] = ColumnProfile(name=name)
+            self.columns[name].update(data[column])
+
+    def to_records(self, **context) -> List[Dict[str, Any]]:
+        """
+        One record per column, e.g. to store the profile in a table
+        :param context: further values of every record (e.g. the source)
+        """
+        profiled_at = datetime.datetime.utcnow()
+        return [
+            dict(context, source_rows=self.rows, dropped_rows=self.dropped,
+                 profiled_at=profiled_at, **column.to_dict())
+            for column in self.columns.values()
+        ]
+
+    def summary(self) -> str:
+        return "\n".join(
+            "{}: {} values, {} nulls, ~{} distinct, min {!r}, max {!r}".format(
+                column.name, column.count, column.nulls, column.distinct,
+                column.min, column.max
+            ) for column in self.columns.values()
+        )
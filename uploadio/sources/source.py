@@ -1,21 +1,62 @@
 from __future__ import annotations
 
+import csv
+import io
+import json
+import os
+import queue
+import socket
+import threading
+import time
 from abc import abstractmethod
-from typing import Any, Dict, Type, Union
+from typing import (Any, BinaryIO, Dict, Iterator, List, Optional, Tuple,
+                    Type, Union)
 
 import attr
-import pandas as pd
 
 from src.p3common.common import validators as validate
-from uploadio.utils import Loggable
+from uploadio.common.compression import compression, members
+from uploadio.common.registry import Registry
+from uploadio.sources.offsets import FileOffset
+from uploadio.utils import LazyModule, Loggable
+
+pd = LazyModule('pandas')
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
+
+
+def version(module: Any) -> Tuple[int, ...]:
+    """
+    Major, minor (and patch) version of a module, e.g. to use features
+    of newer versions of pandas or pyarrow only if they are installed
+    """
+    return tuple(int(part) for part in
+                 module.__version__.split('.')[:3] if part.isdigit())
 
 
 @attr.s
 class Source(Loggable):
-    """ Provides data for a specific source """
+    """
+    Provides data for a specific source
+
+    If `columns` is set, only these columns are read (projection)
+    as far as the concrete source supports it.
+    """
     uri: str = attr.ib()
     data: Union[Dict[str, Any], pd.DataFrame] = attr.ib(init=False)
-    options: Dict[str, Any] = attr.ib(default={})
+    options: Dict[str, Any] = attr.ib(default=attr.Factory(dict))
+    columns: List[str] = attr.ib(default=None)
+    # rows per chunk set by resize() while the chunks are consumed
+    resized: Optional[int] = attr.ib(init=False, default=None, repr=False)
+
+    def project(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """ Drops all columns, which are not part of the projection """
+        if not self.columns:
+            return frame
+        return frame[[c for c in frame.columns if c in self.columns]]
 
     def load(self, uri: str = None, *args, **kwargs) -> Source:
         """
@@ -35,6 +76,39 @@ class Source(Loggable):
     def _load(self, uri: str = None, *args, **kwargs) -> Source:
         raise NotImplementedError()
 
+    def chunks(self, uri: str = None, chunksize: int = None,
+               *args, **kwargs) -> Iterator[pd.DataFrame]:
+        """
+        Iterates over the source in chunks of at most `chunksize` rows
+        :param uri: see :py:meth:`load`
+        :param chunksize: rows per chunk, None reads everything at once
+        """
+        if uri:
+            validate.str_not_empty(uri)
+            self.uri = uri
+        self.resized = None
+        return self._chunks(chunksize, *args, **kwargs)
+
+    def resize(self, chunksize: int) -> None:
+        """
+        Changes the rows of the following chunks of a running
+        :py:meth:`chunks`, as far as the concrete source supports it
+        (CSV, tail and JSON files), other sources keep their chunk size
+        """
+        self.resized = chunksize
+
+    def _chunksize(self, chunksize: Optional[int]) -> Optional[int]:
+        """ The rows of the next chunk """
+        return self.resized or chunksize
+
+    def _chunks(self, chunksize: int = None,
+                *args, **kwargs) -> Iterator[pd.DataFrame]:
+        """
+        Sources which cannot be read incrementally
+        yield everything as a single chunk
+        """
+        yield self._load(self.uri, *args, **kwargs).data
+
 
 class DirectorySource(Source):
 
@@ -45,76 +119,715 @@ class DirectorySource(Source):
 
 
 class CSVSource(Source):
+    """
+    Reads a CSV file with ``pandas.read_csv`` (all options are passed on).
+
+    Compressed files (.gz, .bz2, .xz, .zst) are decompressed while
+    parsing, all CSV files of a .zip archive are read as one source.
+
+    With the option ``"engine": "arrow"`` the file is memory-mapped and
+    parsed by the multithreaded columnar reader of ``pyarrow.csv``.
+    Supported options are `encoding`, `delimiter` (or `sep`), `quotechar`,
+    `skiprows` (a number of lines) and `block_size` (bytes per parsed
+    block). With ``"arrow_dtypes": true`` the columns stay Arrow-backed
+    (``pandas.ArrowDtype``, pandas >= 1.5) instead of being converted
+    to numpy/object columns. Options, which the installed pyarrow or
+    pandas does not support, are left out.
+    """
+
+    # files of a zip archive, which are part of the source
+    MEMBERS = ['*.csv', '*.tsv']
+
+    ARROW_OPTIONS = ['engine', 'encoding', 'delimiter', 'sep', 'quotechar',
+                     'skiprows', 'block_size', 'arrow_dtypes']
 
     def _load(self, uri: str = None, *args, **kwargs) -> Source:
         self.options.update(**kwargs)
-        self.data = pd.read_csv(filepath_or_buffer=self.uri, **self.options)
+        frames = list(self.__frames(None))
+        self.data = frames[0] if len(frames) == 1 \
+            else pd.concat(frames, copy=False)
         return self
 
+    def _chunks(self, chunksize: int = None,
+                *args, **kwargs) -> Iterator[pd.DataFrame]:
+        if not chunksize:
+            yield from super()._chunks(chunksize, *args, **kwargs)
+            return
+        self.options.update(**kwargs)
+        yield from self.__frames(chunksize)
+
+    def __frames(self, chunksize: Optional[int]) -> Iterator[pd.DataFrame]:
+        """
+        Compressed files are decompressed while parsing, the members of a
+        zip archive are read one after another with a continuous index
+        """
+        if compression(self.uri) is None:
+            yield from self.__read(self.uri, chunksize)
+            return
+
+        offset = 0
+        with members(self.uri, self.MEMBERS) as files:
+            for name, stream in files:
+                self.logger.debug("Reading %s of %s", name, self.uri)
+                for frame in self.__read(stream, chunksize):
+                    frame.index = pd.RangeIndex(offset, offset + len(frame))
+                    offset += len(frame)
+                    yield frame
+
+    def __read(self, source: Union[str, BinaryIO],
+               chunksize: Optional[int]) -> Iterator[pd.DataFrame]:
+        """ :param source: path of an uncompressed file or a stream """
+        if self.__arrow:
+            if chunksize:
+                yield from self.__arrow_chunks(source, chunksize)
+            else:
+                yield self.__to_pandas(self.__arrow_table(source), 0)
+            return
+        result = pd.read_csv(
+            source, chunksize=chunksize, **self._pandas_options()
+        )
+        if chunksize:
+            yield from self._resizable(result, chunksize)
+        else:
+            yield result
+
+    def _resizable(self, reader: Any,
+                   chunksize: int) -> Iterator[pd.DataFrame]:
+        """ The chunks of a pandas reader, sized by :py:meth:`resize` """
+        while True:
+            try:
+                frame = reader.get_chunk(self._chunksize(chunksize))
+            except StopIteration:
+                return
+            yield frame
+
+    @property
+    def __arrow(self) -> bool:
+        return self.options.get('engine', None) == 'arrow'
+
+    def _pandas_options(self) -> Dict[str, Any]:
+        options = dict(self.options)
+        if self.columns and 'usecols' not in options:
+            options['usecols'] = self.columns
+        return options
+
+    def __arrow_reader_options(self) -> Dict[str, Any]:
+        from pyarrow import csv as pacsv
+        ignored = [k for k in self.options if k not in self.ARROW_OPTIONS]
+        if ignored:
+            self.logger.warning(
+                "Options %s are not supported by the arrow engine", ignored
+            )
+        if self.options.get('arrow_dtypes', False) \
+                and not hasattr(pd, 'ArrowDtype'):
+            self.logger.warning(
+                "arrow_dtypes requires pandas >= 1.5, pandas %s converts "
+                "to numpy columns", pd.__version__
+            )
+        skiprows = self.options.get('skiprows', 0) or 0
+        if not isinstance(skiprows, int):
+            raise ValueError(
+                "The arrow engine only skips a number of lines, "
+                f"not skiprows={skiprows!r}"
+            )
+        read = dict(use_threads=True, skip_rows=skiprows,
+                    encoding=self.options.get('encoding', 'utf8'))
+        if self.options.get('block_size'):
+            read['block_size'] = self.options.get('block_size')
+        parse = dict(delimiter=self.options.get(
+            'delimiter', self.options.get('sep', ',')))
+        if self.options.get('quotechar'):
+            parse['quote_char'] = self.options.get('quotechar')
+        convert = dict(include_columns=self.columns) if self.columns else {}
+        return dict(
+            read_options=pacsv.ReadOptions(**read),
+            parse_options=pacsv.ParseOptions(**parse),
+            convert_options=pacsv.ConvertOptions(**convert)
+        )
+
+    @staticmethod
+    def __arrow_input(source: Union[str, BinaryIO]):
+        """ Files are memory-mapped, streams are read as they are """
+        import pyarrow as pa
+        if isinstance(source, str):
+            return pa.memory_map(source, 'r')
+        return pa.PythonFile(source, mode='r')
+
+    def __arrow_table(self, source: Union[str, BinaryIO]):
+        from pyarrow import csv as pacsv
+        with self.__arrow_input(source) as arrow_input:
+            return pacsv.read_csv(
+                arrow_input, **self.__arrow_reader_options()
+            )
+
+    def __arrow_chunks(self, source: Union[str, BinaryIO],
+                       chunksize: int) -> Iterator[pd.DataFrame]:
+        """
+        Streams record batches from the memory-mapped file (or stream) and
+        re-slices them into chunks of `chunksize` rows
+        """
+        import pyarrow as pa
+        from pyarrow import csv as pacsv
+        if not hasattr(pacsv, 'open_csv'):
+            # pyarrow < 0.17 only reads whole tables
+            table = self.__arrow_table(source)
+            offset = 0
+            while offset < table.num_rows:
+                size = self._chunksize(chunksize)
+                yield self.__to_pandas(table.slice(offset, size), offset)
+                offset += size
+            return
+        offset = 0
+        with self.__arrow_input(source) as arrow_input:
+            reader = pacsv.open_csv(
+                arrow_input, **self.__arrow_reader_options()
+            )
+            pending, rows = [], 0
+            for batch in reader:
+                pending.append(batch)
+                rows += batch.num_rows
+                while rows >= self._chunksize(chunksize):
+                    size = self._chunksize(chunksize)
+                    table = pa.Table.from_batches(pending)
+                    rest = table.slice(size)
+                    pending, rows = rest.to_batches(), rest.num_rows
+                    yield self.__to_pandas(table.slice(0, size), offset)
+                    offset += size
+            if rows:
+                yield self.__to_pandas(
+                    pa.Table.from_batches(pending, schema=reader.schema),
+                    offset
+                )
+
+    def __to_pandas(self, table, offset: int) -> pd.DataFrame:
+        """
+        Converts without consolidating the columns into blocks,
+        the table's buffers are released while converting (pyarrow >= 2.0)
+        """
+        import pyarrow as pa
+        options = dict(split_blocks=True)
+        if version(pa) >= (2, 0):
+            options['self_destruct'] = True
+        if self.options.get('arrow_dtypes', False) \
+                and hasattr(pd, 'ArrowDtype'):
+            options['types_mapper'] = pd.ArrowDtype
+        frame = table.to_pandas(**options)
+        frame.index = pd.RangeIndex(offset, offset + len(frame))
+        return frame
+
+
+@attr.s
+class TailSource(CSVSource):
+    """
+    Tail mode for append-only CSV files: reads only the lines, which were
+    appended since `position`, so every call costs O(delta), not O(file).
+
+    Only complete lines are read, a partially written last line is left for
+    the next call. After the chunks are consumed, `position` points behind
+    the last read line; commit it (see :py:class:`OffsetStore`) once the
+    rows are written. The header is read once and kept in the position.
+    A file, which was truncated or replaced, is read from the start.
+    Tail mode uses the pandas parser, compressed files are not supported.
+    """
+    position: FileOffset = attr.ib(default=attr.Factory(FileOffset))
+
+    # options, which only make sense for the complete file
+    IGNORED = ['engine', 'arrow_dtypes', 'block_size', 'header', 'names',
+               'skiprows', 'nrows', 'chunksize']
+
+    def _load(self, uri: str = None, *args, **kwargs) -> Source:
+        self.options.update(**kwargs)
+        frames = list(self.__delta(None))
+        self.data = pd.concat(frames, copy=False) if frames \
+            else pd.DataFrame(columns=self.position.header or [])
+        return self
+
+    def _chunks(self, chunksize: int = None,
+                *args, **kwargs) -> Iterator[pd.DataFrame]:
+        self.options.update(**kwargs)
+        yield from self.__delta(chunksize)
+
+    def __delta(self, chunksize: Optional[int]) -> Iterator[pd.DataFrame]:
+        if compression(self.uri) is not None:
+            raise ValueError(f"Cannot tail the compressed file '{self.uri}'")
+        stat = os.stat(self.uri)
+        position = self.position
+        if position.inode not in (None, stat.st_ino) \
+                or stat.st_size < position.offset:
+            self.logger.warning(
+                "%s was truncated or replaced, reading it from the start",
+                self.uri
+            )
+            position = FileOffset()
+
+        options = {k: v for k, v in self._pandas_options().items()
+                   if k not in self.IGNORED}
+        with open(self.uri, 'rb') as file:
+            start, header = position.offset, position.header
+            if header is None:
+                file.seek(start)
+                line = file.readline()
+                if not line.endswith(b'\n'):
+                    return
+                header = list(pd.read_csv(
+                    io.BytesIO(line), nrows=0, **{
+                        k: v for k, v in options.items() if k != 'usecols'
+                    }
+                ).columns)
+                start = file.tell()
+
+            end = last_newline(file, start, stat.st_size)
+            rows = position.rows
+            if end > start:
+                self.logger.debug("Reading bytes %d to %d of %s",
+                                  start, end, self.uri)
+                file.seek(start)
+                reader = pd.read_csv(
+                    io.BufferedReader(_Window(file, end - start)),
+                    header=None, names=header, chunksize=chunksize, **options
+                )
+                frames = self._resizable(reader, chunksize) if chunksize \
+                    else [reader]
+                for frame in frames:
+                    frame.index = pd.RangeIndex(rows, rows + len(frame))
+                    rows += len(frame)
+                    yield frame
+        self.position = FileOffset(
+            offset=end, rows=rows, header=header, inode=stat.st_ino
+        )
+
+
+def last_newline(file: BinaryIO, start: int, end: int,
+                 size: int = 1 << 16) -> int:
+    """
+    Offset behind the last newline between `start` and `end`,
+    `start` if there is none. Searches backwards in blocks of `size` bytes.
+    Example:
+        >>> last_newline(io.BytesIO(b'a,b\\n1,2\\n3,'), 0, 10, size=2)
+        8
+    """
+    pos = end
+    while pos > start:
+        block_start = max(start, pos - size)
+        file.seek(block_start)
+        found = file.read(pos - block_start).rfind(b'\n')
+        if found >= 0:
+            return block_start + found + 1
+        pos = block_start
+    return start
+
+
+class _Window(io.RawIOBase):
+    """ Reads at most `length` bytes from the current position of `file` """
+
+    def __init__(self, file: BinaryIO, length: int) -> None:
+        self.file = file
+        self.remaining = length
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self.file.read(min(len(buffer), self.remaining))
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+
+def json_loads(data: Union[str, bytes]) -> Any:
+    """ Uses orjson if it is installed, the standard library otherwise """
+    return _json_loads(data)
+
+
+def iter_json_array(stream: io.TextIOBase,
+                    size: int = 1 << 16, head: str = '') -> Iterator[Any]:
+    """
+    Incrementally yields the items of a JSON array, which is read from
+    `stream` in blocks of `size` characters. `head` are characters,
+    which were already read from the stream.
+    Example:
+        >>> list(iter_json_array(io.StringIO('[{"a": 1}, 2, "x"]'), size=3))
+        [{'a': 1}, 2, 'x']
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = head, 0, False
+
+    def fill() -> bool:
+        nonlocal buf, pos
+        block = stream.read(size)
+        buf, pos = buf[pos:] + block, 0
+        return not block
+
+    def skip(chars: str) -> None:
+        nonlocal pos, eof
+        while True:
+            while pos < len(buf) and (buf[pos].isspace() or buf[pos] in chars):
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            eof = fill()
+
+    skip('')
+    if buf[pos:pos + 1] != '[':
+        raise ValueError("JSON document is not an array")
+    pos += 1
+    while True:
+        skip(',')
+        if pos >= len(buf) or buf[pos] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+            # a number at the end of the buffer might be incomplete
+            complete = end < len(buf) or eof
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+        if not complete:
+            eof = fill()
+            continue
+        yield item
+        pos = end
+
 
 class JSONSource(Source):
+    """
+    Reads a JSON file, ``load`` parses the whole document.
+
+    ``chunks`` streams the records instead and yields DataFrames of
+    `chunksize` records (flattened by ``json_normalize``). Options:
+        * ``lines``: true for newline-delimited JSON (one record per line)
+        * ``record_path``: dot separated path to the array of records
+          (e.g. 'data.items'), by default the top-level array is streamed
+        * ``encoding``: defaults to 'utf-8'
+
+    orjson is used for decoding if it is installed, ijson for
+    incremental parsing of nested record paths. Compressed files are
+    decompressed while reading, the records of all members of a .zip
+    archive are streamed one after another.
+    """
+
+    # files of a zip archive, which are part of the source
+    MEMBERS = ['*.json', '*.ndjson', '*.jsonl']
+
     def _load(self,
               uri: str = None,
               *args,
               df: bool = False,
               **kwargs) -> Source:
-        import json
-        with open(self.uri, "r") as json_file:
-            data = json.load(json_file)
-            json_file.close()
-        self.data = data if not df else pd.io.json.json_normalize(data, *args)
+        if self.options.get('lines', False):
+            data = list(self.__records())
+        else:
+            with members(self.uri, self.MEMBERS) as files:
+                documents = [json_loads(stream.read()) for _, stream in files]
+            # the members of an archive are a list of documents
+            data = documents[0] if len(documents) == 1 else documents
+        self.data = data if not df \
+            else self.project(pd.io.json.json_normalize(data, *args))
         return self
 
+    def _chunks(self, chunksize: int = None,
+                *args, **kwargs) -> Iterator[pd.DataFrame]:
+        chunksize = chunksize or self.options.get('chunksize', 10000)
+        offset, records = 0, []
+        for record in self.__records():
+            records.append(record)
+            if len(records) >= self._chunksize(chunksize):
+                yield self.__frame(records, offset)
+                offset, records = offset + len(records), []
+        if records:
+            yield self.__frame(records, offset)
+
+    def __frame(self, records: List[Any], offset: int) -> pd.DataFrame:
+        frame = self.project(pd.io.json.json_normalize(records))
+        frame.index = pd.RangeIndex(offset, offset + len(frame))
+        return frame
+
+    def __records(self) -> Iterator[Any]:
+        with members(self.uri, self.MEMBERS) as files:
+            for name, json_file in files:
+                self.logger.debug("Reading records of %s", name)
+                yield from self.__member_records(json_file)
+
+    def __member_records(self, json_file: BinaryIO) -> Iterator[Any]:
+        encoding = self.options.get('encoding', 'utf-8')
+        record_path = self.options.get('record_path', None)
+        if self.options.get('lines', False):
+            for line in json_file:
+                if line.strip():
+                    yield json_loads(line)
+            return
+
+        if record_path:
+            yield from self.__nested_records(json_file, record_path)
+            return
+
+        # decompressing streams cannot seek, so the array is
+        # detected by its first character
+        text = io.TextIOWrapper(json_file, encoding=encoding)
+        first = text.read(1)
+        while first.isspace():
+            first = text.read(1)
+        if first != '[':
+            # a single document is a single record
+            yield json_loads(first + text.read())
+            return
+        yield from iter_json_array(text, head=first)
+
+    def __nested_records(self, json_file: BinaryIO,
+                         record_path: str) -> Iterator[Any]:
+        try:
+            import ijson
+        except ImportError:
+            self.logger.warning(
+                "ijson is not installed, loading %s at once", self.uri
+            )
+            data = json_loads(json_file.read())
+            for key in record_path.split('.'):
+                data = data.get(key, []) if isinstance(data, dict) else []
+            yield from data
+            return
+        yield from ijson.items(json_file, f"{record_path}.item",
+                               use_float=True)
+
 
 class HTTPSource(Source):
     """
-    Downloads a file from a HTTP Uri and stores it on the filesystem
+    Downloads a file from a HTTP Uri and stores it on the filesystem.
+    Compressed downloads are stored as they are (`filename` should keep
+    the extension, e.g. 'export.csv.gz') and decompressed by the resolver
+    while parsing.
     """
     def _load(self,
               uri: str = None,
               *args,
               df: bool = False,
               **kwargs) -> Source:
+        return self.__download().load()
+
+    def _chunks(self, chunksize: int = None,
+                *args, **kwargs) -> Iterator[pd.DataFrame]:
+        yield from self.__download().chunks(chunksize=chunksize)
+
+    def __download(self) -> Source:
         validate.is_in_dict_keys('filename', self.options)
         validate.is_in_dict_keys('resolver', self.options)
 
         import requests
         filename = self.options.get('filename')
-        self.logger.info(f"HTTPSource: Downloading file {filename}")
-        req = requests.get(self.uri)
-        file = open(filename, 'wb')
-        for chunk in req.iter_content(100000):
-            file.write(chunk)
-        file.close()
+        self.logger.info("HTTPSource: Downloading file %s", filename)
+        with requests.get(self.uri, stream=True) as req:
+            req.raise_for_status()
+            with open(filename, 'wb') as file:
+                for chunk in req.iter_content(100000):
+                    file.write(chunk)
         options = dict(uri=filename, type=self.options.get('resolver'))
-        return SourceFactory.load(options).load()
+        return SourceFactory.load(options, columns=self.columns)
 
 
 class StreamSource(Source):
+    """
+    Consumes newline-delimited CSV or JSON records from a stream and
+    provides them as micro-batches (``pandas.DataFrame``).
+
+    Supported URIs:
+        * ``fd://0``: an already opened file descriptor (e.g. stdin)
+        * ``unix:///path/to/socket``: a UNIX domain socket
+        * ``tcp://host:port``: a TCP socket
+        * ``queue://name``: a local queue (see ``InProcessTransport``)
+        * any other value is opened as file (e.g. a named pipe)
+
+    A micro-batch is complete as soon as it holds ``batch_size`` records or
+    its first record waited ``batch_interval_ms``, which bounds the latency.
+    Stream options:
+        * ``format``: 'csv' (default) or 'json'
+        * ``header``: list of CSV column names, otherwise the first line
+          of the stream is the header
+        * ``encoding``: defaults to 'utf-8'
+        * ``buffer_size``: max. number of buffered records (backpressure)
+    All remaining options are passed to ``pandas.read_csv``.
+    """
+
+    STREAM_OPTIONS = ['format', 'header', 'encoding', 'batch_size',
+                      'batch_interval_ms', 'buffer_size']
+
+    __EOF = object()
 
     def _load(self, uri: str = None, *args, **kwargs) -> Source:
-        pass
+        """ Loads the next micro-batch, an empty frame at end of stream """
+        self.options.update(**kwargs)
+        self.data = next(self.batches(), pd.DataFrame())
+        return self
+
+    def _chunks(self, chunksize: int = None,
+                *args, **kwargs) -> Iterator[pd.DataFrame]:
+        """ Micro-batches, their size is configured by ``batch_size`` """
+        yield from self.batches()
+
+    def batches(self) -> Iterator[pd.DataFrame]:
+        """ Yields micro-batches until the stream is exhausted or closed """
+        self.__open()
+        batch_size = self.options.get('batch_size', 1000)
+        interval = self.options.get('batch_interval_ms', 1000) / 1000.0
+        while not self.__eof:
+            lines = []
+            line = self.__lines.get()
+            deadline = time.monotonic() + interval
+            while True:
+                if line is self.__EOF:
+                    # later calls return at once instead of waiting
+                    self.__eof = True
+                    break
+                lines.append(line)
+                timeout = deadline - time.monotonic()
+                if len(lines) >= batch_size or timeout <= 0:
+                    break
+                try:
+                    line = self.__lines.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            if lines:
+                self.logger.debug("Micro-batch of %d records", len(lines))
+                yield self.__frame(lines)
+
+    def close(self) -> None:
+        """ Stops consuming, pending records are still yielded """
+        if getattr(self, '_StreamSource__closed', None) is None:
+            # closed before it was opened, batches() yields nothing
+            self.__closed = threading.Event()
+        self.__closed.set()
+        stream = getattr(self, '_StreamSource__stream', None)
+        if stream is not None:
+            try:
+                stream.shutdown(socket.SHUT_RDWR)
+            except (AttributeError, OSError):
+                pass
+
+    def __open(self) -> None:
+        if getattr(self, '_StreamSource__reader', None) is not None:
+            return
+        self.__eof = False
+        if getattr(self, '_StreamSource__closed', None) is None:
+            self.__closed = threading.Event()
+        self.__stream = None
+        self.__lines = queue.Queue(
+            maxsize=self.options.get('buffer_size', 10000)
+        )
+        self.__header = self.options.get('header', None)
+        self.__reader = threading.Thread(
+            target=self.__pump, name='StreamSource', daemon=True
+        )
+        self.__reader.start()
+
+    def __pump(self) -> None:
+        try:
+            for line in self.__read():
+                if self.__closed.is_set():
+                    break
+                line = line.rstrip(b'\r\n')
+                if not line:
+                    continue
+                if self.__header is None and self.__format == 'csv':
+                    self.__header = next(csv.reader(
+                        [line.decode(self.__encoding)], **self.__dialect()
+                    ))
+                    continue
+                self.__lines.put(line)
+        except Exception:
+            if not self.__closed.is_set():
+                self.logger.exception("Reading stream %s failed", self.uri)
+        finally:
+            self.__lines.put(self.__EOF)
+
+    def __read(self) -> Iterator[bytes]:
+        scheme, _, location = self.uri.partition('://')
+        if scheme == 'queue':
+            from uploadio.common.messaging import InProcessTransport
+            while not self.__closed.is_set():
+                message = InProcessTransport.receive(location, timeout=0.1)
+                if message is not None:
+                    yield from message.records()
+            return
+        if scheme == 'fd':
+            stream = os.fdopen(int(location), 'rb', closefd=False)
+        elif scheme == 'unix':
+            self.__stream = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.__stream.connect(location)
+            stream = self.__stream.makefile('rb')
+        elif scheme == 'tcp':
+            host, _, port = location.rpartition(':')
+            self.__stream = socket.create_connection((host, int(port)))
+            stream = self.__stream.makefile('rb')
+        else:
+            stream = open(self.uri, 'rb')
+        with stream:
+            yield from stream
+
+    @property
+    def __format(self) -> str:
+        return self.options.get('format', 'csv')
+
+    @property
+    def __encoding(self) -> str:
+        return self.options.get('encoding', 'utf-8')
+
+    def __dialect(self) -> Dict[str, Any]:
+        dialect = {}
+        delimiter = self.options.get('delimiter', self.options.get('sep'))
+        if delimiter:
+            dialect['delimiter'] = delimiter
+        if self.options.get('quotechar'):
+            dialect['quotechar'] = self.options.get('quotechar')
+        return dialect
+
+    def __frame(self, lines: List[bytes]) -> pd.DataFrame:
+        if self.__format == 'json':
+            return self.project(pd.DataFrame.from_records(
+                [json.loads(line.decode(self.__encoding)) for line in lines]
+            ))
+        options = {k: v for k, v in self.options.items()
+                   if k not in self.STREAM_OPTIONS}
+        if self.columns and 'usecols' not in options:
+            options['usecols'] = self.columns
+        return pd.read_csv(
+            io.BytesIO(b'\n'.join(lines)),
+            header=None,
+            names=self.__header,
+            encoding=self.__encoding,
+            **options
+        )
 
 
 class SourceFactory:
+    """
+    Knows which :py:class:`Source` belongs to the `type` of a source config.
+    Further sources are registered as entry points of the group
+    'uploadio.sources' (see :py:class:`Registry`).
+    """
 
-    __MAPPING: Dict[str, Type[Source]] = {
+    REGISTRY = Registry('uploadio.sources', {
         "csv": CSVSource,
         "json": JSONSource,
-        "http": HTTPSource
-    }
+        "http": HTTPSource,
+        "stream": StreamSource,
+        "tail": TailSource
+    })
 
     @staticmethod
     def __find(name: str) -> Type[Source]:
-        validate.is_in_dict_keys(name, SourceFactory.__MAPPING)
-        return SourceFactory.__MAPPING[name]
+        return SourceFactory.REGISTRY.load(name)
 
     @classmethod
-    def load(cls, config: Dict[str, Any]) -> Source:
+    def load(cls, config: Dict[str, Any], columns: List[str] = None) -> Source:
+        """
+        :param config: source config of a catalog (type, uri, options)
+        :param columns: projection, None reads all columns
+        """
         validate.is_in_dict_keys('type', config)
         validate.is_in_dict_keys('uri', config)
         src = SourceFactory.__find(config.get('type'))
         return src(
             uri=config.get('uri'),
-            options=config.get('options', {})
+            options=dict(config.get('options', {})),
+            columns=columns
         )
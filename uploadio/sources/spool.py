@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import pickle
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from uploadio.utils import LazyModule, Loggable
+
+pd = LazyModule('pandas')
+
+Writer = Callable[..., None]
+
+_SPOOLS: Dict[str, Spool] = {}
+_SPOOLS_LOCK = threading.Lock()
+
+
+class Spool(Loggable):
+    """
+    Durable FIFO of parsed chunks in a local directory, which a background
+    thread replays to a writer (e.g. a database target), retrying with
+    exponential backoff while the writer fails.
+
+    Every chunk is a segment: the data (DataFrames as Parquet, other data
+    pickled) and a JSON file with the arguments of the write, which is
+    written last, so only complete segments are replayed. A segment is
+    removed after it was written; segments, which still fail after
+    `retries` attempts or cannot be read, are moved to the sub directory
+    'failed'.
+    Segments left by a previous process are replayed first.
+
+    There is one spool (and one drainer) per directory and process, so
+    segments are replayed in the order they were put. A directory must not
+    be shared by several processes.
+
+    Example:
+        >>> import tempfile
+        >>> spool = Spool.open(tempfile.mkdtemp())
+        >>> spool.put([1, 2], {'if_exists': 'append'})
+        '000000000000'
+        >>> written = []
+        >>> spool.start(lambda data, **options: written.append(data))
+        >>> spool.join(timeout=5), written
+        (True, [[1, 2]])
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.failed: List[str] = []
+        self.writer: Optional[Writer] = None
+        self.retries: Optional[int] = 10
+        self.backoff = 0.5
+        self.max_backoff = 60.0
+        os.makedirs(os.path.join(directory, 'failed'), exist_ok=True)
+        self.__changed = threading.Condition()
+        self.__drainer: Optional[threading.Thread] = None
+        segments = self.segments()
+        self.__sequence = int(segments[-1]) + 1 if segments else 0
+        if segments:
+            self.logger.info("Found %d segments in spool %s",
+                             len(segments), directory)
+
+    @staticmethod
+    def open(directory: str) -> Spool:
+        """ The spool of `directory`, shared by the process """
+        directory = os.path.abspath(directory)
+        with _SPOOLS_LOCK:
+            if directory not in _SPOOLS:
+                _SPOOLS[directory] = Spool(directory)
+            return _SPOOLS[directory]
+
+    def put(self, data: Any, options: Dict[str, Any],
+            args: List[Any] = None) -> str:
+        """
+        Persists a chunk and the arguments of its write
+        :param options: keyword arguments of the write
+        :param args: positional arguments of the write (after the data)
+        :return: name of the segment
+        """
+        with self.__changed:
+            name = f"{self.__sequence:012d}"
+            self.__sequence += 1
+        path = os.path.join(self.directory, name)
+        fmt = self.__dump(data, path)
+        self.__atomic(f"{path}.json", json.dumps(
+            {'format': fmt, 'args': list(args or []), 'options': options}
+        ).encode())
+        with self.__changed:
+            self.__changed.notify_all()
+        return name
+
+    def segments(self) -> List[str]:
+        """ Names of the complete segments, oldest first """
+        return sorted(
+            entry[:-len('.json')] for entry in os.listdir(self.directory)
+            if entry.endswith('.json')
+        )
+
+    def load(self, name: str) -> Tuple[Any, List[Any], Dict[str, Any]]:
+        """ The data and the positional and keyword write arguments """
+        path = os.path.join(self.directory, name)
+        segment = self.__segment(name)
+        fmt, options = segment['format'], segment['options']
+        if options.get('checkpoint') is not None:
+            options['checkpoint'] = tuple(options['checkpoint'])
+        args = segment.get('args', [])
+        if fmt == 'parquet':
+            return pd.read_parquet(f"{path}.parquet"), args, options
+        with open(f"{path}.pickle", 'rb') as data:
+            return pickle.load(data), args, options
+
+    def checkpoint(self, fingerprint: str) -> Optional[int]:
+        """ The last spooled chunk index of `fingerprint` """
+        indices = []
+        for name in self.segments():
+            _, options = self.load_options(name)
+            checkpoint = options.get('checkpoint')
+            if checkpoint is not None and checkpoint[0] == fingerprint:
+                indices.append(checkpoint[1])
+        return max(indices) if indices else None
+
+    def load_options(self, name: str) -> Tuple[str, Dict[str, Any]]:
+        """ The format and the write arguments of a segment """
+        segment = self.__segment(name)
+        return segment['format'], segment['options']
+
+    def __segment(self, name: str) -> Dict[str, Any]:
+        with open(os.path.join(self.directory, f"{name}.json"), 'r') as meta:
+            return json.load(meta)
+
+    def remove(self, name: str, failed: bool = False) -> None:
+        """ Removes a segment (or moves it to 'failed') """
+        # without reading the segment, which may be corrupt
+        for extension in ['json', 'parquet', 'pickle']:
+            path = os.path.join(self.directory, f"{name}.{extension}")
+            if not os.path.exists(path):
+                continue
+            if failed:
+                os.replace(path, os.path.join(
+                    self.directory, 'failed', f"{name}.{extension}"))
+            else:
+                os.remove(path)
+        with self.__changed:
+            if failed:
+                self.failed.append(name)
+            self.__changed.notify_all()
+
+    def start(self, writer: Writer, retries: Optional[int] = 10,
+              backoff: float = 0.5, max_backoff: float = 60.0) -> None:
+        """
+        Replays the segments to `writer` on a background thread
+        :param writer: called as ``writer(data, **options)``
+        :param retries: attempts per segment after the first one,
+            None retries forever
+        :param backoff: seconds to wait after the first failure,
+            doubled after every further failure
+        :param max_backoff: max. seconds to wait between two attempts
+        """
+        with self.__changed:
+            self.writer = writer
+            self.retries = retries
+            self.backoff = backoff
+            self.max_backoff = max_backoff
+            if self.__drainer is None:
+                self.__drainer = threading.Thread(
+                    target=self.__drain, daemon=True,
+                    name=f"spool-{os.path.basename(self.directory)}"
+                )
+                self.__drainer.start()
+
+    def join(self, timeout: float = None) -> bool:
+        """
+        Waits until all segments were replayed (or failed)
+        :return: False, if segments are left after `timeout` seconds
+        """
+        with self.__changed:
+            return self.__changed.wait_for(
+                lambda: not self.segments(), timeout=timeout
+            )
+
+    def __drain(self) -> None:
+        while True:
+            with self.__changed:
+                self.__changed.wait_for(self.segments)
+                name = self.segments()[0]
+            self.__replay(name)
+
+    def __replay(self, name: str) -> None:
+        try:
+            data, args, options = self.load(name)
+        except Exception:
+            # e.g. a truncated Parquet file, retrying does not help
+            self.logger.exception("Cannot read segment %s, moved to %s",
+                                  name, os.path.join(self.directory, 'failed'))
+            self.remove(name, failed=True)
+            return
+        attempts = itertools.count() if self.retries is None \
+            else range(self.retries + 1)
+        for attempt in attempts:
+            try:
+                self.writer(data, *args, **options)
+            except Exception as error:
+                if attempt == self.retries:
+                    self.logger.warning("Replaying segment %s failed (%s)",
+                                        name, error)
+                    break
+                delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+                self.logger.warning(
+                    "Replaying segment %s failed (%s), retrying in %.1fs",
+                    name, error, delay
+                )
+                with self.__changed:
+                    # wakes up early, if the writer is replaced
+                    writer = self.writer
+                    self.__changed.wait_for(
+                        lambda: self.writer is not writer, timeout=delay
+                    )
+                continue
+            self.remove(name)
+            self.logger.debug("Replayed segment %s", name)
+            return
+        self.logger.error("Giving up on segment %s, moved to %s", name,
+                          os.path.join(self.directory, 'failed'))
+        self.remove(name, failed=True)
+
+    @staticmethod
+    def __dump(data: Any, path: str) -> str:
+        """ Writes the data of a segment, returns its format """
+        if isinstance(data, pd.DataFrame):
+            try:
+                data.to_parquet(f"{path}.parquet.tmp", index=True)
+                os.replace(f"{path}.parquet.tmp", f"{path}.parquet")
+                return 'parquet'
+            except Exception:
+                # e.g. columns with mixed types, which arrow rejects
+                if os.path.exists(f"{path}.parquet.tmp"):
+                    os.remove(f"{path}.parquet.tmp")
+        Spool.__atomic(f"{path}.pickle", pickle.dumps(data))
+        return 'pickle'
+
+    @staticmethod
+    def __atomic(path: str, content: bytes) -> None:
+        with open(f"{path}.tmp", 'wb') as tmp:
+            tmp.write(content)
+        os.replace(f"{path}.tmp", path)
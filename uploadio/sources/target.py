@@ -1,86 +1,675 @@
 import io
 import json
+import os
+import queue
+import threading
 import time
 from abc import abstractmethod
-from typing import Any, Dict, Iterable
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import attr
-import avro.datafile
-import avro.io
-import avro.schema
 
-from uploadio.common.db import Database, DBConnection
+from src.p3common.common import validators as validate
+from uploadio.common.messaging import (BatchProducer, Compression,
+                                       TransportFactory)
+from uploadio.common.registry import Registry
 from uploadio.sources.parser import Parser
-from uploadio.utils import Loggable, make_md5
+from uploadio.utils import Loggable, SampledLogger, make_md5
 
 
 @attr.s
 class Target(Loggable):
 
     config: Dict[str, Any] = attr.ib()
-    parser: Parser = attr.ib()
+    parser: Parser = attr.ib(default=None)
     
     def output(self, *args, **kwargs) -> None:
-        self._output(*args, **kwargs)
+        """ Parses the source with the target's parser and writes it """
+        self.write(self.parser.parse(), *args, **kwargs)
+        self.close()
+
+    def write(self, data: Any, *args, **kwargs) -> None:
+        """
+        Writes already parsed data (e.g. one chunk of a pipeline)
+        :param data: result of :py:meth:`Parser.parse`
+        """
+        self._write(data, *args, **kwargs)
 
     @abstractmethod
-    def _output(self, *args, **kwargs) -> None:
+    def _write(self, data: Any, *args, **kwargs) -> None:
         raise NotImplementedError()
 
+    def last_checkpoint(self, fingerprint: str) -> Optional[int]:
+        """
+        Index of the last chunk of `fingerprint`, which was committed.
+        Targets, which cannot commit chunks transactionally, return None
+        (nothing to resume).
+        """
+        return None
+
+    def close(self) -> None:
+        """ Finishes the writes of a run (e.g. flushes buffers) """
+        pass
+
+    def record_profile(self, profile: Any, uri: str) -> None:
+        """
+        Stores the column statistics of an upload of `uri` next to the
+        data, targets without such a place only log them
+        :param profile: :py:class:`Profile` of the upload
+        """
+        self.logger.info("Profile of %s:\n%s", uri, profile.summary())
+
 
 class LoggableTarget(Target):
+    """
+    Logs the parsed elements. On big sources set ``options.log_every``
+    in the target config to only log every n-th element.
+    """
 
-    def _output(self, *args, **kwargs) -> None:
-        for elem in self.parser.parse(**kwargs):
-            self.logger.info(elem)
+    def _write(self, data: Any, *args, **kwargs) -> None:
+        sampled = SampledLogger(
+            self.logger,
+            every=self.config.get('options', {}).get('log_every', 1)
+        )
+        for elem in data:
+            sampled.log("%s", elem)
+        sampled.summary(what='elements')
 
 
 class DatabaseTarget(Target):
+    """
+    Inserts the parsed DataFrames into the table of the connection, the
+    database is selected by the URI, e.g. postgres
+    (``postgresql://user@host/db``) or an embedded SQLite file
+    (``sqlite:////data/upload.db``), which needs no server.
+
+    Options: ``if_exists`` ('replace' or 'append'), ``chunksize`` (rows per
+    executemany) and ``upsert``, which replaces rows with the same primary
+    key (e.g. the row_hash of a table created by the runner) instead of
+    failing on duplicates.
+
+    With ``dedup`` rows, whose row_hash is already in the table, are dropped
+    before they are sent to the database (see :py:class:`HashIndex`). The
+    known hashes are read from the table once per process, or from the file
+    ``{"dedup": {"path": "/var/lib/upload.io/kontoauszug.npy"}}``, which is
+    updated by :py:meth:`close`. Upserting and deduplicating append by
+    default.
+    """
 
-    def __init__(self, config: Dict[str, Any], parser: Parser) -> None:
+    def __init__(self, config: Dict[str, Any], parser: Parser = None) -> None:
         super().__init__(config, parser)
+        # sqlalchemy is only imported, if a catalog writes to a database
+        from uploadio.common.db import Database, DBConnection
         self.db = Database(connection=DBConnection(self.config['connection']))
-        
-    def _output(self, **kwargs) -> None:
+        self.dedup = None
+        dedup = self.config.get('options', {}).get('dedup', False)
+        if dedup is True or isinstance(dedup, dict):
+            from uploadio.sources.dedup import HashIndex
+            connection = self.config['connection']
+            self.dedup = HashIndex.open(
+                "{}/{}".format(connection['uri'], connection['table']),
+                path=dedup.get('path', None) if isinstance(dedup, dict)
+                else None
+            )
+
+    def _write(self, data: Any, if_exists: str = None,
+               checkpoint: Tuple[str, int] = None, chunksize: int = None,
+               **kwargs) -> None:
+        """
+        :param if_exists: 'replace' or 'append', overrides
+            ``options.if_exists`` of the target config (default 'replace')
+        :param checkpoint: (fingerprint, chunk index), which is committed
+            together with the rows
+        :param chunksize: rows per executemany, overrides
+            ``options.chunksize`` (e.g. chosen for a memory budget)
+        """
+        options = self.config.get('options', {})
+        upsert = options.get('upsert', False)
+        if_exists = if_exists or options.get(
+            'if_exists',
+            'append' if upsert or self.dedup is not None else 'replace'
+        )
+        hashes = None
+        if self.dedup is not None:
+            data, hashes = self.__deduplicate(data, if_exists)
         self.db.insert(
-            data=self.parser.parse(**kwargs),
-            chunksize=self.config.get('options', {}).get('chunksize', None)
+            data=data,
+            chunksize=chunksize or options.get('chunksize', None),
+            if_exists=if_exists,
+            checkpoint=checkpoint,
+            upsert=upsert
         )
+        if hashes is not None:
+            self.dedup.add(hashes)
+
+    def close(self) -> None:
+        # an index, which was never completed, must not look valid
+        if self.dedup is not None and self.dedup.loaded:
+            self.dedup.save(rows=self.db.count())
+
+    def last_checkpoint(self, fingerprint: str) -> Optional[int]:
+        return self.db.last_checkpoint(fingerprint)
+
+    def record_profile(self, profile: Any, uri: str) -> None:
+        """ Inserts the statistics into the control table of profiles """
+        self.db.record_profile(profile.to_records(source=uri))
+
+    def __deduplicate(self, data: Any, if_exists: str) -> Tuple[Any, Any]:
+        """ The unknown rows of `data` and their row hashes """
+        import pandas as pd
+
+        if data.index.name == 'row_hash':
+            hashes = data.index
+        elif 'row_hash' in data.columns:
+            hashes = pd.Index(data['row_hash'])
+        else:
+            raise ValueError("Deduplicating requires the parser option "
+                             "'row_hash'")
+        if if_exists == 'replace':
+            self.dedup.clear()
+            self.dedup.loaded = True
+        elif not self.dedup.loaded:
+            self.__load_hashes()
+        new = self.dedup.new(hashes)
+        if not new.all():
+            self.logger.info("Dropped %d of %d rows, which are already in "
+                             "the table", len(new) - new.sum(), len(new))
+        return data[new], hashes[new]
+
+    def __load_hashes(self) -> None:
+        """ Adds the row hashes of the table to the index """
+        with self.dedup.lock:
+            if self.dedup.loaded:
+                return
+            if self.dedup.persisted and self.dedup.validate(self.db.count()):
+                self.logger.info("Loaded %d row hashes from %s",
+                                 len(self.dedup), self.dedup.path)
+                return
+            if self.db.has_table():
+                table = self.db.table()
+                if 'row_hash' not in table.c:
+                    raise ValueError("Table '{}' has no column row_hash"
+                                     .format(table.name))
+                statement = table.select().with_only_columns(
+                    [table.c.row_hash]
+                )
+                for chunk in self.db.select_chunks(statement,
+                                                   chunksize=100000):
+                    self.dedup.add(chunk['row_hash'])
+            self.dedup.loaded = True
+            self.logger.info("Loaded %d row hashes of table '%s'",
+                             len(self.dedup),
+                             self.config['connection']['table'])
        
 
+def make_event(elem: Dict[str, Any], event_date: int, namespace: str = '',
+               version: str = '', source: str = '') -> Dict[str, Any]:
+    """ Wraps a parsed element (see ``JSONEventParser``) into an event """
+    return {
+        "event_id": make_md5(str(elem.get('fields'))),
+        "event_date": event_date,
+        "namespace": namespace,
+        "version": version,
+        "source": source,
+        "columns": list(elem['fields'].keys()),
+        "data": elem
+    }
+
+
+def parse_avro_schema(schema: Dict[str, Any]) -> Any:
+    import avro.schema
+    # avro-python3 names it Parse, avro >= 1.10 parse
+    parse = getattr(avro.schema, 'Parse', None) or avro.schema.parse
+    return parse(json.dumps(schema))
+
+
+def avro_schema(config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    The Avro schema of a target config: ``options.schema`` (the schema or
+    the path of an .avsc file) or the path ``connection.schema``
+    """
+    schema = config.get('options', {}).get('schema') \
+        or config.get('connection', {}).get('schema')
+    if isinstance(schema, str):
+        with open(schema, 'r') as avsc:
+            return json.load(avsc)
+    return schema
+
+
 class AvroTarget(Target):
+    """
+    Converts the parsed elements (see ``JSONEventParser``) into events and
+    writes them to an Avro container file, which is finished by
+    :py:meth:`close`. Example target config:
+    "target": {
+        "type": "avro",
+        "connection": {"uri": "/data/kontoauszug.avro"},
+        "options": {"schema": "./resources/schema.avsc"}
+    }
+    A run, which appends (``if_exists='append'``), appends the events to an
+    existing file, the schema of the file is kept.
+    """
 
-    def __init__(self, config: Dict[str, Any], parser: Parser,
-                 schema: Dict[str, Any]) -> None:
+    def __init__(self, config: Dict[str, Any], parser: Parser = None,
+                 schema: Dict[str, Any] = None) -> None:
+        """ :param schema: overrides the schema of the target config """
         super().__init__(config, parser)
-        self.schema = avro.schema.Parse(json.dumps(schema))
-
-    def _output(self,
-                namespace: str = '',
-                version: str = '',
-                source: str = '',
-                **kwargs) -> None:
+        validate.is_in_dict_keys('connection', self.config)
+        schema = schema or avro_schema(self.config)
+        if schema is None:
+            raise ValueError("The Avro target requires a schema")
+        self.schema = parse_avro_schema(schema)
+        self.writer = None
 
-        buf = io.BytesIO()
-        writer = avro.datafile.DataFileWriter(
-            buf, avro.io.DatumWriter(), self.schema)
+    def _write(self,
+               data: Any,
+               namespace: str = '',
+               version: str = '',
+               source: str = '',
+               if_exists: str = None,
+               **kwargs) -> None:
+        if self.writer is None:
+            self.writer = self.__open(if_exists)
         ts = int(time.time())
-        for elem in self.parser.parse(**kwargs):
-            writer.append({
-                "event_id": make_md5(str(elem.get('fields'))),
-                "event_date": ts,
-                "namespace": namespace,
-                "version": version,
-                "source": source,
-                "columns": list(elem['fields'].keys()),
-                "data": elem
-            })
-        writer.flush()
-        buf.seek(0)
-        print(buf.read())
+        for elem in data:
+            self.writer.append(make_event(elem, ts, namespace, version, source))
+        self.writer.flush()
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def __open(self, if_exists: Optional[str]) -> Any:
+        import avro.datafile
+        import avro.io
+
+        path = self.config['connection']['uri']
+        if if_exists == 'append' and os.path.exists(path) \
+                and os.path.getsize(path) > 0:
+            return avro.datafile.DataFileWriter(
+                open(path, 'a+b'), avro.io.DatumWriter()
+            )
+        return avro.datafile.DataFileWriter(
+            open(path, 'wb'), avro.io.DatumWriter(), self.schema
+        )
 
 
 class MessageQueueTarget(Target):
+    """
+    Converts the parsed elements into events and puts them on a queue.
 
-    def _output(self, *args, **kwargs) -> None:
-        pass
+    The events are sent in batches by a :py:class:`BatchProducer` on a
+    background thread. Example target config:
+    "target": {
+        "connection": {
+            "transport": "file",
+            "uri": "/tmp/kontoauszug.queue"
+        },
+        "options": {
+            "encoding": "json",
+            "batch_size": 500,
+            "linger_ms": 50,
+            "compression": "gzip",
+            "max_in_flight": 10000
+        }
+    }
+    `encoding` is either 'json' or 'avro', the latter requires a `schema`
+    in the options (see :py:func:`avro_schema`).
+    """
+
+    def __init__(self, config: Dict[str, Any], parser: Parser = None,
+                 schema: Dict[str, Any] = None) -> None:
+        """ :param schema: overrides the schema of the target config """
+        super().__init__(config, parser)
+        options = self.config.get('options', {})
+        self.encoding = options.get('encoding', 'json')
+        validate.is_in_list(self.encoding, ['json', 'avro'])
+        self.schema = None
+        if self.encoding == 'avro':
+            schema = schema or avro_schema(self.config)
+            if schema is None:
+                raise ValueError("Avro encoding requires a schema")
+            self.schema = parse_avro_schema(schema)
+
+    def __serializer(self) -> Callable[[Dict[str, Any]], bytes]:
+        if self.encoding == 'json':
+            return lambda event: json.dumps(event, default=str).encode()
+
+        import avro.io
+        writer = avro.io.DatumWriter(self.schema)
+
+        def serialize(event: Dict[str, Any]) -> bytes:
+            buf = io.BytesIO()
+            writer.write(event, avro.io.BinaryEncoder(buf))
+            return buf.getvalue()
+
+        return serialize
+
+    def _write(self,
+               data: Any,
+               namespace: str = '',
+               version: str = '',
+               source: str = '',
+               **kwargs) -> None:
+        options = self.config.get('options', {})
+        producer = BatchProducer(
+            transport=TransportFactory.load(self.config['connection']),
+            batch_size=options.get('batch_size', 500),
+            linger_ms=options.get('linger_ms', 50),
+            compression=options.get('compression', Compression.NONE),
+            max_in_flight=options.get('max_in_flight', 10000)
+        )
+        serialize = self.__serializer()
+        ts = int(time.time())
+        try:
+            for elem in data:
+                producer.send(serialize(
+                    make_event(elem, ts, namespace, version, source)
+                ))
+            producer.flush()
+        finally:
+            producer.close()
+        self.logger.info(
+            "Put %d events in %d batches on queue '%s'",
+            producer.sent, producer.batches, producer.transport.uri
+        )
+
+
+class ParquetTarget(Target):
+    """
+    Writes the parsed chunks as row groups of a Parquet file,
+    which is finished by :py:meth:`close`. Example target config:
+    "target": {
+        "type": "parquet",
+        "connection": {"uri": "/data/kontoauszug.parquet"},
+        "options": {"compression": "snappy", "types": {"zipcode": "string"}}
+    }
+    The schema of the file is the one of the first chunk, `types` declares
+    the Arrow types of columns, which are inferred differently per chunk
+    (e.g. a zipcode, which is only numeric in the first chunk).
+    Parquet files cannot be appended to: a run, which appends
+    (``if_exists='append'``, e.g. tail mode), to an existing file writes
+    a new file next to it, suffixed with the time of the run.
+    """
+
+    def __init__(self, config: Dict[str, Any], parser: Parser = None) -> None:
+        super().__init__(config, parser)
+        self.path: Optional[str] = None
+        self.writer = None
+
+    def _write(self, data: Any, if_exists: str = None, **kwargs) -> None:
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        frame = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        options = self.config.get('options', {})
+        if self.writer is None:
+            types = {name: pa.type_for_alias(alias)
+                     for name, alias in options.get('types', {}).items()}
+            # columns without any value in the first chunk are strings
+            schema = pa.schema([
+                pa.field(field.name, types.get(
+                    field.name,
+                    pa.string() if field.type == pa.null() else field.type
+                )) for field in table.schema
+            ])
+            table = self.__cast(frame, table, schema)
+            self.path = self.__path(if_exists)
+            self.writer = pq.ParquetWriter(
+                self.path, schema,
+                compression=options.get('compression', 'snappy')
+            )
+        elif not table.schema.equals(self.writer.schema):
+            table = self.__cast(frame, table, self.writer.schema)
+        self.writer.write_table(table)
+
+    @staticmethod
+    def __cast(frame: Any, table: Any, schema: Any) -> Any:
+        import pyarrow as pa
+
+        # values are converted to strings by pandas, arrow does not cast
+        # e.g. integers to strings
+        chunk_strings = {field.name for field in table.schema
+                         if field.type == pa.string()}
+        strings = [field.name for field in schema
+                   if field.type == pa.string() and field.name not in chunk_strings]
+        if strings:
+            frame = frame.copy()
+            for column in strings:
+                frame[column] = frame[column].where(
+                    frame[column].isnull(), frame[column].astype(str)
+                )
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+        try:
+            return table.cast(schema)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as error:
+            raise ValueError(
+                "Chunk does not match the schema of the Parquet file, "
+                "declare the column types in 'options.types': {}"
+                .format(error)
+            )
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.logger.info("Wrote %s", self.path)
+            self.writer = None
+
+    def __path(self, if_exists: Optional[str]) -> str:
+        path = self.config['connection']['uri']
+        if if_exists != 'append' or not os.path.exists(path):
+            return path
+        stem, extension = os.path.splitext(path)
+        return "{}-{}{}".format(
+            stem, time.strftime('%Y%m%dT%H%M%S', time.gmtime()), extension
+        )
+
+
+class FanOutTarget(Target):
+    """
+    Writes every chunk to several targets, so a source is parsed once
+    for all of its targets.
+
+    Every target consumes the chunks in its own thread from a bounded
+    queue of ``options.buffer_size`` chunks (default 2) of its config.
+    :py:meth:`write` blocks while the queue of a target is full, so a slow
+    target slows down the pipeline (backpressure) instead of buffering
+    the whole source. The chunks are shared, targets must not modify them.
+    :py:meth:`close` waits until all targets wrote all chunks and raises
+    the first error of a target.
+
+    A checkpoint is only resumed from, if every target committed it
+    (see :py:meth:`last_checkpoint`).
+    """
+
+    __DONE = object()
+
+    def __init__(self, config: Dict[str, Any], targets: List[Target],
+                 parser: Parser = None) -> None:
+        super().__init__(config, parser)
+        self.targets = targets
+        self.__consumers: List[Tuple[queue.Queue, threading.Thread]] = []
+        self.__errors: List[BaseException] = []
+
+    def _write(self, data: Any, *args, **kwargs) -> None:
+        if not isinstance(data, list) and not hasattr(data, 'columns'):
+            # a generator could only be consumed by one target
+            data = list(data)
+        if not self.__consumers:
+            self.__start()
+        for chunks, _ in self.__consumers:
+            self.__raise()
+            chunks.put((data, args, kwargs))
+
+    def close(self) -> None:
+        for chunks, _ in self.__consumers:
+            chunks.put(self.__DONE)
+        for _, thread in self.__consumers:
+            thread.join()
+        self.__consumers = []
+        for target in self.targets:
+            try:
+                target.close()
+            except Exception as error:
+                self.__errors.append(error)
+        self.__raise()
+
+    def last_checkpoint(self, fingerprint: str) -> Optional[int]:
+        checkpoints = [target.last_checkpoint(fingerprint)
+                       for target in self.targets]
+        if any(checkpoint is None for checkpoint in checkpoints):
+            return None
+        return min(checkpoints)
+
+    def record_profile(self, profile: Any, uri: str) -> None:
+        for target in self.targets:
+            target.record_profile(profile, uri)
+
+    def __start(self) -> None:
+        for target in self.targets:
+            chunks: queue.Queue = queue.Queue(
+                maxsize=target.config.get('options', {}).get('buffer_size', 2)
+            )
+            thread = threading.Thread(
+                target=self.__consume, args=(target, chunks),
+                name=f"{type(target).__name__}-writer", daemon=True
+            )
+            thread.start()
+            self.__consumers.append((chunks, thread))
+
+    def __consume(self, target: Target, chunks: queue.Queue) -> None:
+        failed = False
+        while True:
+            item = chunks.get()
+            if item is self.__DONE:
+                return
+            if failed:
+                # keep draining, so that the writers do not block forever
+                continue
+            data, args, kwargs = item
+            try:
+                target.write(data, *args, **kwargs)
+            except Exception as error:
+                self.logger.exception("Writing to %s failed", target)
+                self.__errors.append(error)
+                failed = True
+
+    def __raise(self) -> None:
+        if self.__errors:
+            error, self.__errors = self.__errors[0], []
+            raise error
+
+
+class SpoolTarget(Target):
+    """
+    Puts the chunks into a local :py:class:`Spool` and writes them to
+    `target` (e.g. a database) on a background thread, retrying with
+    exponential backoff while the target is slow or down. The pipeline
+    only waits for the local disk, a failed write loses nothing.
+    Configured in the options of the wrapped target:
+    "options": {
+        "spool": {
+            "directory": "/var/spool/upload.io/kontoauszug",
+            "retries": 10,
+            "backoff": 0.5,
+            "max_backoff": 60,
+            "drain_timeout": 600
+        }
+    }
+    :py:meth:`close` waits up to `drain_timeout` seconds (default: until
+    the spool is empty), segments which are left are replayed later
+    (at the latest, when the spool is opened by the next process).
+    """
+
+    def __init__(self, config: Dict[str, Any], target: Target,
+                 parser: Parser = None) -> None:
+        super().__init__(config, parser)
+        # the spool imports pandas, it is only needed, if a target spools
+        from uploadio.sources.spool import Spool
+        options = self.config['options']['spool']
+        validate.is_in_dict_keys('directory', options)
+        self.target = target
+        self.drain_timeout = options.get('drain_timeout', None)
+        self.spool = Spool.open(options['directory'])
+        self.__failed = len(self.spool.failed)
+        self.spool.start(
+            target.write,
+            retries=options.get('retries', 10),
+            backoff=options.get('backoff', 0.5),
+            max_backoff=options.get('max_backoff', 60.0)
+        )
+
+    def _write(self, data: Any, *args, **kwargs) -> None:
+        self.spool.put(data, kwargs, args=list(args))
+
+    def close(self) -> None:
+        if not self.spool.join(self.drain_timeout):
+            self.logger.warning(
+                "%d segments are left in spool %s",
+                len(self.spool.segments()), self.spool.directory
+            )
+            return
+        self.target.close()
+        failed = self.spool.failed[self.__failed:]
+        self.__failed = len(self.spool.failed)
+        if failed:
+            raise IOError("Could not write {} segments, see {}".format(
+                len(failed), os.path.join(self.spool.directory, 'failed')
+            ))
+
+    def last_checkpoint(self, fingerprint: str) -> Optional[int]:
+        """ Spooled chunks count as committed, they are written later """
+        try:
+            committed = self.target.last_checkpoint(fingerprint)
+        except Exception:
+            self.logger.warning("No checkpoint of the target available",
+                                exc_info=True)
+            committed = None
+        spooled = self.spool.checkpoint(fingerprint)
+        checkpoints = [c for c in (committed, spooled) if c is not None]
+        return max(checkpoints) if checkpoints else None
+
+    def record_profile(self, profile: Any, uri: str) -> None:
+        self.target.record_profile(profile, uri)
+
+
+class TargetFactory:
+    """
+    Knows which :py:class:`Target` belongs to the `type` of a target config
+    (default 'database'). Further targets are registered as entry points
+    of the group 'uploadio.targets' (see :py:class:`Registry`).
+    """
+
+    REGISTRY = Registry('uploadio.targets', {
+        "database": DatabaseTarget,
+        "log": LoggableTarget,
+        "avro": AvroTarget,
+        "queue": MessageQueueTarget,
+        "parquet": ParquetTarget
+    })
+
+    @staticmethod
+    def load(config: Dict[str, Any], **kwargs) -> Target:
+        """
+        :param config: target config of a catalog
+        :param kwargs: further arguments of the target (e.g. parser, schema)
+        """
+        clz = TargetFactory.REGISTRY.load(config.get('type', 'database'))
+        target = clz(config=config, **kwargs)
+        if 'spool' in config.get('options', {}):
+            return SpoolTarget(config=config, target=target)
+        return target
+
+    @staticmethod
+    def load_all(configs: List[Dict[str, Any]], **kwargs) -> Target:
+        """
+        One target, which writes to all target configs of a source
+        (a :py:class:`FanOutTarget` for more than one)
+        """
+        targets = [TargetFactory.load(config, **kwargs) for config in configs]
+        if len(targets) == 1:
+            return targets[0]
+        return FanOutTarget(config={'targets': configs}, targets=targets)
@@ -3,6 +3,7 @@ from enum import Enum
 from typing import Any, Dict, List, Optional, Tuple, Type, Union
 
 from src.p3common.common import validators as validate
+from uploadio.common.registry import Registry
 from uploadio.utils import auto_str
 
 
@@ -168,18 +169,21 @@ class NumericComparisonFilter(Transformation):
 
 
 class TransformationFactory:
+    """
+    Knows which :py:class:`Transformation` belongs to a task name.
+    Further transformations are registered as entry points of the group
+    'uploadio.transformations' (see :py:class:`Registry`).
+    """
 
-    # TODO: Make it more flexible and reproducible
-    __MAPPING: Dict[str, Type[Transformation]] = {
+    REGISTRY = Registry('uploadio.transformations', {
         "replace": ReplaceRuleTransformation,
         "regexreplace": RegexReplaceTransformation,
         "uppercase": UppercaseRuleTransformation,
         "lambda": LambdaRuleTransformation,
         "date_format": DateFormatTransformation,
         "comparison": NumericComparisonFilter
-    }
+    })
 
     @staticmethod
     def load(name: str) -> Type[Transformation]:
-        validate.is_in_dict_keys(name, TransformationFactory.__MAPPING)
-        return TransformationFactory.__MAPPING[name]
+        return TransformationFactory.REGISTRY.load(name)
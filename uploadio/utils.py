@@ -1,6 +1,6 @@
+import importlib
 import inspect
 import logging
-import os
 from hashlib import md5
 
 
@@ -8,6 +8,18 @@ def make_md5(s, encoding='utf-8'):
     return md5(s.encode(encoding)).hexdigest()
 
 
+def file_fingerprint(path: str, salt: str = '', block: int = 1 << 20) -> str:
+    """
+    Identifies the content of a file: hashes `salt` and all bytes (read in
+    blocks of `block` bytes), so any change of the content changes it
+    """
+    digest = md5(f"{salt}:".encode())
+    with open(path, 'rb') as file:
+        for data in iter(lambda: file.read(block), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+
 def make_list(item_or_items):
     """
         Makes a list out of the given items.
@@ -107,25 +119,119 @@ def auto_str(__repr__=False):
     return decorator
 
 
+class LazyModule:
+    """
+    Stands in for a heavy module (pandas, sqlalchemy, ...), which is
+    imported on first attribute access instead of at startup.
+    Example:
+        >>> pd = LazyModule('pandas')
+        >>> pd
+        <lazy module 'pandas'>
+        >>> pd.DataFrame.__name__
+        'DataFrame'
+    """
+
+    def __init__(self, name: str) -> None:
+        self.__name = name
+        self.__module = None
+
+    def __getattr__(self, attribute: str):
+        if self.__module is None:
+            self.__module = importlib.import_module(self.__name)
+        return getattr(self.__module, attribute)
+
+    def __repr__(self) -> str:
+        return f"<lazy module '{self.__name}'>"
+
+
+LOG_FORMAT = "%(asctime)s - %(name)-15s - [%(levelname)-10s] %(message)s"
+
+
+def configure_logging(level=logging.INFO, fmt: str = LOG_FORMAT) -> None:
+    """
+    Configures the root logger. Call this exactly once at startup
+    (e.g. from ``runner.py``) instead of on every logger access.
+    Args:
+        level (int|str): Log level, either as number or as name ('DEBUG').
+        fmt (str): Format string for the root handler.
+    """
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+    logging.basicConfig(level=level, format=fmt)
+    logging.getLogger().setLevel(level)
+
+
 class Loggable:
 
     """
     Adds a logger property to the class to provide easy access to a
-    configured logging instance to use.
+    logging instance to use. There is exactly one logger per class, which
+    is created on first access and cached afterwards.
+
+    Use lazy `%`-style arguments on hot paths, so that messages are only
+    formatted if the level is enabled.
     Example:
         >>> class NeedsLogger(Loggable):
         ...     def do(self, message):
-        ...         self.logger.info(message)
+        ...         self.logger.info("Doing %s", message)
+        >>> NeedsLogger().logger is NeedsLogger().logger
+        True
+        >>> NeedsLogger().logger.name
+        'uploadio.utils.NeedsLogger'
     """
     @property
     def logger(self) -> logging.Logger:
         """
-        Configures and returns a logger instance for further use.
+        Returns the (cached) logger instance of this class.
         Returns:
             (logging.Logger)
         """
-        logging.basicConfig(
-            level=logging.DEBUG,
-            format="%(asctime)s - %(name)-15s - [%(levelname)-10s] %(message)s"
+        cls = type(self)
+        logger = cls.__dict__.get('_logger')
+        if logger is None:
+            logger = logging.getLogger(
+                "{}.{}".format(cls.__module__, cls.__name__)
+            )
+            setattr(cls, '_logger', logger)
+        return logger
+
+
+class SampledLogger:
+
+    """
+    Logs per-row output on hot paths without paying for every single record.
+    Only every `every`-th record is logged, all others are just counted.
+    Call :py:meth:`summary` at the end to log the aggregate.
+    Example:
+        >>> sampled = SampledLogger(logging.getLogger('doctest'), every=10)
+        >>> for i in range(25):
+        ...     sampled.log("row %s", i)
+        >>> sampled.count, sampled.logged
+        (25, 3)
+    """
+
+    def __init__(self, logger: logging.Logger, every: int = 1,
+                 level: int = logging.INFO) -> None:
+        """
+        :param logger: logger to write to
+        :param every: log every n-th record (1 logs everything)
+        :param level: log level of the sampled records and the summary
+        """
+        self.logger = logger
+        self.every = max(int(every or 1), 1)
+        self.level = level
+        self.count = 0
+        self.logged = 0
+
+    def log(self, msg: str, *args) -> None:
+        self.count += 1
+        if (self.count - 1) % self.every == 0:
+            self.logged += 1
+            if self.logger.isEnabledFor(self.level):
+                self.logger.log(self.level, msg, *args)
+
+    def summary(self, what: str = 'records') -> None:
+        self.logger.log(
+            self.level, "%d %s processed, %d logged (every %d)",
+            self.count, what, self.logged, self.every
         )
-        return logging.getLogger(os.path.basename(__file__))